@@ -5,6 +5,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import os
 
+from app.store import parquet
+
+CLEAN = Path("data/clean")
 MARTS = Path("data/marts")
 FIGS = Path("docs/figures")
 FIGS.mkdir(parents=True, exist_ok=True)
@@ -57,29 +60,21 @@ def genre_genre_heatmap():
 
 
 def avg_team_size_by_decade():
-    # Approximate “team size” from number of artist-credits per RG
-    # Use release_group_relations.jsonl so we count credits directly
-    import json
-
-    rgs = []
-    with open("data/raw/release_group_relations.jsonl", "r", encoding="utf-8") as f:
-        for line in f:
-            rgs.append(json.loads(line))
-    rows = []
-    for rg in rgs:
-        frd = rg.get("first-release-date")
-        year = None
-        if frd and len(frd) >= 4:
-            try:
-                year = int(frd[:4])
-            except Exception:
-                year = None
-        if year is None:
-            continue
-        decade = int(year / 10) * 10
-        team_size = len(rg.get("artist-credit", []))
-        rows.append({"decade": decade, "team_size": team_size})
-    df = pd.DataFrame(rows)
+    # Approximate “team size” from number of artist-credits per RG, counted
+    # on the clean artist_credits bridge (app/pipeline/clean.py)
+    if not (CLEAN / "artist_credits.parquet").exists():
+        return
+    credits = parquet.read(CLEAN / "artist_credits.parquet", columns=["rg_mbid"])
+    team = credits.dropna().groupby("rg_mbid").size().rename("team_size")
+    rgs = parquet.read(
+        CLEAN / "release_groups.parquet", columns=["rg_mbid", "first_release_date"]
+    )
+    year = pd.to_datetime(rgs["first_release_date"], errors="coerce").dt.year
+    df = (
+        pd.DataFrame({"rg_mbid": rgs["rg_mbid"], "decade": year // 10 * 10})
+        .dropna()
+        .join(team, on="rg_mbid", how="inner")
+    )
     if df.empty:
         return
     g = df.groupby("decade", as_index=False)["team_size"].mean()
@@ -1,35 +1,57 @@
 import re
 from datetime import datetime
+from functools import lru_cache
 
+import pandas as pd
 
-def parse_date(x):
-    if not x or str(x).strip() == "":
-        return None
-    for fmt in ("%Y-%m-%d", "%Y-%m", "%Y"):
-        try:
-            dt = datetime.strptime(x, fmt)
-            return dt.strftime("%Y-%m-%d")
-        except ValueError:
-            pass
-    return None
+# nullable column dtypes the normalizers return
+DATE = "date32[pyarrow]"
+INT = "Int64"
+# MusicBrainz partial dates, told apart by length alone
+DATE_FORMATS = {10: "%Y-%m-%d", 7: "%Y-%m", 4: "%Y"}
 
 
-def to_ms(x):
-    if x in (None, "", float("nan")):
+@lru_cache(maxsize=1 << 16)
+def _date(x):
+    fmt = DATE_FORMATS.get(len(x))
+    if fmt is None:
         return None
     try:
-        v = int(x)
-        return v if v >= 0 else None
-    except Exception:
+        return datetime.strptime(x, fmt).date()
+    except ValueError:
         return None
 
 
-UUID_RX = re.compile(r"^[0-9a-fA-F-]{36}$")
+def normalize_dates(s):
+    """Parse a column of (partial) dates; "1999" and "1999-04" pad to the 1st.
+
+    Each distinct value is parsed once (dates repeat heavily) and the result
+    is mapped back over the column; unparseable values become <NA>.
+    """
+    s = s.astype("string")
+    parsed = {v: _date(v) for v in s.dropna().unique()}
+    return pd.Series(pd.array(s.map(parsed).tolist(), dtype=DATE), index=s.index)
+
+
+def normalize_ms(s):
+    """Durations in ms as Int64; non-numeric and negative values become <NA>."""
+    v = pd.to_numeric(s, errors="coerce")
+    return (v.where(v >= 0).astype("Float64") // 1).astype(INT)
+
+
+UUID_PATTERN = r"[0-9a-fA-F-]{36}"
+UUID_RX = re.compile(rf"^{UUID_PATTERN}$")
 
 
 def is_uuid(x):
     return bool(x) and bool(UUID_RX.match(str(x)))
 
 
+def uuid_mask(s):
+    """is_uuid over a whole column in one regex pass (nulls are not UUIDs)."""
+    m = s.astype("string").str.fullmatch(UUID_PATTERN)
+    return m.fillna(False).astype(bool)
+
+
 def norm_country(x):
     return str(x).upper() if x else None
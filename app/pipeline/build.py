@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import re
-import json
 from pathlib import Path
 
 from app.figures.collab_network import plot_collab_network
@@ -10,13 +9,13 @@ from app.figures.genre_evolution import plot_genre_evolution
 
 import pandas as pd
 import unicodedata
-from app.schema import SchemaResolver
+from app.schema import ALIAS, SchemaResolver
+from app.store import parquet
 
 schema = SchemaResolver()
 
 CLEAN = Path("data/clean")
 MARTS = Path("data/marts")
-RAW = Path("data/raw")
 FIG_DIR = Path("docs/figures")
 
 MARTS.mkdir(parents=True, exist_ok=True)
@@ -35,68 +34,69 @@ def norm_name(n: str) -> str:
     return n
 
 
-def read_parquet(name: str) -> pd.DataFrame:
-    return pd.read_parquet(CLEAN / f"{name}.parquet")
+# clean columns each table is read for (their ALIAS spellings are read too)
+COLUMNS = {
+    "artists": ["artist_mbid", "name"],
+    "release_groups": [
+        "rg_mbid",
+        "title",
+        "primary_type",
+        "first_release_date",
+        "artist_credit",
+    ],
+    "entity_genres": ["entity_type", "entity_mbid", "genre"],
+    "artist_credits": [
+        "rg_mbid",
+        "recording_mbid",
+        "position",
+        "artist_mbid",
+        "artist_name",
+        "credited_name",
+    ],
+}
+
+
+def read_parquet(name: str, filters: list[tuple] | None = None) -> pd.DataFrame:
+    """Clean table ``name``, reading only the columns (and rows) build uses."""
+    cols = COLUMNS.get(name)
+    if cols is not None:
+        cols = [*cols, *ALIAS.get(name, {})]
+    return parquet.read(CLEAN / f"{name}.parquet", columns=cols, filters=filters)
 
 
 def write_both(df: pd.DataFrame, base: str) -> None:
     df.to_csv(MARTS / f"{base}.csv", index=False)
-    df.to_parquet(MARTS / f"{base}.parquet", index=False)
+    parquet.write(df, MARTS / f"{base}.parquet")
+
+
+def _co_credits(
+    credits: pd.DataFrame, key: str, col: str, a: str, b: str
+) -> pd.DataFrame:
+    # pairs of distinct ``col`` values credited on the same ``key``
+    d = credits[[key, col]].dropna().drop_duplicates()
+    m = d.merge(d, on=key)
+    m = m[m[f"{col}_x"] < m[f"{col}_y"]]
+    return (
+        m.rename(columns={f"{col}_x": a, f"{col}_y": b})
+        .groupby([a, b], as_index=False)
+        .size()
+        .rename(columns={"size": "weight"})
+    )
 
 
-def collabs_from_recordings(jsonl_path: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
-    p = Path(jsonl_path)
-    rows_id, rows_name = [], []
-    if not p.exists() or p.stat().st_size == 0:
-        return (
-            pd.DataFrame(columns=["artist_id", "peer_id", "weight"]),
-            pd.DataFrame(columns=["name_a", "name_b", "weight"]),
-        )
-    with p.open("r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                rec = json.loads(line)
-            except Exception:
-                continue
-            ac = rec.get("artist-credit") or rec.get("artist_credit") or []
-            ids, names = [], []
-            for part in ac:
-                if isinstance(part, dict):
-                    art = part.get("artist") or {}
-                    aid = art.get("id")
-                    nm = art.get("name") or art.get("sort-name")
-                    if aid:
-                        ids.append(aid)
-                    if nm:
-                        names.append(nm.strip())
-            ids = sorted(set(ids))
-            names = sorted(set(n for n in names if n))
-            for i in range(len(ids)):
-                for j in range(i + 1, len(ids)):
-                    rows_id.append(
-                        {"artist_id": ids[i], "peer_id": ids[j], "weight": 1}
-                    )
-            for i in range(len(names)):
-                for j in range(i + 1, len(names)):
-                    rows_name.append(
-                        {"name_a": names[i], "name_b": names[j], "weight": 1}
-                    )
-
-    id_df = (
-        pd.DataFrame(rows_id)
-        .groupby(["artist_id", "peer_id"], as_index=False)["weight"]
-        .sum()
-        if rows_id
-        else pd.DataFrame(columns=["artist_id", "peer_id", "weight"])
+def collabs_from_recordings() -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Co-credits on recordings, from the clean artist_credits table."""
+    try:
+        credits = read_parquet("artist_credits")
+    except FileNotFoundError:
+        credits = pd.DataFrame(columns=COLUMNS["artist_credits"])
+    credits = credits.dropna(subset=["recording_mbid"]).assign(
+        artist_name=lambda d: d["artist_name"].str.strip().replace("", None)
     )
-    name_df = (
-        pd.DataFrame(rows_name)
-        .groupby(["name_a", "name_b"], as_index=False)["weight"]
-        .sum()
-        if rows_name
-        else pd.DataFrame(columns=["name_a", "name_b", "weight"])
+    return (
+        _co_credits(credits, "recording_mbid", "artist_mbid", "artist_id", "peer_id"),
+        _co_credits(credits, "recording_mbid", "artist_name", "name_a", "name_b"),
     )
-    return id_df, name_df
 
 
 # token list for splitting human-entered credits
@@ -213,74 +213,62 @@ def build() -> None:
 
     # optional: genres table
     try:
-        _eg0 = schema.canonicalize("entity_genres", read_parquet("entity_genres"))
+        # only release-group genres feed the marts: one partition is read
+        _eg0 = schema.canonicalize(
+            "entity_genres",
+            read_parquet(
+                "entity_genres", filters=[("entity_type", "=", "release-group")]
+            ),
+        )
         eg = schema.require(
             "entity_genres", _eg0, ["entity_type", "entity_mbid", "genre"]
         )[["entity_type", "entity_mbid", "genre"]]
     except Exception:
         eg = pd.DataFrame(columns=["entity_type", "entity_mbid", "genre"])
 
-    # ---- Patterns and maps ----
-    patt = [
-        (
-            row.artist_mbid,
-            row.artist_name,
-            re.compile(rf"(?i)(?<!\w){re.escape(row.artist_name)}(?!\w)"),
-        )
-        for row in artists_raw.itertuples(index=False)
-        if isinstance(row.artist_name, str) and row.artist_name.strip()
+    # ---- Release-group credits ----
+    # structured credits from the clean artist_credits bridge; release groups
+    # it has no rows for fall back to their credit string, split into names
+    # and looked up among the known artists
+    try:
+        credits = read_parquet("artist_credits")
+    except Exception:
+        credits = pd.DataFrame(columns=COLUMNS["artist_credits"])
+    rg_credits = credits.dropna(subset=["rg_mbid"]).assign(
+        artist_name=lambda d: d["artist_name"].fillna(d["credited_name"])
+    )[["rg_mbid", "position", "artist_mbid", "artist_name"]]
+    uncredited = rgs_raw[~rgs_raw["rg_mbid"].isin(rg_credits["rg_mbid"])]
+    split = (
+        uncredited.dropna(subset=["artist_credit"])
+        .assign(artist_name=lambda d: d["artist_credit"].map(split_credit))
+        .explode("artist_name")
+        .assign(position=lambda d: d.groupby(level=0).cumcount())[
+            ["rg_mbid", "position", "artist_name"]
+        ]
+        .dropna()
+    )
+    by_name = split.merge(artists_raw.drop_duplicates("artist_name"), on="artist_name")[
+        ["rg_mbid", "position", "artist_mbid", "artist_name"]
     ]
-    name_to_id = dict(
-        artists_raw.rename(columns={"artist_mbid": "artist_id"})[
-            ["artist_name", "artist_id"]
-        ].itertuples(index=False, name=None)
+    # only artists in the clean artists table: credit-only MBIDs that were
+    # never pulled have no artist record, so they stay out of the discography,
+    # the primary artists and the ID-based collaborations. Sorted into credit
+    # order within each release group (rows of one group may come from several
+    # raw files, so the stored row order is not relied on)
+    rg_artists = (
+        pd.concat([rg_credits, by_name], ignore_index=True)
+        .dropna(subset=["artist_mbid"])
+        .drop(columns=["artist_name"])
+        .merge(artists_raw.drop_duplicates("artist_mbid"), on="artist_mbid")
+        .sort_values(["rg_mbid", "position"], kind="stable")
     )
 
     # ---- Artist discography (for ID-based collabs) ----
-    disc_rows = []
-    for rg in rgs_raw.dropna(subset=["artist_credit"]).itertuples(index=False):
-        credit = rg.artist_credit or ""
-        hits = [(mbid, name) for (mbid, name, rx) in patt if rx.search(credit)]
-        seen, dedup = set(), []
-        for mbid, name in hits:
-            if mbid not in seen:
-                seen.add(mbid)
-                dedup.append((mbid, name))
-        if len(dedup) < 2:
-            for nm in split_credit(credit):
-                mbid = name_to_id.get(nm)
-                if mbid and mbid not in seen:
-                    seen.add(mbid)
-                    dedup.append((mbid, nm))
-        for mbid, name in dedup:
-            disc_rows.append(
-                {
-                    "artist_mbid": mbid,
-                    "artist_name": name,
-                    "rg_mbid": rg.rg_mbid,
-                    "rg_title": rg.title,
-                    "primary_type": rg.primary_type,
-                    "first_release_date": rg.first_release_date,
-                    "first_release_year": rg.first_release_year,
-                }
-            )
-
     artist_discog = (
-        pd.DataFrame(
-            disc_rows,
-            columns=[
-                "artist_mbid",
-                "artist_name",
-                "rg_mbid",
-                "rg_title",
-                "primary_type",
-                "first_release_date",
-                "first_release_year",
-            ],
-        ).drop_duplicates(["artist_mbid", "rg_mbid"])
-        if disc_rows
-        else pd.DataFrame(
-            columns=[
+        rgs_raw.drop(columns=["artist_credit"])
+        .merge(rg_artists, on="rg_mbid")
+        .rename(columns={"title": "rg_title"})[
+            [
                 "artist_mbid",
                 "artist_name",
                 "rg_mbid",
@@ -289,7 +277,8 @@ def build() -> None:
                 "first_release_date",
                 "first_release_year",
             ]
-        )
+        ]
+        .drop_duplicates(["artist_mbid", "rg_mbid"])
     )
     write_both(artist_discog, "artist_discography")
 
@@ -299,30 +288,17 @@ def build() -> None:
     ].drop_duplicates()
     write_both(artists, "artists")
 
-    prim_rows = []
-    for rg in rgs_raw.itertuples(index=False):
-        credit = rg.artist_credit or ""
-        matches = [(mbid, name) for (mbid, name, rx) in patt if rx.search(credit)]
-        artist_id = matches[0][0] if matches else None
-        if artist_id is None:
-            for nm in split_credit(credit):
-                if nm in name_to_id:
-                    artist_id = name_to_id[nm]
-                    break
-        if artist_id is None:
-            continue
-        prim_rows.append(
-            {
-                "release_group_id": rg.rg_mbid,
-                "title": rg.title,
-                "first_release_year": rg.first_release_year,
-                "artist_id": artist_id,
-            }
-        )
-    release_groups = pd.DataFrame(
-        prim_rows,
-        columns=["release_group_id", "title", "first_release_year", "artist_id"],
-    ).dropna(subset=["artist_id"])
+    # primary artist: the first credited known artist
+    primary = rg_artists.sort_values(["rg_mbid", "position"]).drop_duplicates(
+        "rg_mbid"
+    )[["rg_mbid", "artist_mbid"]]
+    release_groups = (
+        rgs_raw.merge(primary, on="rg_mbid")
+        .rename(columns={"rg_mbid": "release_group_id", "artist_mbid": "artist_id"})[
+            ["release_group_id", "title", "first_release_year", "artist_id"]
+        ]
+        .dropna(subset=["artist_id"])
+    )
     if "first_release_year" in release_groups:
         release_groups["first_release_year"] = release_groups[
             "first_release_year"
@@ -360,56 +336,24 @@ def build() -> None:
     write_both(genres_by_decade, "genres_by_decade")
 
     # ---- Collaborations (ID-based from discog) ----
-    coll_rows = []
-    if not artist_discog.empty:
-        g = artist_discog[["artist_mbid", "rg_mbid"]].rename(
-            columns={"artist_mbid": "artist_id", "rg_mbid": "release_group_id"}
-        )
-        for _, grp in g.groupby("release_group_id"):
-            ids = sorted(set(grp["artist_id"]))
-            for i in range(len(ids)):
-                for j in range(i + 1, len(ids)):
-                    coll_rows.append(
-                        {"artist_id": ids[i], "peer_id": ids[j], "weight": 1}
-                    )
-
-    collabs = (
-        pd.DataFrame(coll_rows)
-        .groupby(["artist_id", "peer_id"], as_index=False)["weight"]
-        .sum()
-        .query("weight >= @MIN_EDGE_WEIGHT")
-        if coll_rows
-        else pd.DataFrame(columns=["artist_id", "peer_id", "weight"])
-    )
+    collabs = _co_credits(
+        artist_discog, "rg_mbid", "artist_mbid", "artist_id", "peer_id"
+    ).query("weight >= @MIN_EDGE_WEIGHT")
     write_both(collabs, "artist_collaborations")
 
-    # ---- Collaborations (Name-based from RG credit) ----
-    pairs = []
-    for rg in rgs_raw.dropna(subset=["artist_credit"]).itertuples(index=False):
-        raw_names = [
-            n
-            for n in split_credit(rg.artist_credit or "")
-            if n.lower() not in {"various", "various artists"}
-        ]
-        # canonicalize and de-dup within RG
-        canon = sorted({norm_name(n) for n in raw_names if norm_name(n)})
-        for i in range(len(canon)):
-            for j in range(i + 1, len(canon)):
-                pairs.append({"name_a": canon[i], "name_b": canon[j], "weight": 1})
-
-    collabs_names = (
-        pd.DataFrame(pairs)
-        .groupby(["name_a", "name_b"], as_index=False)["weight"]
-        .sum()
-        .query("weight >= @MIN_EDGE_WEIGHT")
-        if pairs
-        else pd.DataFrame(columns=["name_a", "name_b", "weight"])
-    )
+    # ---- Collaborations (Name-based from RG credits) ----
+    names = pd.concat([rg_credits, split], ignore_index=True)
+    names = names[
+        ~names["artist_name"].str.lower().isin({"various", "various artists"})
+    ].assign(artist_name=lambda d: d["artist_name"].map(norm_name).replace("", None))
+    collabs_names = _co_credits(
+        names, "rg_mbid", "artist_name", "name_a", "name_b"
+    ).query("weight >= @MIN_EDGE_WEIGHT")
     write_both(collabs_names, "artist_collaborations_names")
 
-    # ---- Fallback from recordings.jsonl if both empty ----
+    # ---- Fallback from recording credits if both empty ----
     if collabs.empty and collabs_names.empty:
-        rec_id, rec_name = collabs_from_recordings(RAW / "recordings.jsonl")
+        rec_id, rec_name = collabs_from_recordings()
         if not rec_id.empty:
             write_both(rec_id, "artist_collaborations")
         if not rec_name.empty:
@@ -1,71 +1,69 @@
 # app/pipeline/build_discog.py
 from __future__ import annotations
 from pathlib import Path
-import json
 import pandas as pd
 
-RAW = Path("data/raw/recordings.jsonl")
+from app.store import parquet
+
+CLEAN = Path("data/clean")
 OUT = Path("data/marts")
 OUT.mkdir(parents=True, exist_ok=True)
 
 
-def _yr(s: str | None) -> int | None:
-    if not s or len(s) < 4:
-        return None
-    try:
-        return int(s[:4])
-    except Exception:
-        return None
-
-
 def run():
-    if not RAW.exists():
-        raise SystemExit(f"missing {RAW}")
-
-    rows = []
-    with RAW.open("r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-
-            # 1) try direct RG (rare in recordings payloads)
-            rg = rec.get("release-group") or {}
-            rg_id = rg.get("id")
-            rg_title = rg.get("title")
-            rg_primary = rg.get("primary-type")
-            rg_frd = rg.get("first-release-date")
-
-            # 2) fallback via releases -> release-group
-            releases = rec.get("releases") or []
-            if not rg_id and releases:
-                for rel in releases:
-                    rg2 = rel.get("release-group") or {}
-                    rg_id = rg2.get("id") or rg_id
-                    rg_title = rg2.get("title") or rg_title or rel.get("title")
-                    rg_primary = rg2.get("primary-type") or rg_primary
-                    # release-specific date fallback
-                    rg_frd = rg2.get("first-release-date") or rel.get("date") or rg_frd
-
-            fry = _yr(rg_frd)
+    if not (CLEAN / "recordings.parquet").exists():
+        raise SystemExit(f"missing {CLEAN / 'recordings.parquet'}")
 
-            # artist credits
-            for ac in rec.get("artist-credit") or []:
-                art = ac.get("artist") or {}
-                a_id = art.get("id")
-                a_nm = art.get("name")
-                if a_id and rg_id:
-                    rows.append(
-                        {
-                            "artist_mbid": a_id,
-                            "artist_name": a_nm,
-                            "rg_mbid": rg_id,
-                            "rg_title": rg_title,
-                            "primary_type": rg_primary,
-                            "first_release_date": rg_frd,
-                            "first_release_year": fry,
-                        }
-                    )
+    # recording credits -> the recording's release group (app.pipeline.clean);
+    # the release_groups row wins over the stub embedded in the recording,
+    # and a release group without a date falls back to its earliest release
+    credits = parquet.read(
+        CLEAN / "artist_credits.parquet",
+        columns=["recording_mbid", "artist_mbid", "artist_name"],
+    ).dropna(subset=["recording_mbid", "artist_mbid"])
+    recs = parquet.read(
+        CLEAN / "recordings.parquet",
+        columns=[
+            "recording_mbid",
+            "rg_mbid",
+            "rg_title",
+            "rg_primary_type",
+            "rg_first_release_date",
+        ],
+    ).dropna(subset=["rg_mbid"])
+    rgs = parquet.read(
+        CLEAN / "release_groups.parquet",
+        columns=["rg_mbid", "title", "primary_type", "first_release_date"],
+    ).drop_duplicates("rg_mbid")
+    releases = parquet.read(CLEAN / "releases.parquet", columns=["rg_mbid", "date"])
+    earliest = releases.dropna().groupby("rg_mbid")["date"].min()
 
-    df = pd.DataFrame(rows)
+    df = credits.merge(recs, on="recording_mbid").merge(rgs, on="rg_mbid", how="left")
+    df["rg_title"] = df["title"].fillna(df["rg_title"])
+    df["primary_type"] = (
+        df["primary_type"]
+        .astype("string")
+        .fillna(df["rg_primary_type"].astype("string"))
+    )
+    df["first_release_date"] = (
+        df["first_release_date"]
+        .fillna(df["rg_first_release_date"])
+        .fillna(df["rg_mbid"].map(earliest))
+    )
+    df["first_release_year"] = pd.to_datetime(
+        df["first_release_date"], errors="coerce"
+    ).dt.year.astype("Int64")
+    df = df[
+        [
+            "artist_mbid",
+            "artist_name",
+            "rg_mbid",
+            "rg_title",
+            "primary_type",
+            "first_release_date",
+            "first_release_year",
+        ]
+    ]
     if df.empty:
         print("[WARN] no rows built for artist_discography")
     else:
@@ -73,7 +71,7 @@ def run():
             ["artist_name", "first_release_year", "rg_title"], na_position="last"
         )
     OUT.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(OUT / "artist_discography.parquet", index=False)
+    parquet.write(df, OUT / "artist_discography.parquet")
     df.to_csv(OUT / "artist_discography.csv", index=False)
     print(f"[INFO] wrote {len(df)} rows to {OUT}/artist_discography.*")
 
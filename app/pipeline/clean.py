@@ -1,332 +1,941 @@
 import os
+import argparse
+import heapq
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 import json
-import glob
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app.store import compact, decode, parquet, rawio
+from app.store.manifest import Manifest
 
 try:
     # when run as module: python -m app.pipeline.clean
-    from ._clean_utils import parse_date, to_ms, is_uuid, norm_country
+    from ._clean_utils import (
+        DATE,
+        norm_country,
+        normalize_dates,
+        normalize_ms,
+        uuid_mask,
+    )
 except ImportError:
     # when run as script: python app/pipeline/clean.py
-    from _clean_utils import parse_date, to_ms, is_uuid, norm_country
+    from _clean_utils import (
+        DATE,
+        norm_country,
+        normalize_dates,
+        normalize_ms,
+        uuid_mask,
+    )
 
 OUTDIR = "data/clean"
-REJECTS = []
+# <OUTDIR>/_parts/<table>/<part>.parquet: rows parsed per run, tagged with the
+# raw file they came from; _parts/_manifest.json maps raw files to parts
+PARTS = "_parts"
+# rows buffered per table before a chunk is validated and appended to parquet
+CHUNK_ROWS = int(os.getenv("CLEAN_CHUNK_ROWS", "50000"))
+# raw files are parsed on this many processes (1 = in-process)
+WORKERS = int(os.getenv("CLEAN_WORKERS", "1"))
+FILES_PER_TASK = 16
+# JSONL lines per parse task (JSONL files are streamed, not loaded whole)
+JSONL_BATCH = 2000
+_NO_LIFE = decode.LifeSpan()
+_NO_LABEL = decode.Label()
+_NO_RECORDING = decode.Recording()
+_NO_ARTIST = decode.ArtistRef()
+_NO_RG = decode.ReleaseGroup()
+
+STR, INT, BOOL = "string", "Int64", "boolean"
+# table -> column dtypes; fixed so every chunk appends with the same schema
+TABLES = {
+    "artists": {
+        "artist_mbid": STR,
+        "name": STR,
+        "sort_name": STR,
+        "disambiguation": STR,
+        "type": STR,
+        "gender": STR,
+        "area_mbid": STR,
+        "area_name": STR,
+        "begin_date": DATE,
+        "end_date": DATE,
+        "ended": BOOL,
+    },
+    "release_groups": {
+        "rg_mbid": STR,
+        "title": STR,
+        "primary_type": STR,
+        "first_release_date": DATE,
+        "artist_credit": STR,
+    },
+    "releases": {
+        "release_mbid": STR,
+        "rg_mbid": STR,
+        "title": STR,
+        "date": DATE,
+        "country": STR,
+        "barcode": STR,
+        "status": STR,
+    },
+    "release_labels": {"release_mbid": STR, "label_mbid": STR, "catalog_number": STR},
+    "recordings": {
+        "recording_mbid": STR,
+        "title": STR,
+        "length_ms": INT,
+        "video": BOOL,
+        # the release group as embedded in a recordings.jsonl line; these
+        # stubs stay out of release_groups (no genres, often no type/date)
+        "rg_mbid": STR,
+        "rg_title": STR,
+        "rg_primary_type": STR,
+        "rg_first_release_date": DATE,
+    },
+    "tracks": {
+        "track_mbid": STR,
+        "release_mbid": STR,
+        "recording_mbid": STR,
+        "medium_index": INT,
+        "position": INT,
+        "title": STR,
+        "length_ms": INT,
+    },
+    "labels": {"label_mbid": STR, "name": STR, "type": STR, "disambiguation": STR},
+    "entity_genres": {
+        "entity_type": STR,
+        "entity_mbid": STR,
+        "genre": STR,
+        "votes": INT,
+    },
+    "entity_tags": {"entity_type": STR, "entity_mbid": STR, "tag": STR, "votes": INT},
+    # one row per artist-credit entry of a release group or a recording
+    "artist_credits": {
+        "rg_mbid": STR,
+        "recording_mbid": STR,
+        "position": INT,
+        "artist_mbid": STR,
+        "artist_name": STR,
+        "credited_name": STR,
+        "joinphrase": STR,
+    },
+    "artist_relations": {
+        "artist_mbid": STR,
+        "relation_type": STR,
+        "target_type": STR,
+        "target_mbid": STR,
+        "target_name": STR,
+        "begin_date": DATE,
+        "end_date": DATE,
+    },
+    "rg_relations": {
+        "rg_mbid": STR,
+        "relation_type": STR,
+        "target_type": STR,
+        "target_mbid": STR,
+        "target_name": STR,
+        "begin_date": DATE,
+        "end_date": DATE,
+    },
+}
+# parquet column types: low-cardinality labels are dictionary-encoded,
+# positions and vote counts int32, lengths int64, dates date32
+LABEL = pa.dictionary(pa.int32(), pa.string())
+ARROW_TYPES = {STR: pa.string(), INT: pa.int64(), BOOL: pa.bool_(), DATE: pa.date32()}
+ARROW_COLUMNS = {
+    "type": LABEL,
+    "gender": LABEL,
+    "country": LABEL,
+    "status": LABEL,
+    "primary_type": LABEL,
+    "rg_primary_type": LABEL,
+    "entity_type": LABEL,
+    "relation_type": LABEL,
+    "target_type": LABEL,
+    "medium_index": pa.int32(),
+    "position": pa.int32(),
+    "votes": pa.int32(),
+}
 
 
-def _append_reject(reason, tbl, row):
-    REJECTS.append({"table": tbl, "reason": reason, **row})
+def arrow_schema(dtypes):
+    """Explicit Arrow schema for columns with the given pandas dtypes."""
+    return pa.schema(
+        [(c, ARROW_COLUMNS.get(c, ARROW_TYPES[dt])) for c, dt in dtypes.items()]
+    )
 
 
-def _write(df, name, pk=None):
-    os.makedirs(OUTDIR, exist_ok=True)
-    if pk:
-        df = df.drop_duplicates(subset=pk, keep="first")
-    df.to_parquet(f"{OUTDIR}/{name}.parquet", index=False)
+def _to_arrow(df, schema):
+    # no dtype inference: every chunk is cast to the declared schema
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
 
 
-def _finalize_rejects():
-    if REJECTS:
-        pd.DataFrame(REJECTS).to_parquet(f"{OUTDIR}/_rejects.parquet", index=False)
+# raw values are routed as is and normalized a whole column per chunk
+NORMALIZE = {
+    "begin_date": normalize_dates,
+    "end_date": normalize_dates,
+    "first_release_date": normalize_dates,
+    "rg_first_release_date": normalize_dates,
+    "date": normalize_dates,
+    "length_ms": normalize_ms,
+}
+# dtypes of part rows: as routed, before normalization (dates still text)
+RAW_DTYPES = {
+    name: {**{c: STR if dt == DATE else dt for c, dt in cols.items()}, "_source": STR}
+    for name, cols in TABLES.items()
+}
+PK = {
+    "artists": ["artist_mbid"],
+    "release_groups": ["rg_mbid"],
+    "releases": ["release_mbid"],
+    "release_labels": ["release_mbid", "label_mbid", "catalog_number"],
+    "recordings": ["recording_mbid"],
+    "tracks": ["track_mbid"],
+    "labels": ["label_mbid"],
+    "entity_genres": ["entity_type", "entity_mbid", "genre"],
+    "entity_tags": ["entity_type", "entity_mbid", "tag"],
+    "artist_credits": ["rg_mbid", "recording_mbid", "position"],
+    "artist_relations": [
+        "artist_mbid",
+        "relation_type",
+        "target_type",
+        "target_mbid",
+        "begin_date",
+        "end_date",
+    ],
+    "rg_relations": [
+        "rg_mbid",
+        "relation_type",
+        "target_type",
+        "target_mbid",
+        "begin_date",
+        "end_date",
+    ],
+}
 
 
-def _load_raw():
-    files = glob.glob("data/raw/**/*.json", recursive=True)
-    for fp in files:
-        with open(fp, "r", encoding="utf-8") as f:
-            yield fp, json.load(f)
+def _valid_key(col, reason=None):
+    # validate PK shape over the whole chunk; rejected rows go to _rejects
+    # when a reason is given
+    def check(df, tbl, rejects):
+        ok = uuid_mask(df[col])
+        if reason and rejects is not None and not ok.all():
+            rejects.add(df[~ok], tbl, reason)
+        return df[ok]
 
+    return check
 
-def clean_artists(raw):
-    rows = []
-    for fp, data in raw:
-        # artist detail responses have "id" at root; searches have "artists":[]
-        if isinstance(data, dict) and data.get("id") and data.get("name"):
-            a = data
-            rows.append(
-                {
-                    "artist_mbid": a.get("id"),
-                    "name": a.get("name"),
-                    "sort_name": a.get("sort-name"),
-                    "disambiguation": a.get("disambiguation"),
-                    "type": a.get("type"),
-                    "gender": a.get("gender"),
-                    "area_mbid": (a.get("area") or {}).get("id"),
-                    "begin_date": parse_date(((a.get("life-span") or {}).get("begin"))),
-                    "end_date": parse_date(((a.get("life-span") or {}).get("end"))),
-                    "ended": (a.get("life-span") or {}).get("ended"),
-                }
-            )
-        elif isinstance(data, dict) and "artists" in data:
-            for a in data.get("artists") or []:
-                rows.append(
-                    {
-                        "artist_mbid": a.get("id"),
-                        "name": a.get("name"),
-                        "sort_name": a.get("sort-name"),
-                        "disambiguation": a.get("disambiguation"),
-                        "type": a.get("type"),
-                        "gender": a.get("gender"),
-                        "area_mbid": (a.get("area") or {}).get("id"),
-                        "begin_date": parse_date(
-                            ((a.get("life-span") or {}).get("begin"))
-                        ),
-                        "end_date": parse_date(((a.get("life-span") or {}).get("end"))),
-                        "ended": (a.get("life-span") or {}).get("ended"),
-                    }
-                )
-    df = (
-        pd.DataFrame(rows)
-        if rows
-        else pd.DataFrame(
-            columns=[
-                "artist_mbid",
-                "name",
-                "sort_name",
-                "disambiguation",
-                "type",
-                "gender",
-                "area_mbid",
-                "begin_date",
-                "end_date",
-                "ended",
-            ]
+
+def _not_null(*cols):
+    def check(df, tbl, rejects):
+        return df.dropna(subset=list(cols))
+
+    return check
+
+
+# tables whose invalid rows are kept in _rejects.parquet
+REJECT_TABLES = ["artists", "release_groups", "releases"]
+CHECKS = {
+    "artists": _valid_key("artist_mbid", "bad_artist_mbid"),
+    "release_groups": _valid_key("rg_mbid", "bad_rg_mbid"),
+    "releases": _valid_key("release_mbid", "bad_release_mbid"),
+    "release_labels": _not_null("release_mbid", "label_mbid"),
+    "recordings": _valid_key("recording_mbid"),
+    "tracks": _valid_key("track_mbid"),
+    "labels": _valid_key("label_mbid"),
+    "entity_genres": _not_null("entity_mbid", "genre"),
+    "entity_tags": _not_null("entity_mbid", "tag"),
+    "artist_relations": _not_null("artist_mbid", "relation_type"),
+    "rg_relations": _not_null("rg_mbid", "relation_type"),
+}
+
+
+class RowBatch:
+    """Rows for one table kept as column lists (cheap to pickle and merge)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.cols = {c: [] for c in TABLES[name]}
+
+    def __len__(self):
+        return len(next(iter(self.cols.values())))
+
+    def add(self, row):
+        for c, values in self.cols.items():
+            values.append(row.get(c))
+
+    def extend(self, cols):
+        for c, values in self.cols.items():
+            values.extend(cols[c])
+
+
+class TableSink(RowBatch):
+    """Buffer rows for one clean table and append them to parquet in chunks.
+
+    Each chunk is validated, deduplicated on the primary key against every
+    row already written (keep first, as before), cast to the table's dtypes
+    and appended as a row group, so memory holds one chunk plus the keys.
+    """
+
+    def __init__(self, name, chunk_rows=CHUNK_ROWS, rejects=None):
+        super().__init__(name)
+        self.rejects = rejects
+        self.dtypes = TABLES[name]
+        self.schema = arrow_schema(self.dtypes)
+        self.pk = PK.get(name)
+        self.check = CHECKS.get(name)
+        self.chunk_rows = chunk_rows
+        self.keys = set()
+        self._out = None
+
+    def add(self, row):
+        super().add(row)
+        if len(self) >= self.chunk_rows:
+            self.flush()
+
+    def extend(self, cols):
+        super().extend(cols)
+        if len(self) >= self.chunk_rows:
+            self.flush()
+
+    def _frame(self, cols):
+        df = pd.DataFrame(cols, columns=list(self.dtypes))
+        for c in df.columns.intersection(list(NORMALIZE)):
+            df[c] = NORMALIZE[c](df[c])
+        if self.check:
+            df = self.check(df, self.name, self.rejects)
+        if self.pk and not df.empty:
+            keys = list(zip(*(df[c].tolist() for c in self.pk)))
+            fresh = []
+            for k in keys:
+                fresh.append(k not in self.keys)
+                self.keys.add(k)
+            df = df[fresh]
+        return _typed(df, self.dtypes)
+
+    def flush(self):
+        if not len(self):
+            return
+        df = self._frame(self.cols)
+        self.cols = {c: [] for c in self.cols}
+        self.out.write(_to_arrow(df, self.schema))
+
+    @property
+    def path(self):
+        return f"{OUTDIR}/{self.name}.parquet"
+
+    @property
+    def out(self):
+        # opened lazily: OUTDIR is read when the first chunk is written
+        if self._out is None:
+            self._out = parquet.ParquetSink(self.path)
+        return self._out
+
+    def close(self):
+        self.flush()
+        # an empty chunk keeps the schema if no row was written
+        self.out.write(
+            _to_arrow(self._frame({c: [] for c in self.dtypes}), self.schema)
         )
-    )
-    # validate PK + FK shapes
-    bad = ~df["artist_mbid"].map(is_uuid)
-    for _, r in df[bad].iterrows():
-        _append_reject("bad_artist_mbid", "artists", r.to_dict())
-    df = df[~bad]
-    _write(df, "artists", pk=["artist_mbid"])
-    return df
-
-
-def clean_release_groups(raw):
-    rows = []
-    for fp, data in raw:
-        if isinstance(data, dict) and "release-groups" in data:
-            for g in data["release-groups"]:
-                rows.append(
-                    {
-                        "rg_mbid": g.get("id"),
-                        "title": g.get("title"),
-                        "primary_type": g.get("primary-type"),
-                        "first_release_date": parse_date(g.get("first-release-date")),
-                        "artist_credit": g.get("artist-credit-phrase"),
-                    }
-                )
-    df = pd.DataFrame(
-        rows,
-        columns=[
-            "rg_mbid",
-            "title",
-            "primary_type",
-            "first_release_date",
-            "artist_credit",
-        ],
-    )
-    bad = ~df["rg_mbid"].map(is_uuid)
-    for _, r in df[bad].iterrows():
-        _append_reject("bad_rg_mbid", "release_groups", r.to_dict())
-    df = df[~bad]
-    _write(df, "release_groups", pk=["rg_mbid"])
-    return df
-
-
-def clean_releases(raw):
-    rows = []
-    rel_labels = []
-    for fp, data in raw:
-        if isinstance(data, dict) and "releases" in data:
-            for r in data["releases"]:
-                rows.append(
-                    {
-                        "release_mbid": r.get("id"),
-                        "rg_mbid": (r.get("release-group") or {}).get("id"),
-                        "title": r.get("title"),
-                        "date": parse_date(r.get("date")),
-                        "country": norm_country(r.get("country")),
-                        "barcode": r.get("barcode"),
-                        "status": r.get("status"),
-                    }
-                )
-                for li in r.get("label-info") or []:
-                    lab = li.get("label") or {}
-                    rel_labels.append(
-                        {
-                            "release_mbid": r.get("id"),
-                            "label_mbid": lab.get("id"),
-                            "catalog_number": li.get("catalog-number"),
-                        }
-                    )
-    df = pd.DataFrame(
-        rows,
-        columns=[
-            "release_mbid",
-            "rg_mbid",
-            "title",
-            "date",
-            "country",
-            "barcode",
-            "status",
-        ],
-    )
-    dfl = pd.DataFrame(
-        rel_labels, columns=["release_mbid", "label_mbid", "catalog_number"]
-    )
-    bad = ~df["release_mbid"].map(is_uuid)
-    for _, r in df[bad].iterrows():
-        _append_reject("bad_release_mbid", "releases", r.to_dict())
-    df = df[~bad]
-    _write(df, "releases", pk=["release_mbid"])
-    if not dfl.empty:
-        dfl = dfl.dropna(subset=["release_mbid", "label_mbid"])
-        _write(
-            dfl.drop_duplicates(),
-            "release_labels",
-            pk=["release_mbid", "label_mbid", "catalog_number"],
+        return self.out.close()
+
+
+def _typed(df, dtypes):
+    for c, dt in dtypes.items():
+        if dt == INT:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return df.astype(dtypes)
+
+
+def _parts_dir():
+    return Path(OUTDIR) / PARTS
+
+
+class PartSink(RowBatch):
+    """Rows parsed from this run's new or changed raw files, one table.
+
+    Rows are stored as routed (typed, but not yet normalized, validated or
+    deduplicated), so replaying the live parts through TableSink gives the
+    same tables a full rebuild would.
+    """
+
+    def __init__(self, name, part, chunk_rows=CHUNK_ROWS):
+        super().__init__(name)
+        self.cols["_source"] = []
+        self.dtypes = RAW_DTYPES[name]
+        self.schema = arrow_schema(self.dtypes)
+        self.out = parquet.ParquetSink(_parts_dir() / name / f"{part}.parquet")
+        self.chunk_rows = chunk_rows
+
+    def extend(self, cols):
+        super().extend(cols)
+        if len(self) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not len(self):
+            return
+        df = _typed(pd.DataFrame(self.cols, columns=list(self.dtypes)), self.dtypes)
+        self.cols = {c: [] for c in self.cols}
+        self.out.write(_to_arrow(df, self.schema))
+
+    def close(self):
+        self.flush()
+        return self.out.close()
+
+
+def _tables_with(stale):
+    """Tables whose parts hold rows of ``stale`` raw files (key -> part)."""
+    by_part = {}
+    for key, part in stale.items():
+        by_part.setdefault(part, []).append(key)
+    found = set()
+    for name in TABLES:
+        for part, keys in by_part.items():
+            path = _parts_dir() / name / f"{part}.parquet"
+            if not path.exists():
+                continue
+            sources = pq.read_table(path, columns=["_source"]).column("_source")
+            if pc.any(pc.is_in(sources, pa.array(keys))).as_py():
+                found.add(name)
+                break
+    return found
+
+
+class RejectSink:
+    """Rejected rows of every table, appended to _rejects.parquet in chunks.
+
+    Rows keep their table's columns (the union over REJECT_TABLES, so every
+    chunk shares one schema) plus ``table`` and ``reason``.
+    """
+
+    def __init__(self, chunk_rows=CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self.dtypes = {"table": STR, "reason": STR}
+        for name in REJECT_TABLES:
+            self.dtypes.update(TABLES[name])
+        self.schema = arrow_schema(self.dtypes)
+        self.frames = []
+        self.pending = 0
+        self.out = None
+
+    @property
+    def path(self):
+        return f"{OUTDIR}/_rejects.parquet"
+
+    def carry(self, tables):
+        """Keep the previous run's rejects of ``tables`` (not rebuilt)."""
+        if not tables or not os.path.exists(self.path):
+            return
+        df = parquet.read(self.path, filters=[("table", "in", sorted(tables))])
+        if not df.empty:
+            self.frames.append(df[list(self.dtypes)].astype(self.dtypes))
+            self.pending += len(df)
+
+    def add(self, df, tbl, reason):
+        df = df.assign(table=tbl, reason=reason)
+        for c, dt in self.dtypes.items():
+            if c not in df:
+                df[c] = pd.Series(pd.NA, index=df.index, dtype=dt)
+        self.frames.append(df[list(self.dtypes)].astype(self.dtypes))
+        self.pending += len(df)
+        if self.pending >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.frames:
+            return
+        df = pd.concat(self.frames, ignore_index=True)
+        self.frames, self.pending = [], 0
+        if self.out is None:
+            self.out = parquet.ParquetSink(self.path)
+        self.out.write(_to_arrow(df, self.schema))
+
+    def close(self):
+        self.flush()
+        if self.out is not None:
+            return self.out.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)  # stale rejects from an earlier run
+        return 0
+
+
+def _raw_paths():
+    # latest copy of each pulled document, not every sample_<stamp> snapshot
+    # (app/store/compact.py); *.json plus compressed *.json.gz / *.json.zst;
+    # then the JSONL pulls, so document rows win the PK dedupe
+    stats = compact.compact(compact.RAW_DIR)
+    if stats["snapshots"]:
+        print(f"[INFO] compacted {stats['snapshots']} new snapshot(s)")
+    paths = list(rawio.iter_json_paths(compact.COMPACT_DIR))
+    for name in JSONL:
+        for sub in JSONL_DIRS:
+            p = rawio.resolve(Path(compact.RAW_DIR) / sub / name)
+            if p is not None:
+                paths.append(p)
+    return paths
+
+
+def _artist_row(a):
+    life = a.life_span or _NO_LIFE
+    return {
+        "artist_mbid": a.id,
+        "name": a.name,
+        "sort_name": a.sort_name,
+        "disambiguation": a.disambiguation,
+        "type": a.type,
+        "gender": a.gender,
+        "area_mbid": a.area.id if a.area else None,
+        "area_name": a.area.name if a.area else None,
+        "begin_date": life.begin,
+        "end_date": life.end,
+        "ended": life.ended,
+    }
+
+
+def _emit_genres_tags(out, entity_type, entity_id, genres, tags):
+    for g in genres:
+        out["entity_genres"].add(
+            {
+                "entity_type": entity_type,
+                "entity_mbid": entity_id,
+                "genre": g.name,
+                "votes": g.count,
+            }
         )
-    else:
-        _write(
-            pd.DataFrame(columns=["release_mbid", "label_mbid", "catalog_number"]),
-            "release_labels",
+    for t in tags:
+        out["entity_tags"].add(
+            {
+                "entity_type": entity_type,
+                "entity_mbid": entity_id,
+                "tag": t.name,
+                "votes": t.count,
+            }
         )
-    return df
-
-
-def clean_recordings_and_tracks(raw):
-    recs = []
-    tracks = []
-    for fp, data in raw:
-        if isinstance(data, dict) and "releases" in data:
-            # recordings embedded under media[].tracks[]
-            for r in data["releases"]:
-                for m in r.get("media") or []:
-                    for t in m.get("tracks") or []:
-                        tr = {
-                            "track_mbid": t.get("id"),
-                            "release_mbid": r.get("id"),
-                            "recording_mbid": (t.get("recording") or {}).get("id"),
-                            "medium_index": m.get("position"),
-                            "position": t.get("position"),
-                            "title": t.get("title"),
-                            "length_ms": to_ms(t.get("length")),
-                        }
-                        tracks.append(tr)
-                        rec = t.get("recording") or {}
-                        recs.append(
-                            {
-                                "recording_mbid": rec.get("id"),
-                                "title": rec.get("title"),
-                                "length_ms": to_ms(rec.get("length")),
-                                "video": rec.get("video"),
-                            }
-                        )
-    dfr = pd.DataFrame(
-        recs, columns=["recording_mbid", "title", "length_ms", "video"]
-    ).drop_duplicates(subset=["recording_mbid"])
-    dft = pd.DataFrame(
-        tracks,
-        columns=[
-            "track_mbid",
-            "release_mbid",
-            "recording_mbid",
-            "medium_index",
-            "position",
-            "title",
-            "length_ms",
-        ],
-    )
-    dfr = dfr[dfr["recording_mbid"].map(is_uuid)]
-    dft = dft[dft["track_mbid"].map(is_uuid)]
-    _write(dfr, "recordings", pk=["recording_mbid"])
-    _write(dft, "tracks", pk=["track_mbid"])
-    return dfr, dft
 
 
-def clean_labels(raw):
-    rows = []
-    for fp, data in raw:
+def _emit_credits(out, credits, rg_mbid=None, recording_mbid=None):
+    for i, ac in enumerate(credits):
+        art = ac.artist or _NO_ARTIST
+        out["artist_credits"].add(
+            {
+                "rg_mbid": rg_mbid,
+                "recording_mbid": recording_mbid,
+                "position": i,
+                "artist_mbid": art.id,
+                "artist_name": art.name or art.sort_name,
+                "credited_name": ac.name,
+                "joinphrase": ac.joinphrase,
+            }
+        )
+
+
+def _credit_phrase(credits):
+    # the artist-credit string as MusicBrainz renders it
+    return "".join((ac.name or "") + (ac.joinphrase or "") for ac in credits) or None
+
+
+# relation target_type -> attribute holding the target entity
+_TARGETS = {
+    "artist": "artist",
+    "label": "label",
+    "work": "work",
+    "recording": "recording",
+    "release": "release",
+    "release_group": "release_group",
+    "release-group": "release_group",
+}
+
+
+def _emit_relations(out, table, key, entity_id, relations):
+    for rel in relations:
+        attr = _TARGETS.get(rel.target_type)
+        target = getattr(rel, attr) if attr else None
+        out[table].add(
+            {
+                key: entity_id,
+                "relation_type": rel.type,
+                "target_type": rel.target_type,
+                "target_mbid": target.id if target else None,
+                "target_name": (
+                    (target.name or getattr(target, "title", None)) if target else None
+                ),
+                "begin_date": rel.begin,
+                "end_date": rel.end,
+            }
+        )
+
+
+def route_release(r, out, rg_mbid=None):
+    """Release from a listing, a release group or a releases.jsonl line."""
+    out["releases"].add(
+        {
+            "release_mbid": r.id,
+            "rg_mbid": r.release_group.id if r.release_group else rg_mbid,
+            "title": r.title,
+            "date": r.date,
+            "country": norm_country(r.country),
+            "barcode": r.barcode,
+            "status": r.status,
+        }
+    )
+    for li in r.label_info:
+        lab = li.label or _NO_LABEL
+        out["release_labels"].add(
+            {
+                "release_mbid": r.id,
+                "label_mbid": lab.id,
+                "catalog_number": li.catalog_number,
+            }
+        )
         # labels usually embedded; skip unless present
-        if isinstance(data, dict) and "releases" in data:
-            for r in data["releases"]:
-                for li in r.get("label-info") or []:
-                    lab = li.get("label") or {}
-                    rows.append(
-                        {
-                            "label_mbid": lab.get("id"),
-                            "name": lab.get("name"),
-                            "type": lab.get("type"),
-                            "disambiguation": lab.get("disambiguation"),
-                        }
-                    )
-    df = pd.DataFrame(
-        rows, columns=["label_mbid", "name", "type", "disambiguation"]
-    ).drop_duplicates(subset=["label_mbid"])
-    df = df[df["label_mbid"].map(is_uuid)]
-    _write(df, "labels", pk=["label_mbid"])
-    return df
-
-
-def clean_genres_and_tags(raw):
-    grows = []
-    trows = []
-
-    def emit(entity_type, entity_id, genres, tags):
-        for g in genres or []:
-            grows.append(
+        out["labels"].add(
+            {
+                "label_mbid": lab.id,
+                "name": lab.name,
+                "type": lab.type,
+                "disambiguation": lab.disambiguation,
+            }
+        )
+    # recordings embedded under media[].tracks[]
+    for m in r.media:
+        for t in m.tracks:
+            rec = t.recording or _NO_RECORDING
+            out["tracks"].add(
                 {
-                    "entity_type": entity_type,
-                    "entity_mbid": entity_id,
-                    "genre": g.get("name"),
-                    "votes": g.get("count"),
+                    "track_mbid": t.id,
+                    "release_mbid": r.id,
+                    "recording_mbid": rec.id,
+                    "medium_index": m.position,
+                    "position": t.position,
+                    "title": t.title,
+                    "length_ms": t.length,
                 }
             )
-        for t in tags or []:
-            trows.append(
+            out["recordings"].add(
                 {
-                    "entity_type": entity_type,
-                    "entity_mbid": entity_id,
-                    "tag": t.get("name"),
-                    "votes": t.get("count"),
+                    "recording_mbid": rec.id,
+                    "title": rec.title,
+                    "length_ms": rec.length,
+                    "video": rec.video,
+                    "rg_mbid": r.release_group.id if r.release_group else rg_mbid,
                 }
             )
+            _emit_credits(out, rec.artist_credit, recording_mbid=rec.id)
+
+
+def route_artist(a, out):
+    """Artist detail (a document root or an artist_relations.jsonl line)."""
+    out["artists"].add(_artist_row(a))
+    _emit_genres_tags(out, "artist", a.id, a.genres, a.tags)
+    _emit_relations(out, "artist_relations", "artist_mbid", a.id, a.relations)
+
+
+def route_release_group(g, out):
+    """Release group from a listing or a release_group_relations.jsonl line."""
+    out["release_groups"].add(
+        {
+            "rg_mbid": g.id,
+            "title": g.title,
+            "primary_type": g.primary_type,
+            "first_release_date": g.first_release_date,
+            "artist_credit": g.artist_credit_phrase or _credit_phrase(g.artist_credit),
+        }
+    )
+    _emit_genres_tags(out, "release-group", g.id, g.genres, g.tags)
+    _emit_credits(out, g.artist_credit, rg_mbid=g.id)
+    _emit_relations(out, "rg_relations", "rg_mbid", g.id, g.relations)
+    for r in g.releases:
+        route_release(r, out, rg_mbid=g.id)
+
+
+def _recording_rg(rec):
+    # the recording's own release group, else the last one its releases name
+    if rec.release_group is not None and rec.release_group.id:
+        return rec.release_group
+    rg = None
+    for r in rec.releases:
+        if r.release_group is not None and r.release_group.id:
+            rg = r.release_group
+    return rg
+
+
+def route_recording(rec, out):
+    """One recordings.jsonl line: the recording, its credits and releases.
+
+    The embedded release group is kept on the recording row only; the full
+    release group comes from the documents or release_group_relations.
+    """
+    rg = _recording_rg(rec) or _NO_RG
+    out["recordings"].add(
+        {
+            "recording_mbid": rec.id,
+            "title": rec.title,
+            "length_ms": rec.length,
+            "video": rec.video,
+            "rg_mbid": rg.id,
+            "rg_title": rg.title,
+            "rg_primary_type": rg.primary_type,
+            "rg_first_release_date": rg.first_release_date,
+        }
+    )
+    _emit_credits(out, rec.artist_credit, recording_mbid=rec.id)
+    for r in rec.releases:
+        route_release(r, out)
+
+
+def route(doc, out):
+    """Send every row one raw document (decode.Document) yields to its sink."""
+    if doc is None:
+        return
+    # artist detail responses have "id" at root; searches have "artists":[]
+    if doc.id and doc.name:
+        route_artist(doc, out)
+    else:
+        for a in doc.artists:
+            out["artists"].add(_artist_row(a))
+    for g in doc.release_groups:
+        route_release_group(g, out)
+    for r in doc.releases:
+        route_release(r, out)
+
+
+# JSONL pulls (logical name under data/raw) -> (line type, router), in merge
+# order
+JSONL = {
+    "artist_relations.jsonl": (decode.Artist, route_artist),
+    # before the release groups, whose embedded releases carry only a few fields
+    "releases.jsonl": (decode.Release, route_release),
+    "release_group_relations.jsonl": (decode.ReleaseGroup, route_release_group),
+    "recordings.jsonl": (decode.Recording, route_recording),
+}
+# where under data/raw they are looked for: the pullers, then app.pull.crawl
+JSONL_DIRS = [".", "crawl"]
+# JSONL pulls merged ahead of every other raw file for one table: the
+# recordings.jsonl row carries the rg_* fields, the one a document's track
+# yields does not (a file-wide move would let its thin releases win instead)
+FIRST = {"recordings": "recordings.jsonl"}
+
+
+def parse_files(paths, root):
+    """Parse raw documents into {table: columns} (runs in pool workers).
 
-    for fp, data in raw:
-        if isinstance(data, dict) and "release-groups" in data:
-            for g in data["release-groups"]:
-                emit("release-group", g.get("id"), g.get("genres"), g.get("tags"))
-        if isinstance(data, dict) and data.get("id") and data.get("name"):
-            a = data
-            emit("artist", a.get("id"), a.get("genres"), a.get("tags"))
-    dg = pd.DataFrame(
-        grows, columns=["entity_type", "entity_mbid", "genre", "votes"]
-    ).dropna(subset=["entity_mbid", "genre"])
-    dt = pd.DataFrame(
-        trows, columns=["entity_type", "entity_mbid", "tag", "votes"]
-    ).dropna(subset=["entity_mbid", "tag"])
-    _write(
-        dg.drop_duplicates(),
-        "entity_genres",
-        pk=["entity_type", "entity_mbid", "genre"],
+    Each row's raw file (relative to ``root``) is in the ``_source`` column.
+    """
+    out = {name: RowBatch(name) for name in TABLES}
+    sources = {name: [] for name in TABLES}
+    for p in paths:
+        before = {name: len(b) for name, b in out.items()}
+        # typed decode keeps only the fields routed below (app/store/decode.py)
+        route(decode.read_json(p, decode.Document), out)
+        key = Manifest.key(p, root)
+        for name, b in out.items():
+            sources[name].extend([key] * (len(b) - before[name]))
+    return {
+        name: {**b.cols, "_source": sources[name]} for name, b in out.items() if len(b)
+    }
+
+
+def _is_jsonl(path):
+    return rawio.logical(path).name in JSONL
+
+
+def parse_lines(lines, name, key):
+    """Parse a chunk of lines of one JSONL pull (runs in pool workers).
+
+    ``name`` is the pull's logical file name, ``key`` its ``_source``.
+    """
+    cls, router = JSONL[name]
+    out = {t: RowBatch(t) for t in TABLES}
+    for obj in decode.iter_lines(lines, cls):
+        router(obj, out)
+    return {t: {**b.cols, "_source": [key] * len(b)} for t, b in out.items() if len(b)}
+
+
+def _tasks(paths, root):
+    """(function, args) per parse task, in raw-file order.
+
+    Documents go FILES_PER_TASK at a time; a JSONL pull is read (and
+    decompressed) here and handed out JSONL_BATCH lines at a time.
+    """
+    docs = [p for p in paths if not _is_jsonl(p)]
+    for i in range(0, len(docs), FILES_PER_TASK):
+        yield parse_files, (docs[i : i + FILES_PER_TASK], root)
+    for p in paths:
+        if not _is_jsonl(p):
+            continue
+        args = (rawio.logical(p).name, Manifest.key(p, root))
+        with rawio.open_binary(p) as f:
+            lines = []
+            for line in f:
+                lines.append(line)
+                if len(lines) >= JSONL_BATCH:
+                    yield parse_lines, (lines, *args)
+                    lines = []
+        if lines:
+            yield parse_lines, (lines, *args)
+
+
+def _parsed(paths, workers, root):
+    """Column batches in file order; at most 2 tasks per worker in flight."""
+    tasks = _tasks(paths, root)
+    if workers <= 1:
+        for fn, args in tasks:
+            yield fn(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for fn, args in tasks:
+            pending.append(pool.submit(fn, *args))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _layout():
+    schemas = {name: arrow_schema(d) for name, d in RAW_DTYPES.items()}
+    return json.dumps(
+        {name: [f"{f.name}:{f.type}" for f in sch] for name, sch in schemas.items()},
+        sort_keys=True,
     )
-    _write(
-        dt.drop_duplicates(), "entity_tags", pk=["entity_type", "entity_mbid", "tag"]
+
+
+def _file_runs(path, keys, order, batch_rows):
+    """(order index, rows) per raw file in one part, read batch by batch.
+
+    A part is written in raw-file order, so the indices never decrease.
+    """
+    keys = pa.array(keys)
+    for b in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+        b = b.filter(pc.is_in(b.column("_source"), keys))
+        if not b.num_rows:
+            continue
+        idx = pc.index_in(b.column("_source"), order).to_numpy()
+        b = b.drop_columns(["_source"])
+        # split where the raw file changes
+        starts = [0, *(np.flatnonzero(np.diff(idx)) + 1).tolist()]
+        for start, end in zip(starts, [*starts[1:], len(idx)]):
+            yield int(idx[start]), b.slice(start, end - start)
+
+
+def _merge(name, sink, manifest, order):
+    """Replay the live rows of ``name``'s parts into ``sink`` in raw-file order.
+
+    A part row is live while the manifest still maps its raw file to that
+    part; rows of files reparsed into a newer part or removed are skipped.
+    Every raw file lives in one part and each part is in raw-file order, so
+    the parts are streamed and merged by file, one batch per part in memory.
+    The FIRST pull of ``name`` is moved to the front of the order and read
+    as a run of its own.
+    """
+    live = {}
+    for key, entry in manifest.files.items():
+        live.setdefault(entry["part"], []).append(key)
+    keys = order.to_pylist()
+    lead = {k for k in keys if rawio.logical(k).name == FIRST.get(name)}
+    if lead:
+        order = pa.array(
+            [k for k in keys if k in lead] + [k for k in keys if k not in lead]
+        )
+    runs = [
+        _file_runs(p, group, order, sink.chunk_rows)
+        for p in sorted((_parts_dir() / name).glob("*.parquet"))
+        if p.stem in live
+        for group in (
+            [k for k in live[p.stem] if k in lead],
+            [k for k in live[p.stem] if k not in lead],
+        )
+        if group
+    ]
+    for _, rows in heapq.merge(*runs, key=lambda run: run[0]):
+        sink.extend(rows.to_pydict())
+
+
+def _drop_dead_parts(manifest):
+    used = {entry["part"] for entry in manifest.files.values()}
+    for p in _parts_dir().glob("*/*.parquet"):
+        if p.stem not in used:
+            p.unlink()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument(
+        "--full", action="store_true", help="reparse every raw file, not just changes"
+    )
+    args = ap.parse_args(argv)
+
+    # incremental: only raw files that are new or changed since the last run
+    # (app/store/manifest.py) are parsed, into a new part. Only the tables
+    # those files had or now have rows in are rebuilt, from all their live
+    # parts, so PK dedupe still sees every row; the others are left as written
+    root = compact.RAW_DIR
+    paths = _raw_paths()
+    manifest = Manifest(_parts_dir() / "_manifest.json", layout=_layout())
+    if args.full:
+        manifest.files.clear()
+    rebuild_all = not manifest.files
+    changed, removed = manifest.scan(paths, root)
+    outputs = {name: Path(OUTDIR) / f"{name}.parquet" for name in TABLES}
+    if not changed and not removed and all(p.exists() for p in outputs.values()):
+        print(f"[INFO] clean is up to date ({len(paths)} raw files unchanged)")
+        return
+    stale = {
+        key: manifest.files[key]["part"]
+        for key in [k for k, _, _ in changed] + removed
+        if key in manifest.files
+    }
+
+    numbers = [int(p.stem) for p in _parts_dir().glob("*/*.parquet")]
+    numbers += [int(e["part"]) for e in manifest.files.values()]
+    part = f"{max(numbers, default=0) + 1:06d}"
+    parts = {name: PartSink(name, part) for name in TABLES}
+    # one pass: each changed document is parsed once (on --workers processes)
+    for batch in _parsed([p for _, p, _ in changed], args.workers, root):
+        for name, cols in batch.items():
+            parts[name].extend(cols)
+    fresh = {name for name, sink in parts.items() if sink.close()}
+    for key, _, entry in changed:
+        manifest.record(key, entry, part=part)
+    for key in removed:
+        manifest.forget(key)
+    print(
+        f"[INFO] parsed {len(changed)} new/changed raw files "
+        f"({len(paths) - len(changed)} unchanged, {len(removed)} removed)"
+    )
+
+    if rebuild_all:
+        dirty = set(TABLES)
+    else:
+        dirty = fresh | _tables_with(stale)
+        dirty |= {name for name, p in outputs.items() if not p.exists()}
+    print(f"[INFO] rebuilding {len(dirty)} of {len(TABLES)} tables")
+
+    # sinks flush bounded chunks, so memory does not grow with data/raw
+    order = pa.array([Manifest.key(p, root) for p in paths])
+    rejects = RejectSink()
+    rejects.carry(set(REJECT_TABLES) - dirty)
+    counts = {}
+    for name in TABLES:
+        if name not in dirty:
+            counts[name] = parquet.count_rows(outputs[name])
+            continue
+        sink = TableSink(name, rejects=rejects)
+        _merge(name, sink, manifest, order)
+        counts[name] = sink.close()
+    counts["_rejects"] = rejects.close()
+    manifest.save()
+    _drop_dead_parts(manifest)
+    print(
+        "Clean layer written to data/clean ("
+        + ", ".join(f"{n}={c}" for n, c in counts.items())
+        + ")"
     )
-    return dg, dt
-
-
-def main():
-    raw = list(_load_raw())
-    clean_artists(raw)
-    clean_release_groups(raw)
-    clean_releases(raw)
-    recs, tr = clean_recordings_and_tracks(raw)
-    clean_labels(raw)
-    genres, tags = clean_genres_and_tags(raw)
-    _finalize_rejects()
-    print("Clean layer written to data/clean")
 
 
 if __name__ == "__main__":
@@ -1,32 +1,62 @@
 # app/pipeline/marts_relations.py
+"""
+Relation marts, built from the clean tables (app/pipeline/clean.py).
+
+  artist_roles, producer_network   artist_relations with a role type
+  label_affiliations               label relations of artists and of the
+                                   release groups they are credited on
+  releases_by_country_year         release groups x their credited artists
+  collab_matrix                    genre pairs per release group
+
+releases_by_country_year and collab_matrix cover every release group in the
+clean layer: the pulled documents and dumps as well as the relations pull
+(release_group_relations.jsonl), which was their only input before clean
+read the JSONL pulls. A release group needs structured credits to appear in
+releases_by_country_year and genres to count in collab_matrix.
+"""
+
 from __future__ import annotations
-import json
 from pathlib import Path
 import pandas as pd
 
-RAW_DIR = Path("data/raw")
+from app.store import parquet
+
 CLEAN_DIR = Path("data/clean")
 MARTS_DIR = Path("data/marts")
 MARTS_DIR.mkdir(parents=True, exist_ok=True)
 
-
-def _read_jsonl(fp: Path) -> list[dict]:
-    if not fp.exists():
-        return []
-    with fp.open("r", encoding="utf-8") as f:
-        return [json.loads(line) for line in f]
-
-
-def _safe(x, *keys):
-    cur = x
-    for k in keys:
-        if cur is None:
-            return None
-        cur = cur.get(k) if isinstance(cur, dict) else None
-    return cur
-
-
-def build_artist_roles(artist_objs: list[dict]) -> pd.DataFrame:
+ROLE_TYPES = [
+    "producer",
+    "remixer",
+    "engineer",
+    "composer",
+    "lyricist",
+    "vocal supporting",
+    "performer",
+]
+
+
+def _read(name: str, columns: list[str], filters: list[tuple] | None = None):
+    # clean table (app/pipeline/clean.py); labels come back as plain strings
+    path = CLEAN_DIR / f"{name}.parquet"
+    if not path.exists():
+        return pd.DataFrame(columns=columns)
+    df = parquet.read(path, columns=columns, filters=filters)
+    cats = df.select_dtypes("category").columns
+    return df.astype({c: "string" for c in cats})[columns]
+
+
+def _joined(df: pd.DataFrame, key: str, col: str) -> pd.Series:
+    # ";"-joined values of ``col`` per ``key``
+    return df.dropna(subset=[col]).groupby(key, sort=False)[col].agg(";".join)
+
+
+def build_artist_roles(
+    artists: pd.DataFrame,
+    relations: pd.DataFrame,
+    tags: pd.DataFrame,
+    genres: pd.DataFrame,
+) -> pd.DataFrame:
     cols = [
         "artist_id",
         "artist_name",
@@ -37,53 +67,24 @@ def build_artist_roles(artist_objs: list[dict]) -> pd.DataFrame:
         "tags",
         "genres",
     ]
-    if not artist_objs:
+    rel = relations[relations["relation_type"].isin(ROLE_TYPES)]
+    if rel.empty:
         return pd.DataFrame(columns=cols)
-
-    rows = []
-    for a in artist_objs:
-        a_id = a.get("id")
-        a_name = a.get("name")
-        area = (a.get("area") or {}).get("name")
-        tags = [t.get("name") for t in (a.get("tags") or []) if isinstance(t, dict)]
-        genres = [g.get("name") for g in (a.get("genres") or []) if isinstance(g, dict)]
-
-        for rel in a.get("relations") or []:
-            rtype = rel.get("type")
-            ttype = rel.get("target-type")
-            if rtype in {
-                "producer",
-                "remixer",
-                "engineer",
-                "composer",
-                "lyricist",
-                "vocal supporting",
-                "performer",
-            }:
-                tid = None
-                if ttype == "artist":
-                    tid = (rel.get("artist") or {}).get("id")
-                elif ttype == "work":
-                    tid = (rel.get("work") or {}).get("id")
-                elif ttype == "recording":
-                    tid = (rel.get("recording") or {}).get("id")
-                elif ttype in {"release_group", "release-group"}:
-                    tid = (rel.get("release-group") or {}).get("id")
-                rows.append(
-                    {
-                        "artist_id": a_id,
-                        "artist_name": a_name,
-                        "role_type": rtype,
-                        "target_type": ttype,
-                        "target_id": tid,
-                        "area": area,
-                        "tags": ";".join(tags) if tags else None,
-                        "genres": ";".join(genres) if genres else None,
-                    }
-                )
-
-    df = pd.DataFrame(rows, columns=cols)
-    return df if not df.empty else pd.DataFrame(columns=cols)
+    a = artists.drop_duplicates("artist_mbid").set_index("artist_mbid")
+    ids = rel["artist_mbid"]
+    df = pd.DataFrame(
+        {
+            "artist_id": ids,
+            "artist_name": ids.map(a["name"]),
+            "role_type": rel["relation_type"],
+            "target_type": rel["target_type"],
+            "target_id": rel["target_mbid"],
+            "area": ids.map(a["area_name"]),
+            "tags": ids.map(_joined(tags, "entity_mbid", "tag")),
+            "genres": ids.map(_joined(genres, "entity_mbid", "genre")),
+        }
+    )
+    return df.reset_index(drop=True)
 
 
 def build_producer_network(artist_roles: pd.DataFrame) -> pd.DataFrame:
@@ -120,7 +121,10 @@ def build_producer_network(artist_roles: pd.DataFrame) -> pd.DataFrame:
 
 
 def build_label_affiliations(
-    artist_objs: list[dict], rg_objs: list[dict]
+    artists: pd.DataFrame,
+    artist_relations: pd.DataFrame,
+    rg_relations: pd.DataFrame,
+    rg_credits: pd.DataFrame,
 ) -> pd.DataFrame:
     cols = [
         "artist_id",
@@ -131,111 +135,98 @@ def build_label_affiliations(
         "begin",
         "end",
     ]
-    rows = []
-
-    for a in artist_objs or []:
-        a_id, a_name = a.get("id"), a.get("name")
-        for rel in a.get("relations") or []:
-            if rel.get("target-type") == "label":
-                lab = rel.get("label") or {}
-                rows.append(
-                    {
-                        "artist_id": a_id,
-                        "artist_name": a_name,
-                        "label_id": lab.get("id"),
-                        "label_name": lab.get("name"),
-                        "relation_type": rel.get("type"),
-                        "begin": rel.get("begin"),
-                        "end": rel.get("end"),
-                    }
-                )
-
-    for rg in rg_objs or []:
-        for rel in rg.get("relations") or []:
-            if rel.get("target-type") == "label":
-                lab = rel.get("label") or {}
-                for ac in rg.get("artist-credit") or []:
-                    art = ac.get("artist") or {}
-                    rows.append(
-                        {
-                            "artist_id": art.get("id"),
-                            "artist_name": art.get("name"),
-                            "label_id": lab.get("id"),
-                            "label_name": lab.get("name"),
-                            "relation_type": rel.get("type"),
-                            "begin": rel.get("begin"),
-                            "end": rel.get("end"),
-                        }
-                    )
-
-    df = pd.DataFrame(rows, columns=cols)
+    rename = {
+        "target_mbid": "label_id",
+        "target_name": "label_name",
+        "begin_date": "begin",
+        "end_date": "end",
+    }
+    names = artists.drop_duplicates("artist_mbid").set_index("artist_mbid")["name"]
+    own = artist_relations[artist_relations["target_type"] == "label"].rename(
+        columns={**rename, "artist_mbid": "artist_id"}
+    )
+    own["artist_name"] = own["artist_id"].map(names)
+    # label relations of a release group count for every artist it credits
+    via_rg = (
+        rg_relations[rg_relations["target_type"] == "label"]
+        .rename(columns=rename)
+        .merge(rg_credits, on="rg_mbid")
+        .rename(columns={"artist_mbid": "artist_id"})
+    )
+    df = pd.concat([own[cols], via_rg[cols]], ignore_index=True)
     if df.empty:
         return pd.DataFrame(columns=cols)
     return df.dropna(subset=["artist_id", "label_id"]).drop_duplicates()
 
 
-def build_releases_by_country_year(rg_objs: list[dict]) -> pd.DataFrame:
-    rows = []
-    for rg in rg_objs:
-        # Use first-release-date at RG level when present
-        y = None
-        frd = rg.get("first-release-date")
-        if frd and len(frd) >= 4:
-            try:
-                y = int(frd[:4])
-            except Exception:
-                y = None
-        country = None
-        # Try primary release’s country via 'releases' if present in payload
-        for rel in rg.get("releases", []) or []:
-            country = rel.get("country") or country
-        for ac in rg.get("artist-credit", []):
-            a = ac.get("artist", {})
-            rows.append(
-                {
-                    "release_group_id": rg.get("id"),
-                    "year": y,
-                    "country": country,
-                    "artist_id": a.get("id"),
-                    "artist_name": a.get("name"),
-                }
-            )
-    df = pd.DataFrame(rows)
-    return df.dropna(subset=["year"]).astype({"year": "int64"})
-
-
-def build_collab_matrix(rg_objs: list[dict]) -> pd.DataFrame:
-    # Count co-credit by genre pairs across RGs
-    rows = []
-    for rg in rg_objs:
-        genres = sorted(
-            {
-                g.get("name")
-                for g in rg.get("genres", [])
-                if isinstance(g, dict) and g.get("name")
-            }
-        )
-        if len(genres) < 1:
-            continue
-        # co-appearances: include diagonal to show self-collab frequency
-        for g1 in genres:
-            for g2 in genres:
-                rows.append({"genre_1": g1, "genre_2": g2, "n": 1})
-    df = pd.DataFrame(rows)
-    if df.empty:
-        return df
-    return df.groupby(["genre_1", "genre_2"], as_index=False)["n"].sum()
+def build_releases_by_country_year(
+    release_groups: pd.DataFrame, releases: pd.DataFrame, rg_credits: pd.DataFrame
+) -> pd.DataFrame:
+    cols = ["release_group_id", "year", "country", "artist_id", "artist_name"]
+    years = pd.to_datetime(release_groups["first_release_date"], errors="coerce")
+    rgs = pd.DataFrame(
+        {"rg_mbid": release_groups["rg_mbid"], "year": years.dt.year}
+    ).dropna(subset=["year"])
+    # country of the RG's last release that has one
+    country = releases.dropna(subset=["country"]).groupby("rg_mbid")["country"].last()
+    df = rgs.merge(rg_credits, on="rg_mbid")
+    df = pd.DataFrame(
+        {
+            "release_group_id": df["rg_mbid"],
+            "year": df["year"].astype("int64"),
+            "country": df["rg_mbid"].map(country),
+            "artist_id": df["artist_mbid"],
+            "artist_name": df["artist_name"],
+        }
+    )
+    return df[cols]
+
+
+def build_collab_matrix(rg_genres: pd.DataFrame) -> pd.DataFrame:
+    # Count co-credit by genre pairs across RGs; the diagonal shows how often
+    # a genre appears at all
+    g = rg_genres[["entity_mbid", "genre"]].dropna().drop_duplicates()
+    if g.empty:
+        return pd.DataFrame()
+    pairs = g.merge(g, on="entity_mbid", suffixes=("_1", "_2"))
+    return (
+        pairs.groupby(["genre_1", "genre_2"], as_index=False)
+        .size()
+        .rename(columns={"size": "n"})
+    )
 
 
 def run():
-    artist_objs = _read_jsonl(Path("data/raw/artist_relations.jsonl"))
-    rg_objs = _read_jsonl(Path("data/raw/release_group_relations.jsonl"))
+    rel_cols = [
+        "relation_type",
+        "target_type",
+        "target_mbid",
+        "target_name",
+        "begin_date",
+        "end_date",
+    ]
+    artists = _read("artists", ["artist_mbid", "name", "area_name"])
+    artist_rels = _read("artist_relations", ["artist_mbid", *rel_cols])
+    rg_rels = _read("rg_relations", ["rg_mbid", *rel_cols])
+    rg_credits = _read(
+        "artist_credits", ["rg_mbid", "artist_mbid", "artist_name"]
+    ).dropna(subset=["rg_mbid"])
+    release_groups = _read("release_groups", ["rg_mbid", "first_release_date"])
+    releases = _read("releases", ["rg_mbid", "country"])
+    artist_only = [("entity_type", "=", "artist")]
+    tags = _read("entity_tags", ["entity_mbid", "tag"], artist_only)
+    genres = _read("entity_genres", ["entity_mbid", "genre"], artist_only)
+    rg_genres = _read(
+        "entity_genres",
+        ["entity_mbid", "genre"],
+        [("entity_type", "=", "release-group")],
+    )
 
-    artist_roles = build_artist_roles(artist_objs)
-    label_aff = build_label_affiliations(artist_objs, rg_objs)
+    artist_roles = build_artist_roles(artists, artist_rels, tags, genres)
+    label_aff = build_label_affiliations(artists, artist_rels, rg_rels, rg_credits)
     prod_net = build_producer_network(artist_roles)
-    r_by_cy = build_releases_by_country_year(rg_objs)
-    collab_mat = build_collab_matrix(rg_objs)
+    r_by_cy = build_releases_by_country_year(release_groups, releases, rg_credits)
+    collab_mat = build_collab_matrix(rg_genres)
 
     out = {
         "artist_roles.csv": artist_roles,
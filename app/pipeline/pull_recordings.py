@@ -6,18 +6,26 @@ Modes:
 1) Seeded: --seed "Kanye West,Jay-Z,..."  (names or MBIDs)
 2) Parquet: if --seed omitted, read data/clean/artists.parquet and use artist MBIDs
 
-Output: data/raw/recordings.jsonl  (override with --out)
+Output: data/raw/recordings.jsonl  (override with --out), stored compressed
+as recordings.jsonl.gz|.zst per MB_RAW_CODEC (app/store/rawio.py)
+
+Progress is checkpointed per artist in <out>.ckpt; a rerun resumes from the
+last completed page (pass --fresh to start over). Recording MBIDs already in
+the output are tracked in <out>.seen so each recording is written once.
 """
 
 import argparse
-import json
+import asyncio
 import sys
-import time
 import re
-from pathlib import Path
 
 import pandas as pd
-import requests
+
+from app.pull.cache import CACHE_ENABLED, ResponseCache
+from app.pull.client import MAX_IN_FLIGHT, MBClient, MBHTTPError
+from app.pull.metrics import kpi_recorder
+from app.pull.state import Checkpoint
+from app.store import rawio
 
 
 def parse_args():
@@ -29,9 +37,14 @@ def parse_args():
     p.add_argument("--rate-limit-ms", type=int, default=1100)
     p.add_argument("--timeout-s", type=int, default=30)
     p.add_argument("--retries", type=int, default=3)
+    p.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
     p.add_argument("--limit-per-artist", type=int, default=200, help="cap per artist")
     p.add_argument("--seed", default="", help="Comma-separated names or MBIDs")
     p.add_argument("--out", default="data/raw/recordings.jsonl")
+    p.add_argument("--no-cache", action="store_true", help="bypass data/cache")
+    p.add_argument(
+        "--fresh", action="store_true", help="ignore checkpoint, truncate --out"
+    )
     return p.parse_args()
 
 
@@ -42,95 +55,48 @@ def is_mbid(s: str) -> bool:
     return bool(_MBID_RE.match(s.strip()))
 
 
-def get_with_retries(
-    s: requests.Session,
-    url: str,
-    headers: dict,
-    params: dict,
-    timeout: int,
-    retries: int,
-):
-    last = None
-    for i in range(retries):
-        r = s.get(url, headers=headers, params=params, timeout=timeout)
-        if r.status_code == 200:
-            return r
-        last = r
-        time.sleep(0.5 * (i + 1))
-    return last
-
-
-def iter_recordings_for_artist(
-    session: requests.Session,
-    base_url: str,
-    hdr: dict,
+async def iter_recordings_for_artist(
+    client: MBClient,
     artist_token: str,
     limit_per_artist: int,
-    timeout_s: int,
-    retries: int,
-    rate_limit_ms: int,
+    offset: int = 0,
+    fetched: int = 0,
 ):
     """
     Use /recording search with either artist MBID (artist=) or name (query='artist:"name"').
-    Paginate by offset. Yield recording dicts.
+    Paginate by offset, starting at ``offset`` (resume point): the first page's
+    count plans the remaining pages, which are fetched concurrently. Yield
+    (next_offset, [recording dicts]) per page in offset order; MBHTTPError
+    propagates.
     """
-    endpoint = f"{base_url.rstrip('/')}/recording"  # correct endpoint
-    fetched = 0
-    offset = 0
-    page_size = 100
-
-    while fetched < limit_per_artist:
-        if is_mbid(artist_token):
-            params = {
-                "artist": artist_token,
-                "limit": page_size,
-                "offset": offset,
-                "fmt": "json",
-                "inc": "artist-credits",
-            }
-        else:
-            # name search
-            params = {
-                "query": f'artist:"{artist_token}"',
-                "limit": page_size,
-                "offset": offset,
-                "fmt": "json",
-                "inc": "artist-credits",
-            }
-
-        time.sleep(rate_limit_ms / 1000.0)
-        r = get_with_retries(session, endpoint, hdr, params, timeout_s, retries)
-        if r is None or r.status_code != 200:
-            print(
-                f"[WARN] {artist_token}: HTTP {None if r is None else r.status_code}",
-                file=sys.stderr,
-            )
-            return
-
-        data = r.json()
-        recs = data.get("recordings", [])
-        if not recs:
-            return
-
-        for rec in recs:
-            yield rec
-
-        fetched += len(recs)
-        offset += page_size
+    if is_mbid(artist_token):
+        params = {"artist": artist_token, "inc": "artist-credits"}
+    else:
+        # name search
+        params = {"query": f'artist:"{artist_token}"', "inc": "artist-credits"}
+
+    async for next_offset, recs in client.browse(
+        "recording",
+        params,
+        "recordings",
+        offset=offset,
+        limit=limit_per_artist - fetched,
+    ):
+        yield next_offset, recs
 
 
 def load_artist_tokens(seed: str):
     if seed.strip():
         return [s.strip() for s in seed.split(",") if s.strip()]
     # fallback to parquet MBIDs
-    arts = pd.read_parquet("data/clean/artists.parquet")
+    arts = pd.read_parquet("data/clean/artists.parquet", columns=["artist_mbid"])
     tokens = arts["artist_mbid"].dropna().astype(str).unique().tolist()
     return tokens
 
 
 def main():
     args = parse_args()
-    out_path = Path(args.out)
+    out_path = rawio.logical(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
     tokens = load_artist_tokens(args.seed)
@@ -140,29 +106,59 @@ def main():
         )
         sys.exit(2)
 
-    s = requests.Session()
-    hdr = {"User-Agent": args.user_agent}
-
     total = 0
-    with out_path.open("w", encoding="utf-8") as f:
-        for t in tokens:
-            count = 0
-            for rec in iter_recordings_for_artist(
-                s,
-                args.base_url,
-                hdr,
-                t,
-                args.limit_per_artist,
-                args.timeout_s,
-                args.retries,
-                args.rate_limit_ms,
+    cache = None if args.no_cache or not CACHE_ENABLED else ResponseCache()
+    ckpt = Checkpoint(
+        out_path.with_name(out_path.name + ".ckpt"),
+        {"recordings": rawio.physical(out_path)},
+        fresh=args.fresh,
+        seen=out_path.with_name(out_path.name + ".seen"),
+    )
+    if ckpt.resumed:
+        print(f"[INFO] resuming from {ckpt.path}")
+
+    async def pull_artist(client: MBClient, t: str):
+        nonlocal total
+        st = ckpt.seed(t)
+        if st["done"]:
+            print(f"[INFO] {t}: done in checkpoint ({st['fetched']} recordings)")
+            return
+        try:
+            async for next_offset, recs in iter_recordings_for_artist(
+                client, t, args.limit_per_artist, st["offset"], st["fetched"]
             ):
-                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
-                count += 1
-                total += 1
-            print(f"[INFO] {t}: {count} recordings")
-
-    print(f"[INFO] wrote {total} recordings to {out_path}")
+                for rec in recs:
+                    # recordings shared between seed artists are written once
+                    if ckpt.mark_seen(rec.get("id")):
+                        ckpt.write("recordings", rec)
+                        total += 1
+                ckpt.advance(t, len(recs), next_offset)
+        except MBHTTPError as e:
+            print(f"[WARN] {t}: HTTP {e.status}", file=sys.stderr)
+            if e.status is None or e.status >= 500:
+                return  # transient: leave unfinished so a rerun resumes here
+        ckpt.finish(t)
+        print(f"[INFO] {t}: {ckpt.seed(t)['fetched']} recordings")
+
+    async def _run(kpi):
+        async with MBClient(
+            args.base_url,
+            args.user_agent,
+            rate_limit_ms=args.rate_limit_ms,
+            timeout_s=args.timeout_s,
+            retries=args.retries,
+            max_in_flight=args.max_in_flight,
+            on_response=kpi,
+            cache=cache,
+        ) as client:
+            with ckpt:
+                await asyncio.gather(*(pull_artist(client, t) for t in tokens))
+
+    with kpi_recorder("pull_recordings") as kpi:
+        asyncio.run(_run(kpi))
+    print(f"[INFO] wrote {total} recordings to {rawio.physical(out_path)}")
+    if cache is not None:
+        print(f"[INFO] {cache.summary()}")
 
 
 if __name__ == "__main__":
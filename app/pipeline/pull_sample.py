@@ -1,15 +1,17 @@
 import os
 import sys
-import time
-import csv
-import json
+import asyncio
 import argparse
 from pathlib import Path
-from urllib.parse import urlencode, quote
+from urllib.parse import quote
 from datetime import datetime, timezone
-import requests
 from dotenv import load_dotenv
 
+from app.pull.cache import CACHE_ENABLED, ResponseCache
+from app.pull.client import MBClient
+from app.pull.metrics import kpi_recorder
+from app.store import rawio
+
 # load env after imports (keeps E402 away)
 load_dotenv(dotenv_path=Path("env/.env"))
 
@@ -23,42 +25,65 @@ def env(name, default=None, required=False):
     return v
 
 
-def get(url, params=None, outpath=None, ua=None, timeout=30):
-    headers = {"User-Agent": ua}
-    if params:
-        url = f"{url}?{urlencode(params)}"
-
-    t0 = time.time()
-    resp = requests.get(url, headers=headers, timeout=timeout)
-    elapsed_ms = int((time.time() - t0) * 1000)
-
-    # --- KPI logging ---
-    os.makedirs("data/marts", exist_ok=True)
-    kpi_path = "data/marts/kpi_latency_samples.csv"
-    new = not os.path.exists(kpi_path)
-    with open(kpi_path, "a", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        if new:
-            w.writerow(["timestamp", "endpoint", "elapsed_ms", "status"])
-        w.writerow(
-            [
-                time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-                url,
-                elapsed_ms,
-                resp.status_code,
-            ]
-        )
-    # --------------------
-
-    resp.raise_for_status()
-    data = resp.json()
+async def get(client: MBClient, path, params=None, outpath=None):
+    data = await client.get_json(path, params)
     if outpath:
-        os.makedirs(os.path.dirname(outpath), exist_ok=True)
-        with open(outpath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # compact + compressed: <outpath>.gz|.zst per MB_RAW_CODEC
+        rawio.write_json(outpath, data)
     return data
 
 
+async def pull(client: MBClient, seed: str, outdir: str):
+    # 1) search artist
+    q = f"artist:{seed}"
+    asearch = await get(
+        client,
+        "artist",
+        {"query": q, "limit": 1},
+        outpath=os.path.join(outdir, f"artist_search_{quote(seed)}.json"),
+    )
+    if not asearch.get("artists"):
+        sys.exit(f"No artist found for seed '{seed}'")
+    artist = asearch["artists"][0]
+    artist_mbid = artist["id"]
+
+    # 2) artist detail, 3) release-groups by artist and 5) recordings by artist
+    # only depend on the MBID, so they share the limiter concurrently
+    _, rgs, _ = await asyncio.gather(
+        get(  # response presently unused
+            client,
+            f"artist/{artist_mbid}",
+            {"inc": "aliases+genres+tags+url-rels+area-rels"},
+            outpath=os.path.join(outdir, f"artist_detail_{artist_mbid}.json"),
+        ),
+        get(
+            client,
+            "release-group",
+            {"artist": artist_mbid, "limit": 100, "inc": "genres+tags+artist-credits"},
+            outpath=os.path.join(
+                outdir, f"release_groups_by_artist_{artist_mbid}.json"
+            ),
+        ),
+        get(
+            client,
+            "recording",
+            {"artist": artist_mbid, "limit": 100, "inc": "artist-credits+work-rels"},
+            outpath=os.path.join(outdir, f"recordings_by_artist_{artist_mbid}.json"),
+        ),
+    )
+    rg_list = rgs.get("release-groups", [])
+    first_rg = rg_list[0]["id"] if rg_list else None
+
+    # 4) releases for first release-group with labels+recordings
+    if first_rg:
+        await get(
+            client,
+            "release",
+            {"release-group": first_rg, "inc": "labels+recordings"},
+            outpath=os.path.join(outdir, f"releases_by_rg_{first_rg}.json"),
+        )
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument(
@@ -71,6 +96,7 @@ def main():
         "--rate-limit-ms", type=int, default=int(os.getenv("MB_RATE_LIMIT_MS", "1100"))
     )
     ap.add_argument("--timeout", type=int, default=int(os.getenv("MB_TIMEOUT_S", "30")))
+    ap.add_argument("--no-cache", action="store_true", help="bypass data/cache")
     args = ap.parse_args()
 
     if not args.user_agent:
@@ -80,72 +106,26 @@ def main():
 
     stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
     outdir = os.path.join(args.outdir, f"sample_{stamp}")
-    base = args.base_url.rstrip("/")
-
-    # 1) search artist
-    time.sleep(args.rate_limit_ms / 1000)
-    q = f"artist:{args.seed}"
-    asearch = get(
-        f"{base}/artist",
-        {"query": q, "fmt": "json", "limit": 1},
-        outpath=os.path.join(outdir, f"artist_search_{quote(args.seed)}.json"),
-        ua=args.user_agent,
-        timeout=args.timeout,
-    )
-    if not asearch.get("artists"):
-        sys.exit(f"No artist found for seed '{args.seed}'")
-    artist = asearch["artists"][0]
-    artist_mbid = artist["id"]
-
-    # 2) artist detail
-    time.sleep(args.rate_limit_ms / 1000)
-    _ = get(  # response presently unused
-        f"{base}/artist/{artist_mbid}",
-        {"fmt": "json", "inc": "aliases+genres+tags+url-rels+area-rels"},
-        outpath=os.path.join(outdir, f"artist_detail_{artist_mbid}.json"),
-        ua=args.user_agent,
-        timeout=args.timeout,
-    )
-
-    # 3) release-groups by artist
-    time.sleep(args.rate_limit_ms / 1000)
-    rgs = get(
-        f"{base}/release-group",
-        {"artist": artist_mbid, "fmt": "json", "limit": 100, "inc": "genres+tags"},
-        outpath=os.path.join(outdir, f"release_groups_by_artist_{artist_mbid}.json"),
-        ua=args.user_agent,
-        timeout=args.timeout,
-    )
-    rg_list = rgs.get("release-groups", [])
-    first_rg = rg_list[0]["id"] if rg_list else None
-
-    # 4) releases for first release-group with labels+recordings
-    if first_rg:
-        time.sleep(args.rate_limit_ms / 1000)
-        _ = get(
-            f"{base}/release",
-            {"release-group": first_rg, "fmt": "json", "inc": "labels+recordings"},
-            outpath=os.path.join(outdir, f"releases_by_rg_{first_rg}.json"),
-            ua=args.user_agent,
-            timeout=args.timeout,
-        )
-
-    # 5) recordings by artist
-    time.sleep(args.rate_limit_ms / 1000)
-    _ = get(
-        f"{base}/recording",
-        {
-            "artist": artist_mbid,
-            "fmt": "json",
-            "limit": 100,
-            "inc": "artist-credits+work-rels",
-        },
-        outpath=os.path.join(outdir, f"recordings_by_artist_{artist_mbid}.json"),
-        ua=args.user_agent,
-        timeout=args.timeout,
-    )
 
+    cache = None if args.no_cache or not CACHE_ENABLED else ResponseCache()
+
+    async def _run(kpi):
+        async with MBClient(
+            args.base_url,
+            args.user_agent,
+            rate_limit_ms=args.rate_limit_ms,
+            timeout_s=args.timeout,
+            on_response=kpi,
+            cache=cache,
+        ) as client:
+            await pull(client, args.seed, outdir)
+
+    # KPI samples + latency summary -> data/marts (app/pull/metrics.py)
+    with kpi_recorder("pull_sample") as kpi:
+        asyncio.run(_run(kpi))
     print(f"Saved raw JSON under {outdir}")
+    if cache is not None:
+        print(f"[INFO] {cache.summary()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+# app/pull/cache.py
+"""
+Content-addressed on-disk cache for MusicBrainz JSON responses.
+
+Entries live under data/cache/<2-hex>/<sha256>.json, keyed by endpoint +
+sorted query params (inc included, fmt ignored). Fresh entries (younger than
+the TTL) are served without touching the network or the rate limiter; stale
+entries that carry an ETag/Last-Modified are revalidated with a conditional
+GET. Total size is capped and the least recently used files are evicted
+(file mtime is bumped on every hit).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+CACHE_DIR = Path(os.getenv("MB_CACHE_DIR", "data/cache"))
+CACHE_TTL_S = int(os.getenv("MB_CACHE_TTL_S", str(7 * 24 * 3600)))
+CACHE_MAX_MB = int(os.getenv("MB_CACHE_MAX_MB", "512"))
+CACHE_ENABLED = os.getenv("MB_CACHE", "1") == "1"
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        root: Path | str = CACHE_DIR,
+        ttl_s: int = CACHE_TTL_S,
+        max_bytes: int = CACHE_MAX_MB * 1024 * 1024,
+    ):
+        self.root = Path(root)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._size: int | None = None
+
+    @staticmethod
+    def key(endpoint: str, params: dict[str, Any] | None) -> str:
+        items = sorted((k, str(v)) for k, v in (params or {}).items() if k != "fmt")
+        blob = json.dumps([endpoint, items], separators=(",", ":"))
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def lookup(self, key: str) -> dict | None:
+        """Return the stored entry (body + validators) or None."""
+        p = self._path(key)
+        try:
+            with p.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(p)  # LRU bookkeeping
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry.get("stored_at", 0) < self.ttl_s
+
+    @staticmethod
+    def validators(entry: dict) -> dict[str, str]:
+        hdr = {}
+        if entry.get("etag"):
+            hdr["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            hdr["If-Modified-Since"] = entry["last_modified"]
+        return hdr
+
+    def put(
+        self, key: str, endpoint: str, body: Any, headers: dict | None = None
+    ) -> None:
+        headers = headers or {}
+        entry = {
+            "endpoint": endpoint,
+            "stored_at": time.time(),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "body": body,
+        }
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        old = p.stat().st_size if p.exists() else 0
+        tmp = p.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, p)
+        self._account(p.stat().st_size - old)
+
+    def refresh(self, key: str, entry: dict) -> None:
+        """Mark a 304-revalidated entry fresh again."""
+        self.revalidated += 1
+        self.put(
+            key,
+            entry.get("endpoint", ""),
+            entry["body"],
+            {"ETag": entry.get("etag"), "Last-Modified": entry.get("last_modified")},
+        )
+
+    def _files(self) -> list[os.DirEntry]:
+        out = []
+        if not self.root.exists():
+            return out
+        for sub in os.scandir(self.root):
+            if sub.is_dir():
+                out.extend(e for e in os.scandir(sub.path) if e.name.endswith(".json"))
+        return out
+
+    def _account(self, delta: int) -> None:
+        if self._size is None:
+            self._size = sum(e.stat().st_size for e in self._files())
+        else:
+            self._size += delta
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        # drop least recently used entries down to 90% of the cap
+        files = sorted(self._files(), key=lambda e: e.stat().st_mtime)
+        size = sum(e.stat().st_size for e in files)
+        target = int(self.max_bytes * 0.9)
+        for e in files:
+            if size <= target:
+                break
+            size -= e.stat().st_size
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+        self._size = size
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return (
+            f"cache hits={self.hits} misses={self.misses} "
+            f"revalidated={self.revalidated} hit_rate={rate:.0f}%"
+        )
@@ -0,0 +1,255 @@
+# app/pull/client.py
+"""
+Shared asyncio client for the MusicBrainz web service.
+
+Every puller (pull_sample, pull_recordings, app.pull.relations) goes through
+MBClient so pacing, retries and connection reuse live in one place:
+- an AdaptiveLimiter spaces request starts while earlier requests are still
+  in flight; it starts at MB_RATE_LIMIT_MS and follows Retry-After and
+  X-RateLimit-* up to MB_RATE_MAX_PER_S (default: the starting rate on
+  musicbrainz.org, 50 req/s on other hosts such as a local mirror)
+- 503s and transport errors back off with jitter instead of fixed sleeps; a
+  429/503 carrying Retry-After is waited out once, by the limiter's shared
+  pause gating the retry's acquire()
+- with MB_RATE_LOCK set, the limiter is a SharedLimiter on that file so
+  every puller process on the host shares one budget
+- a semaphore bounds in-flight requests (MB_MAX_IN_FLIGHT)
+- one keep-alive requests.Session with a sized pool and gzip accepted
+- an optional ResponseCache (app/pull/cache.py) answers repeat lookups
+  without spending a rate-limit token
+
+requests is blocking, so each call runs on a worker thread via
+asyncio.to_thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+from typing import Any, AsyncIterator, Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.pull.cache import ResponseCache
+from app.pull.ratelimit import AdaptiveLimiter, SharedLimiter, TokenBucket
+
+MB_BASE_URL = os.getenv("MB_BASE_URL", "https://musicbrainz.org/ws/2")
+USER_AGENT = os.getenv("USER_AGENT", "music-explorer/0.1 (example@example.com)")
+RATE_LIMIT_MS = int(os.getenv("MB_RATE_LIMIT_MS", "1100"))
+MAX_RETRIES = int(os.getenv("MB_MAX_RETRIES", "3"))
+TIMEOUT_S = int(os.getenv("MB_TIMEOUT_S", "30"))
+MAX_IN_FLIGHT = int(os.getenv("MB_MAX_IN_FLIGHT", "4"))
+RATE_MAX_PER_S = float(os.getenv("MB_RATE_MAX_PER_S", "0"))
+MIRROR_RATE_MAX_PER_S = 50.0
+RATE_LOCK = os.getenv("MB_RATE_LOCK", "")
+
+# (url, elapsed_ms, status, nbytes) -> None; status is None on transport errors
+ResponseHook = Callable[[str, int, "int | None", int], None]
+
+
+def default_max_rate(base_url: str) -> float:
+    if RATE_MAX_PER_S > 0:
+        return RATE_MAX_PER_S
+    if "musicbrainz.org" in base_url:
+        return 1000.0 / max(1, RATE_LIMIT_MS)  # never probe past the public limit
+    return MIRROR_RATE_MAX_PER_S
+
+
+def default_limiter(base_url: str, rate_limit_ms: int) -> TokenBucket:
+    max_rate = default_max_rate(base_url)
+    if RATE_LOCK:
+        return SharedLimiter.from_interval_ms(
+            RATE_LOCK, rate_limit_ms, max_rate=max_rate
+        )
+    return AdaptiveLimiter.from_interval_ms(rate_limit_ms, max_rate=max_rate)
+
+
+class MBHTTPError(RuntimeError):
+    def __init__(self, status: int | None, url: str, detail: Any = None):
+        self.status = status
+        self.url = url
+        self.detail = detail
+        super().__init__(f"HTTP {status} on {url}")
+
+
+class MBClient:
+    def __init__(
+        self,
+        base_url: str = MB_BASE_URL,
+        user_agent: str = USER_AGENT,
+        *,
+        rate_limit_ms: int = RATE_LIMIT_MS,
+        timeout_s: int = TIMEOUT_S,
+        retries: int = MAX_RETRIES,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        limiter: TokenBucket | None = None,
+        on_response: ResponseHook | None = None,
+        cache: ResponseCache | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout_s = timeout_s
+        self.retries = max(1, retries)
+        self.max_in_flight = max(1, max_in_flight)
+        self.limiter = limiter or default_limiter(self.base_url, rate_limit_ms)
+        self.on_response = on_response
+        self.cache = cache
+        self.requests_sent = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_in_flight, max_retries=0
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "User-Agent": user_agent,
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip, deflate",
+            }
+        )
+        self._sem: asyncio.Semaphore | None = None
+
+    async def __aenter__(self) -> "MBClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+    def url(self, path: str) -> str:
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _send(
+        self, url: str, params: dict[str, Any], headers: dict[str, str] | None = None
+    ) -> requests.Response:
+        t0 = time.perf_counter()
+        try:
+            r = self.session.get(
+                url, params=params, headers=headers, timeout=self.timeout_s
+            )
+        except requests.RequestException:
+            if self.on_response:
+                self.on_response(url, int((time.perf_counter() - t0) * 1000), None, 0)
+            raise
+        if self.on_response:
+            self.on_response(
+                r.url,
+                int((time.perf_counter() - t0) * 1000),
+                r.status_code,
+                len(r.content),
+            )
+        return r
+
+    async def get_json(self, path: str, params: dict[str, Any] | None = None) -> dict:
+        """GET ``path`` (relative to base_url or absolute) and decode JSON.
+
+        Fresh cache hits return without waiting on the limiter. Retries
+        429/5xx and transport errors; raises MBHTTPError on 4xx or when
+        retries are exhausted.
+        """
+        url = self.url(path)
+        q = dict(params or {})
+        q["fmt"] = "json"
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+
+        key = entry = None
+        cond: dict[str, str] = {}
+        if self.cache is not None:
+            key = self.cache.key(url, q)
+            entry = self.cache.lookup(key)
+            if entry is not None and self.cache.is_fresh(entry):
+                self.cache.hits += 1
+                return entry["body"]
+            cond = self.cache.validators(entry) if entry is not None else {}
+
+        last: MBHTTPError | None = None
+        async with self._sem:
+            for attempt in range(1, self.retries + 1):
+                await self.limiter.acquire()
+                self.requests_sent += 1
+                try:
+                    r = await asyncio.to_thread(self._send, url, q, cond or None)
+                except requests.RequestException as e:
+                    last = MBHTTPError(None, url, str(e))
+                    self.limiter.observe(None, {})
+                    if attempt < self.retries:
+                        await asyncio.sleep(self.limiter.retry_wait(attempt, None, {}))
+                    continue
+                self.limiter.observe(r.status_code, r.headers)
+                if r.status_code == 304 and entry is not None:
+                    self.cache.hits += 1
+                    self.cache.refresh(key, entry)
+                    return entry["body"]
+                if r.status_code == 200:
+                    data = r.json()
+                    if self.cache is not None:
+                        self.cache.misses += 1
+                        self.cache.put(key, url, data, r.headers)
+                    return data
+                if 400 <= r.status_code < 500 and r.status_code != 429:
+                    # surface MB error payload to help debugging
+                    try:
+                        detail = r.json()
+                    except ValueError:
+                        detail = r.text
+                    raise MBHTTPError(r.status_code, r.url, detail)
+                last = MBHTTPError(r.status_code, r.url, r.text[:200])
+                if attempt < self.retries:
+                    await asyncio.sleep(
+                        self.limiter.retry_wait(attempt, r.status_code, r.headers)
+                    )
+        raise last or MBHTTPError(None, url)
+
+    async def browse(
+        self,
+        path: str,
+        params: dict[str, Any],
+        item_key: str,
+        *,
+        offset: int = 0,
+        limit: int | None = None,
+        page_size: int = 100,
+    ) -> AsyncIterator[tuple[int, list[dict]]]:
+        """Yield (next_offset, items) for a paged browse/search, in offset order.
+
+        The first page's ``count`` plans every remaining offset up front (capped
+        by ``limit`` items); those pages are dispatched together so their
+        latency overlaps under the limiter, and no trailing empty page is
+        requested.
+        """
+        if limit is not None and limit <= 0:
+            return
+        q = dict(params) | {"limit": page_size}
+        first = await self.get_json(path, q | {"offset": offset})
+        items = first.get(item_key, [])
+        if not items:
+            return
+        yield offset + page_size, items
+
+        offsets = range(offset + page_size, int(first.get("count", 0)), page_size)
+        if limit is not None:
+            offsets = offsets[: math.ceil(max(0, limit - len(items)) / page_size)]
+        tasks = [
+            asyncio.create_task(self.get_json(path, q | {"offset": o})) for o in offsets
+        ]
+        try:
+            for o, task in zip(offsets, tasks):
+                items = (await task).get(item_key, [])
+                if not items:
+                    break
+                yield o + page_size, items
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # mark retrieved; the caller saw the first
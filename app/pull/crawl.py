@@ -0,0 +1,221 @@
+# app/pull/crawl.py
+"""
+Budgeted collaboration-graph crawler.
+
+Starts from seed artists and expands outward through artist-credits found in
+their recordings and release groups. The frontier is a priority queue keyed
+by co-credit count with already-visited artists, so the most connected
+artists are pulled first; the crawl stops once --budget requests have been
+sent (cache hits are free). Uses the shared MBClient and writes the same
+formats as the other pullers (compressed per MB_RAW_CODEC):
+
+  <out-dir>/artist_relations.jsonl   (artist lookups, INC_ARTIST)
+  <out-dir>/recordings.jsonl         (recording browse, artist-credits)
+
+Output goes to its own directory (data/raw/crawl by default) so its
+checkpoint never fights pull_recordings/relations over the same files;
+app.pipeline.clean reads it next to the other JSONL pulls.
+Frontier scores and visited artists live in <out-dir>/crawl.ckpt, so an
+interrupted crawl resumes; --fresh starts over.
+
+  python -m app.pull.crawl --seed "<mbid>,<mbid>" --budget 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import os
+import sys
+import urllib.parse as up
+from collections import Counter
+from pathlib import Path
+
+from app.pull.cache import CACHE_ENABLED, ResponseCache
+from app.pull.client import MB_BASE_URL, USER_AGENT, MBClient, MBHTTPError
+from app.pull.metrics import kpi_recorder
+from app.pull.relations import INC_ARTIST, trim_artist
+from app.pull.state import Checkpoint
+from app.store import rawio
+
+OUT_DIR = Path("data/raw/crawl")
+
+
+def _credited(obj: dict) -> list[str]:
+    ids = []
+    for ac in obj.get("artist-credit") or []:
+        aid = (ac.get("artist") or {}).get("id")
+        if aid and aid not in ids:
+            ids.append(aid)
+    return ids
+
+
+class Frontier:
+    """Max-heap of artist MBIDs by co-credit score, with lazy updates."""
+
+    def __init__(self, scores: dict[str, float] | None = None):
+        self.scores: dict[str, float] = dict(scores or {})
+        self._heap = [(-s, mbid) for mbid, s in self.scores.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def bump(self, mbid: str, by: float = 1.0) -> None:
+        self.scores[mbid] = self.scores.get(mbid, 0.0) + by
+        heapq.heappush(self._heap, (-self.scores[mbid], mbid))
+
+    def pop(self) -> tuple[str, float] | None:
+        while self._heap:
+            neg, mbid = heapq.heappop(self._heap)
+            # skip entries superseded by a later bump (or already popped)
+            if self.scores.get(mbid) == -neg:
+                del self.scores[mbid]
+                return mbid, -neg
+        return None
+
+
+async def _resolve(client: MBClient, token: str) -> str | None:
+    if len(token) == 36 and token.count("-") == 4:
+        return token
+    hits = await client.get_json("artist", {"query": f"artist:{token}", "limit": 1})
+    return (hits.get("artists") or [{}])[0].get("id")
+
+
+async def crawl(
+    client: MBClient,
+    seeds: list[str],
+    budget: int,
+    out_dir: Path = OUT_DIR,
+    limit_per_artist: int = 200,
+    fresh: bool = False,
+) -> dict[str, int]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ckpt = Checkpoint(
+        out_dir / "crawl.ckpt",
+        {
+            "artists": rawio.physical(out_dir / "artist_relations.jsonl"),
+            "recordings": rawio.physical(out_dir / "recordings.jsonl"),
+        },
+        fresh=fresh,
+        seen=out_dir / "recordings.jsonl.seen",
+    )
+    visited = {t for t, st in ckpt.state["seeds"].items() if st.get("done")}
+    frontier = Frontier(ckpt.state.get("frontier"))
+    if not ckpt.resumed:
+        for t in seeds:
+            mbid = await _resolve(client, t)
+            if mbid:
+                frontier.bump(mbid, float("inf"))  # seeds go first
+
+    def remaining() -> int:
+        return budget - client.requests_sent
+
+    with ckpt:
+        while len(frontier) and remaining() > 0:
+            mbid, score = frontier.pop()
+            if mbid in visited:
+                continue
+            co: Counter[str] = Counter()
+            artist_line = None
+            try:
+                a_obj = await client.get_json(
+                    f"artist/{up.quote(mbid)}", {"inc": INC_ARTIST}
+                )
+                a_obj["_crawl_score"] = score if score != float("inf") else None
+                # written once the artist is done: a retried artist would
+                # otherwise append its line again
+                artist_line = trim_artist(a_obj)
+
+                # one RG page for release-level co-credits, recordings up to
+                # the per-artist cap (and what is left of the budget)
+                rg_page = await client.get_json(
+                    "release-group",
+                    {"artist": mbid, "limit": 100, "inc": "artist-credits"},
+                )
+                for rg in rg_page.get("release-groups") or []:
+                    co.update(_credited(rg))
+                cap = min(limit_per_artist, max(0, remaining()) * 100)
+                async for _, recs in client.browse(
+                    "recording",
+                    {"artist": mbid, "inc": "artist-credits"},
+                    "recordings",
+                    limit=cap,
+                ):
+                    for rec in recs:
+                        co.update(_credited(rec))
+                        if ckpt.mark_seen(rec.get("id")):
+                            ckpt.write("recordings", rec)
+            except MBHTTPError as e:
+                print(f"[WARN] {mbid}: HTTP {e.status}", file=sys.stderr)
+                if e.status is None or e.status >= 500:
+                    frontier.bump(mbid, score)  # retry later in this crawl
+                    continue
+
+            if artist_line is not None:
+                ckpt.write("artists", artist_line)
+            visited.add(mbid)
+            for peer, n in co.items():
+                if peer != mbid and peer not in visited:
+                    frontier.bump(peer, n)
+            ckpt.state["frontier"] = frontier.scores
+            ckpt.finish(mbid)
+            print(
+                f"[INFO] {mbid}: {sum(co.values())} co-credits, "
+                f"frontier={len(frontier)} requests={client.requests_sent}/{budget}"
+            )
+
+    return {
+        "artists": len(visited),
+        "recordings": len(ckpt.seen),
+        "frontier": len(frontier),
+        "requests": client.requests_sent,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", default=MB_BASE_URL)
+    ap.add_argument("--user-agent", default=USER_AGENT)
+    ap.add_argument(
+        "--seed",
+        default=os.getenv("ARTISTS_SEED_MBIDS") or os.getenv("ARTISTS_SEED", ""),
+        help="Comma-separated names or MBIDs",
+    )
+    ap.add_argument(
+        "--budget", type=int, default=int(os.getenv("MB_CRAWL_BUDGET", "500"))
+    )
+    ap.add_argument("--limit-per-artist", type=int, default=200)
+    ap.add_argument("--out-dir", default=str(OUT_DIR))
+    ap.add_argument("--fresh", action="store_true")
+    ap.add_argument("--no-cache", action="store_true", help="bypass data/cache")
+    args = ap.parse_args()
+
+    seeds = [s.strip() for s in args.seed.split(",") if s.strip()]
+    if not seeds:
+        raise SystemExit("No seeds: pass --seed or set ARTISTS_SEED_MBIDS")
+    cache = None if args.no_cache or not CACHE_ENABLED else ResponseCache()
+
+    async def _run(kpi):
+        async with MBClient(
+            args.base_url, args.user_agent, on_response=kpi, cache=cache
+        ) as client:
+            return await crawl(
+                client,
+                seeds,
+                args.budget,
+                Path(args.out_dir),
+                args.limit_per_artist,
+                args.fresh,
+            )
+
+    with kpi_recorder("crawl") as kpi:
+        stats = asyncio.run(_run(kpi))
+    print(f"[INFO] crawl done: {stats}")
+    if cache is not None:
+        print(f"[INFO] {cache.summary()}")
+
+
+if __name__ == "__main__":
+    main()
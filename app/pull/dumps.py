@@ -0,0 +1,252 @@
+# app/pull/dumps.py
+"""
+Ingest from the MusicBrainz JSON data dumps instead of the web service.
+
+Reads the official line-delimited dumps (artist, release-group, recording,
+release) straight from local disk, compressed or not, filters them to a seed
+set (names or MBIDs) or to its collaboration neighbourhood (--hops N: artists
+co-credited on release groups/recordings), and writes the raw layout the rest
+of the pipeline already consumes:
+
+  data/raw/artist_relations.jsonl
+  data/raw/release_group_relations.jsonl
+  data/raw/recordings.jsonl
+  data/raw/releases.jsonl
+
+all of which app.pipeline.clean turns into the clean parquet tables.
+
+Outputs go through app/store/rawio.py, so they are compact and compressed
+per MB_RAW_CODEC like the web-service pulls. Memory stays bounded: files are
+streamed line by line (tar members included), only MBID sets are kept between
+passes, and a line is json-decoded only when one of the UUIDs it contains is in
+the current selection.
+
+Accepted file names per entity in --dump-dir: <entity>.tar.xz|.tar.gz|.tar
+(official layout, member mbdump/<entity>), <entity>.jsonl[.gz|.xz|.bz2],
+mbdump/<entity> or <entity>.
+
+  python -m app.pull.dumps --dump-dir ~/mb-json --seed "Radiohead,Daft Punk" --hops 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import bz2
+import gzip
+import json
+import lzma
+import re
+import tarfile
+from contextlib import ExitStack
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+from app.pull.projection import projector
+from app.store import rawio
+
+RAW_DIR = Path("data/raw")
+ENTITIES = ("artist", "release-group", "recording", "release")
+# pull_recordings / relations checkpoint + seen files describing the outputs
+STALE_STATE = (
+    "recordings.jsonl.ckpt",
+    "recordings.jsonl.seen",
+    "relations.ckpt",
+    "release_group_relations.seen",
+)
+
+# relations JSONL keep only the fields downstream reads (app/pull/projection.py)
+trim_artist = projector("artists")
+trim_rg = projector("release_groups")
+
+_UUID = re.compile(rb"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+_MBID = re.compile(r"^[0-9a-f]{8}(-[0-9a-f]{4}){3}-[0-9a-f]{12}$", re.I)
+_OPENERS = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}
+
+
+def find_dump(dump_dir: Path, entity: str) -> Path | None:
+    for name in (
+        f"{entity}.tar.xz",
+        f"{entity}.tar.gz",
+        f"{entity}.tar",
+        f"{entity}.jsonl.gz",
+        f"{entity}.jsonl.xz",
+        f"{entity}.jsonl.bz2",
+        f"{entity}.jsonl",
+        f"mbdump/{entity}",
+        entity,
+    ):
+        p = dump_dir / name
+        if p.is_file():
+            return p
+    return None
+
+
+def iter_lines(path: Path, entity: str) -> Iterator[bytes]:
+    """Stream raw JSON lines from a dump file without extracting it."""
+    if ".tar" in path.suffixes:
+        # "r|*" = sequential stream, no seeking, any compression
+        with tarfile.open(path, mode="r|*") as tf:
+            for member in tf:
+                if member.isfile() and member.name.endswith(f"mbdump/{entity}"):
+                    f = tf.extractfile(member)
+                    if f is not None:
+                        yield from f
+                    return
+        return
+    opener = _OPENERS.get(path.suffix, open)
+    with opener(path, "rb") as f:
+        yield from f
+
+
+def iter_matching(
+    path: Path, entity: str, ids: set[str] | None = None
+) -> Iterator[dict]:
+    """Yield decoded entities; with ``ids`` only lines mentioning one of them."""
+    for line in iter_lines(path, entity):
+        if ids is not None and not any(m.decode() in ids for m in _UUID.findall(line)):
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def credited_ids(obj: dict) -> list[str]:
+    out = []
+    for ac in obj.get("artist-credit") or []:
+        aid = (ac.get("artist") or {}).get("id")
+        if aid:
+            out.append(aid)
+    return out
+
+
+def resolve_seeds(dump_dir: Path, tokens: Iterable[str]) -> set[str]:
+    mbids = {t for t in tokens if _MBID.match(t)}
+    names = {t.casefold() for t in tokens if not _MBID.match(t)}
+    if names:
+        path = find_dump(dump_dir, "artist")
+        if path is None:
+            raise SystemExit(f"artist dump not found in {dump_dir}")
+        for line in iter_lines(path, "artist"):
+            # cheap prefilter before decoding: the name must appear verbatim
+            low = line.decode("utf-8", "replace").casefold()
+            if not any(n in low for n in names):
+                continue
+            a = json.loads(line)
+            if (a.get("name") or "").casefold() in names:
+                mbids.add(a["id"])
+    return mbids
+
+
+def expand(dump_dir: Path, seeds: set[str], hops: int) -> set[str]:
+    """Add artists co-credited with the selection, ``hops`` times."""
+    selected, frontier = set(seeds), set(seeds)
+    for hop in range(hops):
+        found: set[str] = set()
+        for entity in ("release-group", "recording"):
+            path = find_dump(dump_dir, entity)
+            if path is None:
+                continue
+            for obj in iter_matching(path, entity, frontier):
+                team = credited_ids(obj)
+                if frontier.intersection(team):
+                    found.update(team)
+        frontier = found - selected
+        selected |= frontier
+        print(f"[INFO] hop {hop + 1}: +{len(frontier)} artists ({len(selected)})")
+        if not frontier:
+            break
+    return selected
+
+
+def ingest(
+    dump_dir: Path | str,
+    seeds: Iterable[str],
+    hops: int = 0,
+    out_dir: Path | str = RAW_DIR,
+) -> dict[str, int]:
+    dump_dir, out_dir = Path(dump_dir), Path(out_dir)
+    seed_ids = resolve_seeds(dump_dir, [s.strip() for s in seeds if s.strip()])
+    if not seed_ids:
+        raise SystemExit("no seed artists matched the dump")
+    artists = expand(dump_dir, seed_ids, hops) if hops else seed_ids
+
+    # the JSONL outputs are replaced, so web-service checkpoints/seen-sets
+    # describing the old contents would corrupt a later resume
+    for stale in STALE_STATE:
+        (out_dir / stale).unlink(missing_ok=True)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    counts = dict.fromkeys(ENTITIES, 0)
+    rg_ids: set[str] = set()
+
+    def write_line(f: IO[str], obj: dict) -> None:
+        f.write(rawio.dumps(obj) + "\n")
+
+    with ExitStack() as stack:
+
+        def out(name: str) -> IO[str]:
+            return stack.enter_context(rawio.open_write(out_dir / name))
+
+        path = find_dump(dump_dir, "artist")
+        if path is not None:
+            fa = out("artist_relations.jsonl")
+            for a in iter_matching(path, "artist", artists):
+                if a.get("id") not in artists:
+                    continue
+                if a["id"] in seed_ids:
+                    a["_seed_mbid"] = a["id"]
+                write_line(fa, trim_artist(a))
+                counts["artist"] += 1
+
+        path = find_dump(dump_dir, "release-group")
+        if path is not None:
+            frg = out("release_group_relations.jsonl")
+            for rg in iter_matching(path, "release-group", artists):
+                team = [i for i in credited_ids(rg) if i in artists]
+                if not team:
+                    continue
+                rg["_seed_artist_mbid"] = team[0]
+                rg.setdefault(
+                    "artist-credit-phrase",
+                    "".join(
+                        (ac.get("name") or "") + (ac.get("joinphrase") or "")
+                        for ac in rg.get("artist-credit") or []
+                    ),
+                )
+                write_line(frg, trim_rg(rg))
+                rg_ids.add(rg["id"])
+                counts["release-group"] += 1
+
+        path = find_dump(dump_dir, "recording")
+        if path is not None:
+            frec = out("recordings.jsonl")
+            for rec in iter_matching(path, "recording", artists):
+                if artists.intersection(credited_ids(rec)):
+                    write_line(frec, rec)
+                    counts["recording"] += 1
+
+        path = find_dump(dump_dir, "release")
+        if path is not None and rg_ids:
+            frel = out("releases.jsonl")
+            for rel in iter_matching(path, "release", rg_ids):
+                if (rel.get("release-group") or {}).get("id") in rg_ids:
+                    write_line(frel, rel)
+                    counts["release"] += 1
+
+    print(f"[INFO] dump ingest -> {out_dir}: {counts}")
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dump-dir", required=True, help="dir with MB JSON dump files")
+    ap.add_argument("--seed", required=True, help="Comma-separated names or MBIDs")
+    ap.add_argument("--hops", type=int, default=0, help="collaboration hops")
+    ap.add_argument("--out", default=str(RAW_DIR))
+    args = ap.parse_args()
+    ingest(args.dump_dir, args.seed.split(","), hops=args.hops, out_dir=args.out)
+
+
+if __name__ == "__main__":
+    main()
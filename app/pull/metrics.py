@@ -0,0 +1,245 @@
+# app/pull/metrics.py
+"""
+Buffered KPI latency recorder for the pull clients.
+
+A LatencyRecorder is passed to MBClient as ``on_response``. Each call only
+appends to an in-memory buffer and updates a per-endpoint histogram under a
+lock; the buffer is written to data/marts/kpi_latency_samples.csv in batches
+by a single background thread, so no request pays for file I/O. close()
+flushes what is left and appends one row per endpoint (plus "ALL") to the
+data/marts/kpi_latency_summary.csv mart: requests, error rate, bytes,
+p50/p95/p99/max latency in whole ms (like the samples) and the share of
+calls answered under KPI_TARGET_MS (the README's "under three seconds"
+success metric).
+
+Endpoints are normalised to the ws/2 path with MBIDs replaced, e.g.
+``artist/{mbid}`` or ``recording`` (browse/search).
+
+MB_KPI=0 disables recording.
+"""
+
+from __future__ import annotations
+
+import bisect
+import csv
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+MARTS_DIR = Path("data/marts")
+SAMPLES_CSV = MARTS_DIR / "kpi_latency_samples.csv"
+SUMMARY_CSV = MARTS_DIR / "kpi_latency_summary.csv"
+KPI_ENABLED = os.getenv("MB_KPI", "1") == "1"
+KPI_TARGET_MS = int(os.getenv("KPI_TARGET_MS", "3000"))
+FLUSH_EVERY = 200
+
+SAMPLE_COLUMNS = ["timestamp", "endpoint", "elapsed_ms", "status"]
+SUMMARY_COLUMNS = [
+    "run_at",
+    "source",
+    "endpoint",
+    "requests",
+    "errors",
+    "error_rate",
+    "bytes",
+    "mean_ms",
+    "p50_ms",
+    "p95_ms",
+    "p99_ms",
+    "max_ms",
+    "under_target_pct",
+]
+
+_MBID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+# log-spaced bucket edges, 1 ms .. ~10 min, 5% wide: quantiles within 5%
+_EDGES = [1.05**i for i in range(int(math.log(600_000) / math.log(1.05)) + 1)]
+
+
+def endpoint_of(url: str) -> str:
+    path = urlparse(url).path
+    if "/ws/2/" in path:
+        path = path.split("/ws/2/", 1)[1]
+    return _MBID.sub("{mbid}", path.strip("/")) or "/"
+
+
+class Histogram:
+    """Fixed log-bucket latency histogram (bounded memory per endpoint)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(_EDGES) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(_EDGES, ms)] += 1
+        self.n += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def merge(self, other: "Histogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.n += other.n
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        if not self.n:
+            return 0.0
+        rank = q * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= rank:
+                # bucket upper edge, but never above the observed max
+                return min(_EDGES[min(i, len(_EDGES) - 1)], self.max)
+        return self.max
+
+    def share_under(self, ms: float) -> float:
+        if not self.n:
+            return 0.0
+        i = bisect.bisect_right(_EDGES, ms)
+        return sum(self.counts[:i]) / self.n
+
+
+class _Stats:
+    def __init__(self):
+        self.hist = Histogram()
+        self.errors = 0
+        self.bytes = 0
+
+
+class LatencyRecorder:
+    def __init__(
+        self,
+        source: str,
+        samples_path: Path | str = SAMPLES_CSV,
+        summary_path: Path | str = SUMMARY_CSV,
+        flush_every: int = FLUSH_EVERY,
+        target_ms: int = KPI_TARGET_MS,
+    ):
+        self.source = source
+        self.samples_path = Path(samples_path)
+        self.summary_path = Path(summary_path)
+        self.flush_every = max(1, flush_every)
+        self.target_ms = target_ms
+        self.stats: dict[str, _Stats] = {}
+        self._buf: list[list] = []
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kpi")
+        self._pending: list[Future] = []
+
+    def __enter__(self) -> "LatencyRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __call__(self, url: str, elapsed_ms: int, status: int | None, nbytes: int):
+        ep = endpoint_of(url)
+        row = [
+            time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            url,
+            elapsed_ms,
+            status if status is not None else "error",
+        ]
+        with self._lock:
+            st = self.stats.get(ep)
+            if st is None:
+                st = self.stats[ep] = _Stats()
+            st.hist.add(elapsed_ms)
+            st.bytes += nbytes
+            if status is None or status >= 400:
+                st.errors += 1
+            self._buf.append(row)
+            if len(self._buf) >= self.flush_every:
+                self._submit()
+
+    def _submit(self) -> None:
+        """Hand the buffer to the writer thread; call with the lock held."""
+        batch, self._buf = self._buf, []
+        self._pending = [f for f in self._pending if not f.done()]
+        if batch:
+            self._pending.append(self._writer.submit(self._write_samples, batch))
+
+    def _write_samples(self, rows: list[list]) -> None:
+        self.samples_path.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.samples_path.exists()
+        with self.samples_path.open("a", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            if new:
+                w.writerow(SAMPLE_COLUMNS)
+            w.writerows(rows)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._submit()
+            pending, self._pending = self._pending, []
+        for fut in pending:
+            fut.result()
+
+    def summary_rows(self) -> list[dict]:
+        run_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        total = _Stats()
+        rows = []
+        with self._lock:
+            items = sorted(self.stats.items())
+            for _, st in items:
+                total.hist.merge(st.hist)
+                total.errors += st.errors
+                total.bytes += st.bytes
+        for ep, st in items + [("ALL", total)]:
+            h = st.hist
+            if not h.n:
+                continue
+            rows.append(
+                {
+                    "run_at": run_at,
+                    "source": self.source,
+                    "endpoint": ep,
+                    "requests": h.n,
+                    "errors": st.errors,
+                    "error_rate": round(st.errors / h.n, 4),
+                    "bytes": st.bytes,
+                    "mean_ms": round(h.total / h.n, 1),
+                    "p50_ms": round(h.quantile(0.50)),
+                    "p95_ms": round(h.quantile(0.95)),
+                    "p99_ms": round(h.quantile(0.99)),
+                    "max_ms": round(h.max),
+                    "under_target_pct": round(100 * h.share_under(self.target_ms), 2),
+                }
+            )
+        return rows
+
+    def close(self) -> None:
+        self.flush()
+        self._writer.shutdown(wait=True)
+        rows = self.summary_rows()
+        if not rows:
+            return
+        self.summary_path.parent.mkdir(parents=True, exist_ok=True)
+        new = not self.summary_path.exists()
+        with self.summary_path.open("a", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+            if new:
+                w.writeheader()
+            w.writerows(rows)
+        overall = rows[-1]
+        print(
+            f"[INFO] KPI {self.source}: {overall['requests']} requests, "
+            f"p95={overall['p95_ms']:d} ms, "
+            f"{overall['under_target_pct']}% under {self.target_ms} ms "
+            f"-> {self.summary_path}"
+        )
+
+
+def kpi_recorder(source: str):
+    """LatencyRecorder for ``source``, or a no-op context when MB_KPI=0."""
+    return LatencyRecorder(source) if KPI_ENABLED else nullcontext(None)
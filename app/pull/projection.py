@@ -0,0 +1,123 @@
+# app/pull/projection.py
+"""
+Ingest-time field projection for the relations JSONL.
+
+Artist lookups ask MusicBrainz for a broad INC_ARTIST (recordings, works,
+every relation type) and each relation embeds its full target entity, yet
+the clean layer and the collab crawl read only a handful of fields. Before an
+object is written to artist_relations.jsonl or release_group_relations.jsonl it
+is cut down to:
+
+  * the fields DATA_DICTIONARY.csv catalogues for the matching table
+    (``artists`` / ``release_groups``), in its path syntax
+    (``relations[].type``, ``area.name``), plus
+  * EXTRA_FIELDS: what downstream code reads that the dictionary sample
+    does not show (relation target ids, RG credits and releases).
+
+A path keeps its whole subtree unless a longer path refines it; keys starting
+with ``_`` (pipeline annotations such as ``_seed_mbid``) are always kept.
+The JSON snapshot documents the dictionary itself is emitted from are left
+untouched. MB_RAW_PROJECT=0 writes full payloads.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+from collections.abc import Iterable
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+DD_PATH = Path("DATA_DICTIONARY.csv")
+ENABLED = os.getenv("MB_RAW_PROJECT", "1") == "1"
+
+_TARGET_IDS = [
+    f"relations[].{t}.id"
+    for t in ("artist", "label", "work", "recording", "release-group", "release")
+]
+EXTRA_FIELDS = {
+    "artists": [
+        "id",
+        "name",
+        "relations[].begin",
+        "relations[].end",
+        "relations[].artist.name",
+        "relations[].label.name",
+        *_TARGET_IDS,
+    ],
+    "release_groups": [
+        "id",
+        "first-release-date",
+        # clean prefers the credit phrase over rebuilding it from artist-credit
+        "artist-credit-phrase",
+        "artist-credit[].name",
+        "artist-credit[].joinphrase",
+        "artist-credit[].artist.id",
+        "artist-credit[].artist.name",
+        "releases[].id",
+        "releases[].country",
+        "releases[].date",
+        "relations[].type",
+        "relations[].target-type",
+        "relations[].begin",
+        "relations[].end",
+        "relations[].artist.name",
+        "relations[].label.name",
+        *_TARGET_IDS,
+    ],
+}
+
+Tree = dict  # field name -> subtree; {} keeps the whole value
+
+
+def dictionary_fields(table: str, path: Path | str = DD_PATH) -> list[str]:
+    """Field paths DATA_DICTIONARY.csv lists for ``table`` ([] if absent)."""
+    p = Path(path)
+    if not p.exists():
+        return []
+    with p.open(newline="", encoding="utf-8") as f:
+        return [
+            r["field"]
+            for r in csv.DictReader(f)
+            if r.get("table") == table and r.get("field") and r["field"] != table
+        ]
+
+
+def compile_fields(fields: Iterable[str]) -> Tree:
+    tree: Tree = {}
+    for field in fields:
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part.removesuffix("[]"), {})
+    return tree
+
+
+def project(value: Any, tree: Tree) -> Any:
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [project(v, tree) for v in value]
+    if isinstance(value, dict):
+        return {
+            k: v if k.startswith("_") else project(v, tree[k])
+            for k, v in value.items()
+            if k in tree or k.startswith("_")
+        }
+    return value
+
+
+@cache
+def tree_for(table: str, path: Path | str = DD_PATH) -> Tree:
+    fields = dictionary_fields(table, path)
+    if not fields:
+        print(f"[WARN] no {table} fields in {path}; raw {table} kept unprojected")
+        return {}
+    return compile_fields(fields + EXTRA_FIELDS.get(table, []))
+
+
+def projector(table: str):
+    """``obj -> obj`` for ``table``; identity when MB_RAW_PROJECT=0."""
+    if not ENABLED:
+        return lambda obj: obj
+    return lambda obj: project(obj, tree_for(table))
@@ -0,0 +1,278 @@
+# app/pull/ratelimit.py
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Iterator, Mapping
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, SharedLimiter unavailable
+    fcntl = None
+
+BACKOFF_BASE_S = 0.5
+BACKOFF_CAP_S = 60.0
+IDLE_RESET_S = 60.0
+
+
+class TokenBucket:
+    """Async token bucket that spaces request *starts*.
+
+    ``rate_per_s`` tokens are added per second up to ``burst``. Callers await
+    :meth:`acquire` right before sending; the wait runs while earlier requests
+    are still in flight, so latency overlaps the pacing instead of stacking.
+    """
+
+    def __init__(self, rate_per_s: float, burst: int = 1):
+        if rate_per_s <= 0:
+            raise ValueError("rate_per_s must be > 0")
+        self.rate = float(rate_per_s)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock: asyncio.Lock | None = None
+
+    @classmethod
+    def from_interval_ms(cls, interval_ms: int, burst: int = 1) -> "TokenBucket":
+        return cls(1000.0 / max(1, interval_ms), burst=burst)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # one waiter at a time keeps the grant order FIFO
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+    def observe(self, status: int | None, headers: Mapping[str, str]) -> None:
+        """Feed back a response; the fixed bucket ignores it."""
+
+    def retry_delay(self, attempt: int, headers: Mapping[str, str] | None = None):
+        """Seconds to wait before retry ``attempt`` (1-based).
+
+        Honours Retry-After when the server sent one, otherwise "full jitter"
+        exponential backoff so concurrent retries do not line up.
+        """
+        after = retry_after_s(headers or {})
+        if after is not None:
+            return after
+        return random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * 2**attempt))
+
+    def retry_wait(
+        self, attempt: int, status: int | None, headers: Mapping[str, str]
+    ) -> float:
+        """Seconds a client sleeps before retry ``attempt`` of a failed request."""
+        return self.retry_delay(attempt, headers)
+
+
+class AdaptiveLimiter(TokenBucket):
+    """TokenBucket whose rate follows what the server reports.
+
+    - X-RateLimit-Remaining / X-RateLimit-Reset on a response set the rate to
+      what is left of the window (Remaining 0 pauses until Reset)
+    - 503/429 halve the rate and pause every caller for Retry-After (or a
+      jittered backoff), so concurrent tasks do not storm the server
+    - other successes probe upward by ``increase`` per response
+
+    The rate stays within [min_rate, max_rate]; changes of 25% or more since
+    the last log line are printed with the reason.
+    """
+
+    def __init__(
+        self,
+        rate_per_s: float,
+        burst: int = 1,
+        *,
+        min_rate: float | None = None,
+        max_rate: float | None = None,
+        increase: float = 1.1,
+        decrease: float = 0.5,
+        verbose: bool = True,
+    ):
+        super().__init__(rate_per_s, burst=burst)
+        self.min_rate = min_rate or min(self.rate, 0.1)
+        self.max_rate = max(self.rate, max_rate or self.rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.verbose = verbose
+        self._paused_until = 0.0
+        self._logged_rate = self.rate
+
+    @classmethod
+    def from_interval_ms(
+        cls, interval_ms: int, burst: int = 1, **kw
+    ) -> "AdaptiveLimiter":
+        return cls(1000.0 / max(1, interval_ms), burst=burst, **kw)
+
+    @property
+    def effective_rate(self) -> float:
+        return self.rate
+
+    def _set_rate(self, rate: float, reason: str) -> None:
+        self._refill()  # bank tokens earned at the old rate
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+        if self.verbose and abs(self.rate - self._logged_rate) >= 0.25 * min(
+            self.rate, self._logged_rate
+        ):
+            print(
+                f"[INFO] rate limit {self._logged_rate:.2f} -> {self.rate:.2f} req/s"
+                f" ({reason})"
+            )
+            self._logged_rate = self.rate
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe(self, status: int | None, headers: Mapping[str, str]) -> None:
+        if status in (429, 503):
+            self._set_rate(self.rate * self.decrease, f"HTTP {status}")
+            self.pause(self.retry_delay(1, headers))
+            return
+        if status is None or status >= 500:
+            return
+        remaining = _int_header(headers, "X-RateLimit-Remaining")
+        reset = _int_header(headers, "X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            window = reset - time.time()
+            if remaining <= 0 and window > 0:
+                self.pause(window)
+                return
+            self._set_rate(remaining / max(window, 1.0), "X-RateLimit")
+            return
+        self._set_rate(self.rate * self.increase, "probe")
+
+    def retry_wait(
+        self, attempt: int, status: int | None, headers: Mapping[str, str]
+    ) -> float:
+        # observe() already paused every caller for Retry-After; the retry's
+        # acquire() waits that out, so sleeping here as well would double it
+        if status in (429, 503) and retry_after_s(headers) is not None:
+            return 0.0
+        return super().retry_wait(attempt, status, headers)
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self._paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await super().acquire()
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> int | None:
+    try:
+        return int(float(headers.get(name, "")))
+    except ValueError:
+        return None
+
+
+def retry_after_s(headers: Mapping[str, str]) -> float | None:
+    """Retry-After as seconds (delta-seconds or HTTP-date), capped."""
+    value = (headers.get("Retry-After") or "").strip()
+    if not value:
+        return None
+    try:
+        secs = float(value)
+    except ValueError:
+        try:
+            secs = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(BACKOFF_CAP_S, max(0.0, secs))
+
+
+class SharedLimiter(AdaptiveLimiter):
+    """AdaptiveLimiter whose budget is shared by every process on the host.
+
+    Slot times, the current rate and any Retry-After pause live in a small
+    JSON state file guarded by an exclusive flock, so pull_recordings,
+    app.pull.relations, the crawler and sharded workers pointed at the same
+    ``path`` (MB_RATE_LOCK) draw from one global rate instead of one each.
+    Each acquire reserves the next free slot under the lock and sleeps until
+    it outside the lock; a 503 seen by one worker pauses all of them.
+    """
+
+    def __init__(self, path: Path | str, rate_per_s: float, **kw):
+        if fcntl is None:
+            raise RuntimeError("SharedLimiter needs fcntl (POSIX)")
+        super().__init__(rate_per_s, **kw)
+        self.start_rate = self.rate
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        self._held: dict | None = None
+
+    @classmethod
+    def from_interval_ms(
+        cls, path: Path | str, interval_ms: int, **kw
+    ) -> "SharedLimiter":
+        return cls(path, 1000.0 / max(1, interval_ms), **kw)
+
+    @contextmanager
+    def _state(self) -> Iterator[dict]:
+        if self._held is not None:  # nested: already under the lock
+            yield self._held
+            return
+        with self.path.open("r+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                raw = f.read()
+                try:
+                    st = json.loads(raw) if raw else {}
+                except ValueError:
+                    st = {}
+                before = dict(st)
+                self._held = st
+                try:
+                    yield st
+                finally:
+                    self._held = None
+                if st != before:
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(st))
+                    f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def observe(self, status: int | None, headers: Mapping[str, str]) -> None:
+        # adjust from the rate the workers share, not this process's copy, and
+        # write it back under the same lock so no other worker's change (a
+        # halving) lands in between and is overwritten
+        with self._state() as st:
+            self.rate = st.get("rate", self.rate)
+            super().observe(status, headers)
+
+    def _set_rate(self, rate: float, reason: str) -> None:
+        super()._set_rate(rate, reason)
+        with self._state() as st:
+            st["rate"] = self.rate
+
+    def pause(self, seconds: float) -> None:
+        with self._state() as st:
+            st["paused_until"] = max(st.get("paused_until", 0.0), time.time() + seconds)
+
+    async def acquire(self) -> None:
+        with self._state() as st:
+            now = time.time()
+            if now - st.get("next", 0.0) > IDLE_RESET_S:
+                st["rate"] = self.start_rate  # a stale rate from an old run
+            self.rate = st.setdefault("rate", self.rate)
+            slot = max(now, st.get("next", 0.0), st.get("paused_until", 0.0))
+            st["next"] = slot + 1.0 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
@@ -1,12 +1,17 @@
 # app/pull/relations.py
 from __future__ import annotations
 import os
-import time
-import json
+import asyncio
 import urllib.parse as up
 from pathlib import Path
-from typing import Iterable, Dict, Any, List
-import requests
+from typing import Dict, Any
+
+from app.pull.cache import CACHE_ENABLED, ResponseCache
+from app.pull.client import MBClient, MBHTTPError
+from app.pull.metrics import kpi_recorder
+from app.pull.projection import projector
+from app.pull.state import Checkpoint
+from app.store import rawio
 
 MB_BASE_URL = os.getenv("MB_BASE_URL", "https://musicbrainz.org/ws/2")
 USER_AGENT = os.getenv("USER_AGENT", "music-explorer/0.1 (example@example.com)")
@@ -20,8 +25,12 @@ LIMIT_PER_ARTIST = int(os.getenv("LIMIT_PER_ARTIST", "200"))
 
 RAW_DIR = Path("data/raw")
 RAW_DIR.mkdir(parents=True, exist_ok=True)
-OUT_ARTISTS = RAW_DIR / "artist_relations.jsonl"
-OUT_RGS = RAW_DIR / "release_group_relations.jsonl"
+# compressed per MB_RAW_CODEC (app/store/rawio.py)
+OUT_ARTISTS = rawio.physical(RAW_DIR / "artist_relations.jsonl")
+OUT_RGS = rawio.physical(RAW_DIR / "release_group_relations.jsonl")
+# per-seed progress; a rerun resumes here (MB_FRESH=1 starts over)
+CHECKPOINT = RAW_DIR / "relations.ckpt"
+SEEN_RGS = RAW_DIR / "release_group_relations.seen"
 
 INC_ARTIST = (
     "aliases+tags+genres+recordings+release-groups+works+"
@@ -31,104 +40,101 @@ INC_RG = (
     "artist-credits+releases+tags+genres+"
     "artist-rels+label-rels+recording-rels+url-rels+work-rels"
 )
-
-session = requests.Session()
-session.headers.update({"User-Agent": USER_AGENT, "Accept": "application/json"})
-
-
-def _sleep():
-    time.sleep(RATE_LIMIT_MS / 1000.0)
-
-
-def _get(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
-    q = params.copy()
-    q["fmt"] = "json"
-    for attempt in range(1, MAX_RETRIES + 1):
-        _sleep()
-        try:
-            r = session.get(url, params=q, timeout=TIMEOUT_S)
-            if r.status_code == 503:
-                time.sleep(2 * attempt)
-                continue
-            if 400 <= r.status_code < 500:
-                # emit MB error payload to help debugging
-                try:
-                    detail = r.json()
-                except Exception:
-                    detail = r.text
-                raise SystemExit(f"{r.status_code} {r.reason} on {r.url}\n{detail}")
-            r.raise_for_status()
-            return r.json()
-        except requests.RequestException:
-            if attempt == MAX_RETRIES:
-                raise
-            time.sleep(1.5 * attempt)
-    return {}
-
-
-def _paged(
-    endpoint: str, params: Dict[str, Any], item_key: str, limit: int | None = None
-) -> Iterable[Dict[str, Any]]:
-    offset = 0
-    seen = 0
-    while True:
-        page = _get(f"{MB_BASE_URL}/{endpoint}", params | {"offset": offset})
-        items = page.get(item_key, [])
-        for it in items:
-            yield it
-            seen += 1
-            if limit and seen >= limit:
-                return
-        count = page.get("count", 0)
-        offset += len(items)
-        if offset >= count or not items:
-            break
-
-
-def fetch_artist_relations(artist_mbid: str) -> Dict[str, Any]:
-    return _get(f"{MB_BASE_URL}/artist/{up.quote(artist_mbid)}", {"inc": INC_ARTIST})
+# only the fields downstream reads are written (app/pull/projection.py)
+trim_artist = projector("artists")
+trim_rg = projector("release_groups")
+
+
+def _client(on_response=None) -> MBClient:
+    return MBClient(
+        MB_BASE_URL,
+        USER_AGENT,
+        rate_limit_ms=RATE_LIMIT_MS,
+        timeout_s=TIMEOUT_S,
+        retries=MAX_RETRIES,
+        on_response=on_response,
+        cache=ResponseCache() if CACHE_ENABLED else None,
+    )
 
 
-def fetch_artist_release_groups(
-    artist_mbid: str, limit_each: int
-) -> List[Dict[str, Any]]:
-    # We filter to primary artist credits; MB will still return collaborations which we want
-    return list(
-        _paged(
-            "release-group",
-            {"artist": artist_mbid, "limit": 100, "inc": "artist-credits+tags+genres"},
-            "release-groups",
-            limit=limit_each,
+async def _get(client: MBClient, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return await client.get_json(path, params)
+    except MBHTTPError as e:
+        if e.status is not None and 400 <= e.status < 500:
+            # emit MB error payload to help debugging
+            raise SystemExit(f"{e.status} on {e.url}\n{e.detail}")
+        raise
+
+
+async def fetch_artist_relations(client: MBClient, artist_mbid: str) -> Dict[str, Any]:
+    return await _get(client, f"artist/{up.quote(artist_mbid)}", {"inc": INC_ARTIST})
+
+
+async def fetch_rg_relations(client: MBClient, rg_mbid: str) -> Dict[str, Any]:
+    return await _get(client, f"release-group/{up.quote(rg_mbid)}", {"inc": INC_RG})
+
+
+async def _pull_seed(client: MBClient, ckpt: Checkpoint, a: str) -> None:
+    st = ckpt.seed(a)
+    if st["done"]:
+        return
+    if not st.get("artist"):
+        # Artist object with relations
+        a_obj = await fetch_artist_relations(client, a)
+        a_obj["_seed_mbid"] = a
+        ckpt.write("artists", trim_artist(a_obj))
+        st["artist"] = True
+        ckpt.commit()
+
+    # Enumerate a bounded set of release-groups for this artist, one listing
+    # page at a time; each page's RG lookups overlap up to the in-flight bound
+    async for next_offset, rgs in client.browse(
+        "release-group",
+        {"artist": a, "inc": "artist-credits+tags+genres"},
+        "release-groups",
+        offset=st["offset"],
+        limit=LIMIT_PER_ARTIST - st["fetched"],
+    ):
+        rgs = rgs[: max(0, LIMIT_PER_ARTIST - st["fetched"])]
+        # RGs already fetched for an earlier seed (or run) are skipped
+        rg_ids = [rg["id"] for rg in rgs if ckpt.mark_seen(rg.get("id"))]
+        rg_fulls = await asyncio.gather(
+            *(fetch_rg_relations(client, rg_mbid) for rg_mbid in rg_ids)
         )
-    )
+        for rg_full in rg_fulls:
+            # the first seed to list a shared RG claims it; later seeds skip it,
+            # so this is provenance only (artists come from its artist-credit)
+            rg_full["_seed_artist_mbid"] = a
+            ckpt.write("release_groups", trim_rg(rg_full))
+        ckpt.advance(a, len(rgs), next_offset)
+        if st["fetched"] >= LIMIT_PER_ARTIST:
+            break
+    ckpt.finish(a)
 
 
-def fetch_rg_relations(rg_mbid: str) -> Dict[str, Any]:
-    return _get(f"{MB_BASE_URL}/release-group/{up.quote(rg_mbid)}", {"inc": INC_RG})
+async def _run(fresh: bool = False) -> None:
+    ckpt = Checkpoint(
+        CHECKPOINT,
+        {"artists": OUT_ARTISTS, "release_groups": OUT_RGS},
+        fresh=fresh,
+        seen=SEEN_RGS,
+    )
+    if ckpt.resumed:
+        print(f"[INFO] resuming from {CHECKPOINT}")
+    with kpi_recorder("relations") as kpi:
+        async with _client(kpi) as client:
+            with ckpt:
+                for a in SEED_MBIDS:
+                    await _pull_seed(client, ckpt, a)
+            if client.cache is not None:
+                print(f"[INFO] {client.cache.summary()}")
 
 
 def run():
     if not SEED_MBIDS:
         raise SystemExit("ARTISTS_SEED_MBIDS is empty. Provide artist MBIDs in .env")
-
-    with OUT_ARTISTS.open("w", encoding="utf-8") as fa, OUT_RGS.open(
-        "w", encoding="utf-8"
-    ) as frg:
-        for a in SEED_MBIDS:
-            # Artist object with relations
-            a_obj = fetch_artist_relations(a)
-            a_obj["_seed_mbid"] = a
-            fa.write(json.dumps(a_obj, ensure_ascii=False) + "\n")
-
-            # Enumerate a bounded set of release-groups for this artist
-            rgs = fetch_artist_release_groups(a, LIMIT_PER_ARTIST)
-            for rg in rgs:
-                rg_mbid = rg.get("id")
-                if not rg_mbid:
-                    continue
-                rg_full = fetch_rg_relations(rg_mbid)
-                rg_full["_seed_artist_mbid"] = a
-                frg.write(json.dumps(rg_full, ensure_ascii=False) + "\n")
+    asyncio.run(_run(fresh=os.getenv("MB_FRESH", "0") == "1"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+# app/pull/state.py
+"""
+Persistent pull state so long, rate-limited pulls survive crashes.
+
+Checkpoint keeps a per-artist manifest (last completed offset, page count,
+rows fetched, done flag) next to the JSONL outputs it guards. Outputs are
+appended to; every commit() flushes them and records their byte sizes, and a
+restart truncates them back to the last committed size so a page that was
+half-written when the process died is neither lost nor duplicated.
+
+An optional seen-file (one MBID per line) records every entity already
+written, shared across seeds and runs, so an RG or recording credited to
+several seed artists is fetched and written at most once. It is truncated
+together with the outputs, so "seen" always means "present in the output".
+
+Outputs with a .gz/.zst suffix (app/store/rawio.py) are buffered between
+commits and appended as one compressed member per commit, so committed sizes
+always fall on member boundaries. The manifest also records each output's
+path; if they change (e.g. MB_RAW_CODEC was switched) the old progress no
+longer describes the files and the pull starts over.
+
+Manifests use a .ckpt suffix so clean._load_raw (which globs *.json) never
+mistakes them for payloads.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from app.store import rawio
+
+SEEN = "_seen"
+
+
+class Checkpoint:
+    def __init__(
+        self,
+        path: Path | str,
+        outputs: dict[str, Path | str],
+        fresh=False,
+        seen: Path | str | None = None,
+    ):
+        self.path = Path(path)
+        self.outputs = {name: Path(p) for name, p in outputs.items()}
+        if seen is not None:
+            self.outputs[SEEN] = Path(seen)
+        self.seen: set[str] = set()
+        paths = {name: str(p) for name, p in self.outputs.items()}
+        self.state: dict[str, Any] = {"seeds": {}, "bytes": {}, "paths": paths}
+        if not fresh and self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                state = json.load(f)
+            # manifests from before rawio described the plain files
+            old = state.get("paths") or {
+                name: str(rawio.logical(p)) for name, p in self.outputs.items()
+            }
+            if old == paths:
+                self.state = state | {"paths": paths}
+            else:
+                print(f"[WARN] {self.path}: outputs changed, starting over")
+        self._files: dict[str, BinaryIO] = {}
+        self._codecs = {n: rawio.codec_of(p) for n, p in self.outputs.items()}
+        self._pending: dict[str, bytearray] = {}
+
+    def __enter__(self) -> "Checkpoint":
+        for name, p in self.outputs.items():
+            p.parent.mkdir(parents=True, exist_ok=True)
+            keep = self.state["bytes"].get(name, 0)
+            f = p.open("ab")
+            if f.tell() != keep:
+                # drop anything written after the last commit (or all of it
+                # when there is no manifest yet)
+                f.truncate(keep)
+                f.seek(keep)
+            self._files[name] = f
+        if SEEN in self._files:
+            with self.outputs[SEEN].open("r", encoding="utf-8") as f:
+                self.seen = {line.strip() for line in f if line.strip()}
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    @property
+    def resumed(self) -> bool:
+        return bool(self.state["seeds"])
+
+    def seed(self, token: str) -> dict[str, Any]:
+        return self.state["seeds"].setdefault(
+            token, {"offset": 0, "pages": 0, "fetched": 0, "done": False}
+        )
+
+    def write(self, name: str, obj: dict) -> None:
+        line = (rawio.dumps(obj) + "\n").encode("utf-8")
+        if self._codecs[name] == "none":
+            self._files[name].write(line)
+        else:
+            self._pending.setdefault(name, bytearray()).extend(line)
+
+    def is_seen(self, mbid: str | None) -> bool:
+        return bool(mbid) and mbid in self.seen
+
+    def mark_seen(self, mbid: str | None) -> bool:
+        """Record ``mbid``; False if it was already seen."""
+        if not mbid or mbid in self.seen:
+            return False
+        self.seen.add(mbid)
+        if SEEN in self._files:
+            self._files[SEEN].write(f"{mbid}\n".encode("utf-8"))
+        return True
+
+    def advance(self, token: str, n_items: int, next_offset: int) -> None:
+        st = self.seed(token)
+        st["offset"] = next_offset
+        st["pages"] += 1
+        st["fetched"] += n_items
+        self.commit()
+
+    def finish(self, token: str) -> None:
+        self.seed(token)["done"] = True
+        self.commit()
+
+    def commit(self) -> None:
+        for name, buf in self._pending.items():
+            if buf:
+                self._files[name].write(rawio.compress(bytes(buf), self._codecs[name]))
+        self._pending.clear()
+        for name, f in self._files.items():
+            f.flush()
+            os.fsync(f.fileno())
+            self.state["bytes"][name] = f.tell()
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
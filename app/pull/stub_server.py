@@ -0,0 +1,368 @@
+# app/pull/stub_server.py
+"""
+Offline stand-in for the MusicBrainz web service (ws/2), for benchmarks and
+tests that must not touch musicbrainz.org.
+
+Data comes from a deterministic synthetic generator (StubMB.synthetic) or from
+JSONL fixtures (StubMB.from_dir: artists/release_groups/recordings/releases
+.jsonl, e.g. copied from a real pull). Supported routes mirror what the
+pullers use:
+
+  /artist/<mbid>            /artist?query=artist:NAME
+  /release-group/<mbid>     /release-group?artist=<mbid>
+  /recording/<mbid>         /recording?artist=<mbid> | query=artist:"NAME"
+  /release/<mbid>           /release?release-group=<mbid>
+
+Browse/search responses honour offset/limit and report count. Latency and
+503s can be injected; request and byte counters feed app/tools/bench_pull.py.
+With rate_limit_per_s set, requests are counted in one-second windows and
+answered with X-RateLimit-Limit/Remaining/Reset, and a window overrun gets a
+503 with Retry-After, like the real service.
+
+Run standalone:  python -m app.pull.stub_server --port 8080 --artists 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator
+from urllib.parse import parse_qs, urlparse
+
+PREFIX = "/ws/2"
+_GENRES = ["rock", "pop", "electronic", "hip hop", "jazz", "r&b", "soul", "house"]
+
+
+def _credit(artists: list[dict]) -> list[dict]:
+    out = []
+    for i, a in enumerate(artists):
+        join = "" if i == len(artists) - 1 else " & "
+        out.append(
+            {
+                "name": a["name"],
+                "joinphrase": join,
+                "artist": {k: a[k] for k in ("id", "name", "sort-name")},
+            }
+        )
+    return out
+
+
+class StubMB:
+    def __init__(
+        self,
+        artists: list[dict],
+        release_groups: list[dict],
+        recordings: list[dict],
+        releases: list[dict] | None = None,
+        *,
+        latency_ms: int = 0,
+        jitter_ms: int = 0,
+        error_rate: float = 0.0,
+        rate_limit_per_s: float = 0.0,
+        seed: int = 0,
+    ):
+        self.artists = {a["id"]: a for a in artists}
+        self.release_groups = {g["id"]: g for g in release_groups}
+        self.recordings = {r["id"]: r for r in recordings}
+        self.releases = {r["id"]: r for r in releases or []}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_per_s = rate_limit_per_s
+        self._window = (0, 0)  # (epoch second, requests in it)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_out = 0
+
+        self._by_artist: dict[str, dict[str, list[dict]]] = {}
+        for kind, objs in (
+            ("release-groups", release_groups),
+            ("recordings", recordings),
+        ):
+            for o in objs:
+                for ac in o.get("artist-credit") or []:
+                    aid = (ac.get("artist") or {}).get("id")
+                    if aid:
+                        bucket = self._by_artist.setdefault(aid, {})
+                        bucket.setdefault(kind, []).append(o)
+        self._by_rg: dict[str, list[dict]] = {}
+        for r in releases or []:
+            rg_id = (r.get("release-group") or {}).get("id")
+            if rg_id:
+                self._by_rg.setdefault(rg_id, []).append(r)
+
+    # ---- data sources ----
+    @classmethod
+    def synthetic(
+        cls,
+        n_artists: int = 5,
+        rgs_per_artist: int = 30,
+        recordings_per_artist: int = 250,
+        collab_rate: float = 0.2,
+        seed: int = 0,
+        **kw,
+    ) -> "StubMB":
+        rng = random.Random(seed)
+
+        def mbid() -> str:
+            return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+        def date() -> str:
+            return f"{rng.randint(1965, 2024)}-{rng.randint(1, 12):02d}-01"
+
+        def tags() -> list[dict]:
+            names = rng.sample(_GENRES, k=rng.randint(1, 3))
+            return [{"name": n, "count": rng.randint(1, 9)} for n in names]
+
+        artists = []
+        for i in range(n_artists):
+            name = f"Stub Artist {i:03d}"
+            g = tags()
+            artists.append(
+                {
+                    "id": mbid(),
+                    "name": name,
+                    "sort-name": name,
+                    "type": rng.choice(["Person", "Group"]),
+                    "country": rng.choice(["GB", "US", "FR", "DE"]),
+                    "area": {"id": mbid(), "name": "Stubland"},
+                    "life-span": {"begin": date(), "end": None, "ended": False},
+                    "genres": g,
+                    "tags": g,
+                    "relations": [],
+                }
+            )
+
+        def credits_for(a: dict) -> list[dict]:
+            team = [a]
+            if n_artists > 1 and rng.random() < collab_rate:
+                team.append(rng.choice([x for x in artists if x is not a]))
+            return _credit(team)
+
+        rgs, recs, rels = [], [], []
+        for a in artists:
+            for _ in range(rgs_per_artist):
+                g = tags()
+                rg = {
+                    "id": mbid(),
+                    "title": f"RG {rng.getrandbits(32):08x}",
+                    "primary-type": rng.choice(["Album", "Single", "EP"]),
+                    "first-release-date": date(),
+                    "artist-credit": credits_for(a),
+                    "genres": g,
+                    "tags": g,
+                    "relations": [],
+                }
+                rg["artist-credit-phrase"] = "".join(
+                    c["name"] + c["joinphrase"] for c in rg["artist-credit"]
+                )
+                rel = {
+                    "id": mbid(),
+                    "title": rg["title"],
+                    "date": rg["first-release-date"],
+                    "country": a["country"],
+                    "status": "Official",
+                    "release-group": {"id": rg["id"], "title": rg["title"]},
+                    "label-info": [],
+                    "media": [],
+                }
+                rg["releases"] = [{k: rel[k] for k in ("id", "title", "country")}]
+                rgs.append(rg)
+                rels.append(rel)
+            for _ in range(recordings_per_artist):
+                recs.append(
+                    {
+                        "id": mbid(),
+                        "title": f"Track {rng.getrandbits(32):08x}",
+                        "length": rng.randint(90_000, 420_000),
+                        "video": False,
+                        "artist-credit": credits_for(a),
+                    }
+                )
+        return cls(artists, rgs, recs, rels, seed=seed, **kw)
+
+    @classmethod
+    def from_dir(cls, path: Path | str, **kw) -> "StubMB":
+        def read(name: str) -> list[dict]:
+            fp = Path(path) / f"{name}.jsonl"
+            if not fp.exists():
+                return []
+            with fp.open("r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+        return cls(
+            read("artists"),
+            read("release_groups"),
+            read("recordings"),
+            read("releases"),
+            **kw,
+        )
+
+    # ---- routing ----
+    def _browse(self, key: str, items: list[dict], q: dict) -> dict:
+        offset = int(q.get("offset", 0))
+        limit = min(100, int(q.get("limit", 25)))
+        return {
+            "count": len(items),
+            "offset": offset,
+            key: items[offset : offset + limit],
+        }
+
+    def _artist_by_query(self, query: str) -> list[dict]:
+        name = query.split(":", 1)[-1].strip().strip('"').casefold()
+        return [a for a in self.artists.values() if a["name"].casefold() == name]
+
+    def _artist_mbid(self, q: dict) -> str | None:
+        if q.get("artist"):
+            return q["artist"]
+        hits = self._artist_by_query(q.get("query", ""))
+        return hits[0]["id"] if hits else None
+
+    def route(self, path: str, q: dict) -> tuple[int, Any]:
+        parts = [p for p in path[len(PREFIX) :].split("/") if p]
+        if not parts:
+            return 404, {"error": "Not Found"}
+        entity, ident = parts[0], (parts[1] if len(parts) > 1 else None)
+        table = {
+            "artist": self.artists,
+            "release-group": self.release_groups,
+            "recording": self.recordings,
+            "release": self.releases,
+        }.get(entity)
+        if table is None:
+            return 400, {"error": f"unsupported entity {entity}"}
+        if ident:
+            obj = table.get(ident)
+            return (200, obj) if obj else (404, {"error": "Not Found"})
+
+        if entity == "artist":
+            return 200, self._browse(
+                "artists", self._artist_by_query(q.get("query", "")), q
+            )
+        if entity == "release":
+            return 200, self._browse(
+                "releases", self._by_rg.get(q.get("release-group"), []), q
+            )
+        key = "release-groups" if entity == "release-group" else "recordings"
+        aid = self._artist_mbid(q)
+        return 200, self._browse(key, self._by_artist.get(aid, {}).get(key, []), q)
+
+    def _throttle(self) -> tuple[bool, dict[str, str]]:
+        """Count a request in the current window; call with the lock held."""
+        if not self.rate_limit_per_s:
+            return False, {}
+        now = int(time.time())
+        sec, n = self._window
+        n = n + 1 if sec == now else 1
+        self._window = (now, n)
+        limit = int(self.rate_limit_per_s)
+        headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(max(0, limit - n)),
+            "X-RateLimit-Reset": str(now + 1),
+        }
+        if n > limit:
+            return True, headers | {"Retry-After": "1"}
+        return False, headers
+
+    def handle(self, raw_path: str) -> tuple[int, bytes, dict[str, str]]:
+        with self._lock:
+            self.requests += 1
+            throttled, rl_headers = self._throttle()
+            fail = throttled or self._rng.random() < self.error_rate
+            delay = self.latency_ms + (
+                self._rng.randint(0, self.jitter_ms) if self.jitter_ms else 0
+            )
+        if delay:
+            time.sleep(delay / 1000.0)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            return 503, b'{"error": "rate limited"}', rl_headers | {"Retry-After": "1"}
+        u = urlparse(raw_path)
+        q = {k: v[0] for k, v in parse_qs(u.query).items()}
+        status, obj = self.route(u.path, q)
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self.bytes_out += len(body)
+        return status, body, rl_headers
+
+
+def _handler(stub: StubMB) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real service
+
+        def do_GET(self):
+            status, body, extra = stub.handle(self.path)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in extra.items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@contextmanager
+def serve(stub: StubMB, host: str = "127.0.0.1", port: int = 0) -> Iterator[str]:
+    """Run ``stub`` on a background thread and yield its ws/2 base URL."""
+    srv = ThreadingHTTPServer((host, port), _handler(stub))
+    srv.daemon_threads = True
+    th = threading.Thread(target=srv.serve_forever, daemon=True)
+    th.start()
+    try:
+        yield f"http://{host}:{srv.server_address[1]}{PREFIX}"
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--fixtures", default=None, help="dir with *.jsonl fixtures")
+    ap.add_argument("--artists", type=int, default=5)
+    ap.add_argument("--latency-ms", type=int, default=0)
+    ap.add_argument("--jitter-ms", type=int, default=0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit-per-s", type=float, default=0.0)
+    args = ap.parse_args()
+
+    kw = dict(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_per_s=args.rate_limit_per_s,
+    )
+    stub = (
+        StubMB.from_dir(args.fixtures, **kw)
+        if args.fixtures
+        else StubMB.synthetic(n_artists=args.artists, **kw)
+    )
+    with serve(stub, port=args.port) as url:
+        print(f"[INFO] stub MusicBrainz at {url} ({len(stub.artists)} artists)")
+        for a in stub.artists.values():
+            print(f"  {a['id']}  {a['name']}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# app/store/compact.py
+"""
+Compact timestamped raw snapshots into one latest-version view.
+
+Every pull_sample run writes a new data/raw/sample_<stamp>/ directory (older
+dump ingests wrote dump_<stamp>/), so the same artist detail or release-group
+listing piles up once per run. Documents are keyed by their logical file
+name, which must carry the entity MBID (``artist_detail_<mbid>.json``,
+``release_groups_by_artist_<mbid>.json``, ...) or, for searches, the query
+(``artist_search_<query>.json``: the newest result replaces older ones).
+Other names say nothing about which entity a copy is of, so they are not
+collapsed: they are reported as rejected, left out of the view, and their
+snapshot is kept by --prune. Compaction keeps the copy from the newest
+snapshot under data/raw/compact/ and records where it came from in
+compact/_manifest.jsonl:
+
+  {"name": "artist_detail_<mbid>.json", "stamp": "20250101T120000Z",
+   "source": "sample_20250101T120000Z"}
+
+Snapshots already folded in are listed in compact/_snapshots.txt, so a rerun
+only reads directories pulled since; --prune removes them afterwards.
+app.pipeline.clean compacts first and then reads only the compacted view.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import shutil
+from pathlib import Path
+
+from app.store import rawio
+
+RAW_DIR = Path("data/raw")
+COMPACT_DIR = RAW_DIR / "compact"
+MANIFEST = "_manifest.jsonl"
+SNAPSHOTS = "_snapshots.txt"
+SNAPSHOT_RE = re.compile(r"^(?:sample|dump)_(\d{8}T\d{6}Z)$")
+# JSON documents left directly in data/raw by older pulls rank below any snapshot
+LOOSE_STAMP = "00000000T000000Z"
+MBID_RE = re.compile(r"[0-9a-f]{8}-(?:[0-9a-f]{4}-){3}[0-9a-f]{12}")
+QUERY_DOCS = ("artist_search_",)
+
+
+def keyed(name: str) -> bool:
+    """True if the logical ``name`` identifies one entity (or one query)."""
+    return bool(MBID_RE.search(name)) or name.startswith(QUERY_DOCS)
+
+
+def snapshots(raw_dir: Path | str = RAW_DIR) -> list[tuple[str, Path]]:
+    """(stamp, dir) for every snapshot directory, oldest first."""
+    found = []
+    for p in Path(raw_dir).iterdir() if Path(raw_dir).is_dir() else []:
+        m = SNAPSHOT_RE.match(p.name)
+        if m and p.is_dir():
+            found.append((m.group(1), p))
+    return sorted(found)
+
+
+def _read_manifest(out_dir: Path) -> dict[str, dict]:
+    path = out_dir / MANIFEST
+    if not path.exists():
+        return {}
+    with path.open(encoding="utf-8") as f:
+        rows = (json.loads(line) for line in f if line.strip())
+        return {r["name"]: r for r in rows}
+
+
+def _docs(root: Path) -> dict[str, Path]:
+    """Logical name -> preferred physical file for the documents in ``root``."""
+    docs: dict[str, Path] = {}
+    for p in sorted(root.iterdir()):
+        if p.is_file() and rawio.is_json_doc(p.name):
+            name = rawio.logical(p).name
+            docs.setdefault(name, rawio.resolve(root / name) or p)
+    return docs
+
+
+def _store(src: Path, dest: Path) -> None:
+    if rawio.codec_of(src) == rawio.CODEC:
+        out = rawio.physical(dest)
+        for old in rawio.variants(dest):
+            if old != out:
+                old.unlink()
+        shutil.copyfile(src, out)
+    else:
+        rawio.write_json(dest, rawio.read_json(src))
+
+
+def compact(
+    raw_dir: Path | str = RAW_DIR,
+    out_dir: Path | str | None = None,
+    prune: bool = False,
+) -> dict[str, int]:
+    """Fold new snapshots into ``out_dir`` (default <raw_dir>/compact)."""
+    raw_dir = Path(raw_dir)
+    out_dir = Path(out_dir) if out_dir else raw_dir / COMPACT_DIR.name
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(out_dir)
+    done_path = out_dir / SNAPSHOTS
+    done = (
+        set(done_path.read_text(encoding="utf-8").split())
+        if done_path.exists()
+        else set()
+    )
+
+    pending = [(s, p) for s, p in snapshots(raw_dir) if p.name not in done]
+    if raw_dir.is_dir():
+        pending.insert(0, (LOOSE_STAMP, raw_dir))
+    stats = {"snapshots": 0, "updated": 0, "skipped": 0, "rejected": 0}
+    for stamp, snap in pending:
+        source = "." if snap == raw_dir else snap.name
+        for name, src in _docs(snap).items():
+            if not keyed(name):
+                print(f"[WARN] {source}/{name}: no MBID in the name; not compacted")
+                stats["rejected"] += 1
+                continue
+            prev = manifest.get(name)
+            if prev and (prev["stamp"], prev["source"]) >= (stamp, source):
+                stats["skipped"] += 1
+                continue
+            _store(src, out_dir / name)
+            manifest[name] = {"name": name, "stamp": stamp, "source": source}
+            stats["updated"] += 1
+        if snap != raw_dir:
+            done.add(snap.name)
+            stats["snapshots"] += 1
+
+    tmp = out_dir / (MANIFEST + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for name in sorted(manifest):
+            f.write(json.dumps(manifest[name]) + "\n")
+    tmp.replace(out_dir / MANIFEST)
+    done_path.write_text("".join(f"{d}\n" for d in sorted(done)), encoding="utf-8")
+
+    if prune:
+        for _, snap in snapshots(raw_dir):
+            # rejected documents exist only in their snapshot
+            if snap.name in done and all(map(keyed, _docs(snap))):
+                shutil.rmtree(snap)
+    stats["documents"] = len(manifest)
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--raw-dir", default=str(RAW_DIR))
+    ap.add_argument(
+        "--prune", action="store_true", help="delete snapshots once compacted"
+    )
+    args = ap.parse_args(argv)
+    stats = compact(args.raw_dir, prune=args.prune)
+    print(
+        f"[INFO] compacted {stats['snapshots']} new snapshot(s): "
+        f"{stats['updated']} updated, {stats['skipped']} older copies skipped, "
+        f"{stats['rejected']} rejected, "
+        f"{stats['documents']} documents in view"
+    )
+
+
+if __name__ == "__main__":
+    main()
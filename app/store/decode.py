@@ -0,0 +1,348 @@
+# app/store/decode.py
+"""
+Typed decoding of MusicBrainz payloads.
+
+Readers used to ``json.loads`` every payload into nested dicts and walk them
+with chains of ``.get(...) or {}``. The structs below declare only the fields
+the pipeline reads; everything else in a payload is skipped while decoding:
+
+  Artist, ReleaseGroup, Release, Recording, ArtistCredit (+ small nested
+  types), and Document, the union shape of the JSON snapshot files clean
+  reads (artist detail / search / release-group and release listings).
+
+Field names are the MusicBrainz keys in snake case (``life-span`` ->
+``life_span``); every field is optional, missing lists decode as [] and
+missing objects as None.
+
+With the optional ``msgspec`` package the structs are msgspec Structs decoded
+straight from JSON bytes by a schema-driven decoder (payloads that do not
+match the declared types are converted leniently instead). Without it the
+JSON is parsed with ``orjson`` when installed, else the stdlib, and the
+structs are typed views that convert fields on access.
+
+  loads(data, Type)       one payload
+  read_json(path, Type)   a (compressed) JSON document via app.store.rawio
+  iter_jsonl(path, Type)  stream a (compressed) JSONL file; bad lines skipped
+  iter_lines(lines, Type) the same over JSONL lines already read
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+import types
+import typing
+from collections.abc import Iterable, Iterator
+from functools import cache
+from pathlib import Path
+from typing import Any, TypeVar
+
+from app.store import rawio
+
+try:
+    import msgspec
+except ImportError:  # optional; structs fall back to plain classes
+    msgspec = None
+try:
+    import orjson
+except ImportError:  # optional; stdlib json otherwise
+    orjson = None
+
+BACKEND = "msgspec" if msgspec else "orjson" if orjson else "json"
+T = TypeVar("T")
+
+if msgspec is not None:
+
+    class Struct(msgspec.Struct, rename="kebab", gc=False):
+        pass
+
+    _DECODE_ERRORS: tuple[type[Exception], ...] = (ValueError, msgspec.DecodeError)
+    field = msgspec.field
+
+else:
+
+    class _Field:
+        """Typed attribute read lazily from the wrapped dict's kebab-case key."""
+
+        def __init__(self, owner: type, attr: str):
+            self.owner, self.attr, self.key = owner, attr, attr.replace("_", "-")
+            self.fn: Any = _Field
+
+        def __get__(self, inst, owner=None):
+            if inst is None:
+                return self
+            if self.fn is _Field:
+                self.fn = _converter(typing.get_type_hints(self.owner)[self.attr])
+            v = inst._d.get(self.key)
+            if self.fn is not None:
+                # cached on the instance: later reads skip the descriptor
+                v = inst.__dict__[self.attr] = self.fn(v)
+            return v
+
+    class Struct:
+        """Stand-in for msgspec.Struct: a typed read-only view of a parsed dict.
+
+        Fields convert on access, so decoding costs one JSON parse and the
+        unused parts of a payload are never walked.
+        """
+
+        __slots__ = ("_d",)
+
+        def __init_subclass__(cls, **kw):
+            for attr in list(inspect.get_annotations(cls)):
+                setattr(cls, attr, _Field(cls, attr))
+
+        def __init__(self, **kw):
+            self._d = {k.replace("_", "-"): v for k, v in kw.items()}
+
+        def __repr__(self):
+            return f"{type(self).__name__}({self._d!r})"
+
+        def __eq__(self, other):
+            return type(self) is type(other) and self._d == other._d
+
+    _DECODE_ERRORS = (ValueError,)
+
+    def field(*, default_factory: Any) -> Any:
+        """Stand-in for msgspec.field: the view's list converter (see
+        _converter) already reads a missing list as a fresh []."""
+        return default_factory
+
+
+class Tag(Struct):
+    name: str | None = None
+    count: int | None = None
+
+
+class Area(Struct):
+    id: str | None = None
+    name: str | None = None
+
+
+class LifeSpan(Struct):
+    begin: str | None = None
+    end: str | None = None
+    ended: bool | None = None
+
+
+class ArtistRef(Struct):
+    id: str | None = None
+    name: str | None = None
+    sort_name: str | None = None
+
+
+class ArtistCredit(Struct):
+    name: str | None = None
+    joinphrase: str | None = None
+    artist: ArtistRef | None = None
+
+
+class EntityRef(Struct):
+    id: str | None = None
+    name: str | None = None
+    title: str | None = None
+
+
+class Label(Struct):
+    id: str | None = None
+    name: str | None = None
+    type: str | None = None
+    disambiguation: str | None = None
+
+
+class Relation(Struct):
+    type: str | None = None
+    target_type: str | None = None
+    begin: str | None = None
+    end: str | None = None
+    artist: ArtistRef | None = None
+    label: Label | None = None
+    work: EntityRef | None = None
+    recording: EntityRef | None = None
+    release_group: EntityRef | None = None
+    release: EntityRef | None = None
+
+
+class Artist(Struct):
+    id: str | None = None
+    name: str | None = None
+    sort_name: str | None = None
+    disambiguation: str | None = None
+    type: str | None = None
+    gender: str | None = None
+    area: Area | None = None
+    life_span: LifeSpan | None = None
+    genres: list[Tag] = field(default_factory=list)
+    tags: list[Tag] = field(default_factory=list)
+    relations: list[Relation] = field(default_factory=list)
+
+
+class ReleaseGroup(Struct):
+    id: str | None = None
+    title: str | None = None
+    primary_type: str | None = None
+    first_release_date: str | None = None
+    artist_credit_phrase: str | None = None
+    artist_credit: list[ArtistCredit] = field(default_factory=list)
+    genres: list[Tag] = field(default_factory=list)
+    tags: list[Tag] = field(default_factory=list)
+    releases: list[Release] = field(default_factory=list)
+    relations: list[Relation] = field(default_factory=list)
+
+
+class LabelInfo(Struct):
+    catalog_number: str | None = None
+    label: Label | None = None
+
+
+class Recording(Struct):
+    id: str | None = None
+    title: str | None = None
+    length: int | None = None
+    video: bool | None = None
+    first_release_date: str | None = None
+    artist_credit: list[ArtistCredit] = field(default_factory=list)
+    release_group: ReleaseGroup | None = None
+    releases: list[Release] = field(default_factory=list)
+
+
+class Track(Struct):
+    id: str | None = None
+    position: int | None = None
+    title: str | None = None
+    length: int | None = None
+    recording: Recording | None = None
+
+
+class Medium(Struct):
+    position: int | None = None
+    tracks: list[Track] = field(default_factory=list)
+
+
+class Release(Struct):
+    id: str | None = None
+    title: str | None = None
+    date: str | None = None
+    country: str | None = None
+    barcode: str | None = None
+    status: str | None = None
+    release_group: ReleaseGroup | None = None
+    label_info: list[LabelInfo] = field(default_factory=list)
+    media: list[Medium] = field(default_factory=list)
+
+
+class Document(Artist):
+    """A raw JSON snapshot: an artist detail or an entity listing."""
+
+    artists: list[Artist] = field(default_factory=list)
+    release_groups: list[ReleaseGroup] = field(default_factory=list)
+    releases: list[Release] = field(default_factory=list)
+
+
+# ---- lenient conversion from parsed JSON ----
+def _to_int(v: Any) -> int | None:
+    if v is None or type(v) is int:
+        return v
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _converter(tp: Any):
+    """Function coercing a parsed JSON value to ``tp`` (None: pass through)."""
+    origin = typing.get_origin(tp)
+    if origin is list:
+        (item,) = typing.get_args(tp)
+        inner = _converter(item)
+        if inner is None:
+            return lambda v: v if isinstance(v, list) else []
+        return lambda v: (
+            [inner(x) for x in v if isinstance(x, (dict, Struct))]
+            if isinstance(v, list)
+            else []
+        )
+    if origin is typing.Union or origin is types.UnionType:
+        (inner,) = [a for a in typing.get_args(tp) if a is not type(None)]
+        return _converter(inner)
+    if isinstance(tp, type) and issubclass(tp, Struct):
+        return lambda v: v if isinstance(v, tp) else convert(v, tp)
+    if tp is int:
+        return _to_int
+    return None
+
+
+# msgspec structs: (attribute, JSON key, converter) per class
+_PLANS: dict[type, list[tuple[str, str, Any]]] = {}
+
+
+def _plan(cls: type) -> list[tuple[str, str, Any]]:
+    plan = _PLANS.get(cls)
+    if plan is None:
+        hints = typing.get_type_hints(cls)
+        plan = _PLANS[cls] = [
+            (a, a.replace("_", "-"), _converter(hints[a]))
+            for a in cls.__struct_fields__
+        ]
+    return plan
+
+
+def convert(obj: Any, cls: type[T]) -> T | None:
+    """Build ``cls`` from an already-parsed JSON object (None if not a dict)."""
+    if not isinstance(obj, dict):
+        return None
+    if msgspec is None:
+        view = object.__new__(cls)
+        view._d = obj
+        return view
+    get = obj.get
+    return cls(**{a: get(k) if fn is None else fn(get(k)) for a, k, fn in _plan(cls)})
+
+
+def _parse(data: bytes | str) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+@cache
+def _decoder(cls: type):
+    return msgspec.json.Decoder(cls)
+
+
+def loads(data: bytes | str, cls: type[T]) -> T | None:
+    """Decode one JSON payload into ``cls`` (None if it is not an object)."""
+    if msgspec is not None:
+        try:
+            return _decoder(cls).decode(data)
+        except msgspec.ValidationError:
+            pass  # off-schema values: lenient path below
+    return convert(_parse(data), cls)
+
+
+def read_json(path: Path | str, cls: type[T]) -> T | None:
+    p = path if Path(path).is_file() else rawio.resolve(path)
+    if p is None:
+        raise FileNotFoundError(path)
+    with rawio.open_binary(p) as f:
+        return loads(f.read(), cls)
+
+
+def iter_jsonl(path: Path | str, cls: type[T]) -> Iterator[T]:
+    """Stream ``cls`` objects from a JSONL file (any variant); nothing if missing."""
+    p = path if Path(path).is_file() else rawio.resolve(path)
+    if p is None:
+        return
+    with rawio.open_binary(p) as f:
+        yield from iter_lines(f, cls)
+
+
+def iter_lines(lines: Iterable[bytes | str], cls: type[T]) -> Iterator[T]:
+    """Decode JSONL lines into ``cls``; blank and undecodable lines are skipped."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            obj = loads(line, cls)
+        except _DECODE_ERRORS:
+            continue  # e.g. a torn final line
+        if obj is not None:
+            yield obj
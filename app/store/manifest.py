@@ -0,0 +1,91 @@
+# app/store/manifest.py
+"""
+Manifest of the raw files a stage has consumed: path, size, mtime, sha256.
+
+Incremental stages (app.pipeline.clean) keep one next to their outputs and
+on the next run reprocess only what changed:
+
+  m = Manifest(path, layout="...")
+  changed, removed = m.scan(paths, root)   # new/changed files, vanished keys
+  ... reprocess changed, drop removed ...
+  m.record(key, entry, part="000003")      # extra fields are kept as given
+  m.forget(key)
+  m.save()
+
+A file whose size and mtime match its entry is trusted without being read;
+otherwise its content hash decides, so a re-pulled but identical document is
+not reprocessed. ``layout`` describes the output format: a manifest written
+for another layout is ignored (everything counts as new).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterable
+
+
+def sha256(path: Path | str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat(path: Path) -> dict:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class Manifest:
+    def __init__(self, path: Path | str, layout: str = ""):
+        self.path = Path(path)
+        self.layout = layout
+        self.files: dict[str, dict] = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("layout") == layout:
+                self.files = data.get("files", {})
+
+    @staticmethod
+    def key(path: Path | str, root: Path | str) -> str:
+        return Path(path).relative_to(root).as_posix()
+
+    def scan(
+        self, paths: Iterable[Path], root: Path | str
+    ) -> tuple[list[tuple[str, Path, dict]], list[str]]:
+        """(key, path, entry) for new or changed files, and keys gone since.
+
+        Unchanged files whose mtime moved get their entry refreshed in place.
+        """
+        changed, seen = [], set()
+        for p in paths:
+            k = self.key(p, root)
+            seen.add(k)
+            entry = _stat(p)
+            old = self.files.get(k)
+            if old and all(old.get(f) == v for f, v in entry.items()):
+                continue
+            entry["sha256"] = sha256(p)
+            if old and old.get("sha256") == entry["sha256"]:
+                old.update(entry)
+                continue
+            changed.append((k, p, entry))
+        return changed, [k for k in self.files if k not in seen]
+
+    def record(self, key: str, entry: dict, **extra) -> None:
+        self.files[key] = {**entry, **extra}
+
+    def forget(self, key: str) -> None:
+        self.files.pop(key, None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(
+            json.dumps({"layout": self.layout, "files": self.files}, sort_keys=True),
+            encoding="utf-8",
+        )
+        tmp.replace(self.path)
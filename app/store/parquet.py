@@ -0,0 +1,176 @@
+# app/store/parquet.py
+"""
+Parquet layout shared by the clean and mart writers and their readers.
+
+Files are written zstd-compressed (MB_PARQUET_CODEC) with column statistics
+and page indexes, in row groups of at most MB_PARQUET_ROW_GROUP rows, so a
+filtered read can skip row groups and pages by their min/max.
+
+Tables listed in PARTITIONS are hive-partitioned datasets. The path keeps its
+name but is a directory with one file per partition value:
+
+  data/clean/entity_genres.parquet/entity_type=artist/part-0.parquet
+  data/clean/entity_genres.parquet/entity_type=release-group/part-0.parquet
+  data/marts/artist_discography.parquet/year_bucket=1990s/part-0.parquet
+
+A filter on the partition column then opens only the matching files, and
+pd.read_parquet(path) still reads either layout whole.
+
+  ParquetSink(path)             append Arrow tables chunk by chunk (clean)
+  write(df, path)               one DataFrame (marts)
+  read(path, columns, filters)  column projection + filter pushdown
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CODEC = os.getenv("MB_PARQUET_CODEC", "zstd")
+ROW_GROUP_ROWS = int(os.getenv("MB_PARQUET_ROW_GROUP", "65536"))
+PART_FILE = "part-0.parquet"
+# partition values that are missing are stored under this one
+UNKNOWN = "unknown"
+
+
+def year_bucket(years: pd.Series) -> pd.Series:
+    """Decade label ("1990s") for a column of years; UNKNOWN when missing."""
+    decade = (pd.to_numeric(years, errors="coerce") // 10 * 10).astype("Int64")
+    return (decade.astype("string") + "s").fillna(UNKNOWN)
+
+
+# table (file stem) -> (partition column, how write() derives it if absent)
+PARTITIONS = {
+    "entity_genres": ("entity_type", None),
+    "entity_tags": ("entity_type", None),
+    "artist_discography": (
+        "year_bucket",
+        lambda df: year_bucket(df.get("first_release_year", pd.Series(index=df.index))),
+    ),
+}
+
+
+def partition_of(path: Path | str) -> str | None:
+    spec = PARTITIONS.get(Path(path).name.removesuffix(".parquet"))
+    return spec[0] if spec else None
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path)
+    elif path.exists():
+        path.unlink()
+
+
+class ParquetSink:
+    """Append Arrow tables to ``path``, one writer per partition value.
+
+    The previous file or dataset at ``path`` is replaced on the first write.
+    Empty tables are remembered for their schema: a sink that never saw a row
+    still leaves a readable (empty) table behind on close().
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self.partition = partition_of(self.path)
+        self.written = 0
+        self._writers: dict[str, pq.ParquetWriter] = {}
+        self._empty: pa.Table | None = None
+
+    def _writer(self, key: str | None, schema: pa.Schema) -> pq.ParquetWriter:
+        w = self._writers.get(key)
+        if w is None:
+            if not self._writers:
+                _remove(self.path)
+            dest = self.path
+            if self.partition:
+                dest = self.path / f"{self.partition}={key}" / PART_FILE
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            w = self._writers[key] = pq.ParquetWriter(
+                dest,
+                schema,
+                compression=CODEC,
+                write_statistics=True,
+                write_page_index=True,
+            )
+        return w
+
+    def write(self, table: pa.Table) -> None:
+        if not table.num_rows:
+            if self._empty is None:
+                self._empty = table
+            return
+        if not self.partition:
+            self._writer(None, table.schema).write_table(table, ROW_GROUP_ROWS)
+        else:
+            keys = pc.fill_null(table[self.partition].cast(pa.string()), UNKNOWN)
+            rest = table.drop_columns([self.partition])
+            for key in pc.unique(keys).to_pylist():
+                part = rest.filter(pc.equal(keys, key))
+                self._writer(key, part.schema).write_table(part, ROW_GROUP_ROWS)
+        self.written += table.num_rows
+
+    def close(self) -> int:
+        for w in self._writers.values():
+            w.close()
+        if not self._writers and self._empty is not None:
+            _remove(self.path)
+            dest = self.path / PART_FILE if self.partition else self.path
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(self._empty, dest, compression=CODEC)
+        return self.written
+
+
+def write(df: pd.DataFrame, path: Path | str) -> None:
+    """Write one DataFrame, partitioned when PARTITIONS lists the table."""
+    spec = PARTITIONS.get(Path(path).name.removesuffix(".parquet"))
+    if spec and spec[0] not in df.columns and spec[1] is not None:
+        df = df.assign(**{spec[0]: spec[1](df)})
+    sink = ParquetSink(path)
+    sink.write(pa.Table.from_pandas(df, preserve_index=False))
+    sink.close()
+
+
+def _dataset(path: Path | str) -> ds.Dataset:
+    path = Path(path)
+    return ds.dataset(
+        path,
+        format="parquet",
+        partitioning=(
+            ds.HivePartitioning.discover(infer_dictionary=True)
+            if path.is_dir()
+            else None
+        ),
+    )
+
+
+def count_rows(path: Path | str) -> int:
+    """Rows in a table (file or partitioned directory), from the metadata."""
+    return _dataset(path).count_rows()
+
+
+def read(
+    path: Path | str,
+    columns: list[str] | None = None,
+    filters: list[tuple] | None = None,
+) -> pd.DataFrame:
+    """Read a table, opening only the partitions, row groups and columns needed.
+
+    ``filters`` use the pyarrow tuple form, e.g. [("entity_type", "=",
+    "release-group")]; requested columns the table lacks are ignored.
+    """
+    dataset = _dataset(path)
+    if columns is not None:
+        columns = [c for c in columns if c in dataset.schema.names]
+    table = dataset.to_table(
+        columns=columns,
+        filter=pq.filters_to_expression(filters) if filters else None,
+    )
+    return table.to_pandas()
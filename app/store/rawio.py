@@ -0,0 +1,197 @@
+# app/store/rawio.py
+"""
+Compressed raw store for data/raw.
+
+Pullers keep using logical names (``recordings.jsonl``,
+``artist_detail_<mbid>.json``); the store maps them to the physical file for
+the configured codec by appending ``.gz`` (default) or ``.zst``, and writes
+compact JSON (no indent, no spaces after separators). Readers resolve any
+variant that exists, so plain files from older pulls keep working:
+
+  iter_jsonl(path)   stream decoded objects from a JSONL file
+  read_json(path)    one JSON document
+  iter_json_files()  every *.json[.gz|.zst] document under a root
+                     (iter_json_paths() lists them without parsing)
+
+JSONL outputs guarded by app.pull.state.Checkpoint are appended one gzip
+member / zstd frame per commit, and both formats decode concatenated
+members as one stream, so truncating to a committed size stays exact.
+
+MB_RAW_CODEC=gzip|zstd|none picks the codec; zstd needs the optional
+``zstandard`` package and falls back to gzip without it.
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 6
+_JSON_KW = {"ensure_ascii": False, "separators": (",", ":")}
+
+
+def _codec() -> str:
+    c = os.getenv("MB_RAW_CODEC", "gzip").lower()
+    if c not in SUFFIXES:
+        raise SystemExit(f"MB_RAW_CODEC must be one of {sorted(SUFFIXES)}: {c}")
+    if c == "zstd" and zstandard is None:
+        print("[WARN] MB_RAW_CODEC=zstd but zstandard is not installed; using gzip")
+        return "gzip"
+    return c
+
+
+CODEC = _codec()
+
+
+def codec_of(path: Path | str) -> str:
+    suffix = Path(path).suffix
+    for codec, s in SUFFIXES.items():
+        if s and suffix == s:
+            return codec
+    return "none"
+
+
+def logical(path: Path | str) -> Path:
+    """Strip a codec suffix: ``x.jsonl.gz`` -> ``x.jsonl``."""
+    p = Path(path)
+    return p.with_suffix("") if codec_of(p) != "none" else p
+
+
+def physical(path: Path | str, codec: str | None = None) -> Path:
+    """Where a logical path is written with ``codec`` (default MB_RAW_CODEC)."""
+    p = logical(path)
+    return p.with_name(p.name + SUFFIXES[codec or CODEC])
+
+
+def variants(path: Path | str) -> list[Path]:
+    """Existing files for a logical path, the configured codec first."""
+    order = [CODEC] + [c for c in SUFFIXES if c != CODEC]
+    return [p for p in (physical(path, c) for c in order) if p.is_file()]
+
+
+def resolve(path: Path | str) -> Path | None:
+    found = variants(path)
+    return found[0] if found else None
+
+
+def exists(path: Path | str) -> bool:
+    p = resolve(path)
+    return p is not None and p.stat().st_size > 0
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """One self-contained gzip member / zstd frame (or ``data`` unchanged)."""
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+
+def dumps(obj: Any) -> str:
+    return json.dumps(obj, **_JSON_KW)
+
+
+def open_binary(path: Path | str) -> IO[bytes]:
+    """Open an existing physical file for reading, decompressing by suffix."""
+    p = Path(path)
+    codec = codec_of(p)
+    if codec == "gzip":
+        return gzip.open(p, "rb")
+    if codec == "zstd":
+        if zstandard is None:
+            raise SystemExit(f"{p} is zstd-compressed; pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(
+            p.open("rb"), read_across_frames=True, closefd=True
+        )
+    return p.open("rb")
+
+
+def open_text(path: Path | str) -> IO[str]:
+    return io.TextIOWrapper(open_binary(path), encoding="utf-8")
+
+
+def open_write(path: Path | str, codec: str | None = None) -> IO[str]:
+    """Text stream replacing the logical ``path`` (other variants removed)."""
+    codec = codec or CODEC
+    out = physical(path, codec)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    for old in variants(path):
+        if old != out:
+            old.unlink()
+    if codec == "gzip":
+        return gzip.open(out, "wt", encoding="utf-8", compresslevel=GZIP_LEVEL)
+    if codec == "zstd":
+        raw = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(out.open("wb"))
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return out.open("w", encoding="utf-8")
+
+
+def write_json(path: Path | str, obj: Any) -> Path:
+    with open_write(path) as f:
+        f.write(dumps(obj))
+    return physical(path)
+
+
+def read_json(path: Path | str) -> Any:
+    p = path if Path(path).is_file() else resolve(path)
+    if p is None:
+        raise FileNotFoundError(path)
+    with open_text(p) as f:
+        return json.load(f)
+
+
+def iter_jsonl(path: Path | str) -> Iterator[dict]:
+    """Stream objects from a JSONL file (any variant); nothing if missing.
+
+    Undecodable lines (e.g. a torn final line) are skipped.
+    """
+    p = path if Path(path).is_file() else resolve(path)
+    if p is None:
+        return
+    with open_text(p) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def is_json_doc(name: str) -> bool:
+    return logical(name).suffix == ".json"
+
+
+def iter_json_paths(root: Path | str = "data/raw") -> Iterator[Path]:
+    """Every JSON document under ``root``, one physical file per logical one.
+
+    When a logical file exists in several variants only the preferred one is
+    listed, so a recompressed tree is not counted twice.
+    """
+    seen: set[Path] = set()
+    for p in sorted(Path(root).rglob("*")):
+        if not p.is_file() or not is_json_doc(p.name):
+            continue
+        key = logical(p)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield resolve(key) or p
+
+
+def iter_json_files(root: Path | str = "data/raw") -> Iterator[tuple[str, Any]]:
+    """Yield (path, document) for every JSON document under ``root``."""
+    for p in iter_json_paths(root):
+        yield str(p), read_json(p)
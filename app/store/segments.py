@@ -0,0 +1,300 @@
+# app/store/segments.py
+"""
+Append-only segmented raw store with an MBID index.
+
+Each entity kind (recordings, release_groups, artists, ...) lives under
+data/raw/segments/<kind>/ as numbered segment files
+(seg-00000.jsonl.gz, ...). Every record is written as its own gzip member,
+so a record can be read back by seeking to its offset and inflating
+``length`` bytes, and a whole segment still streams as ordinary gzipped
+JSONL (rawio.iter_jsonl). A segment is sealed once it passes
+``segment_bytes`` and a new one is started.
+
+index.sqlite maps MBID -> (segment, offset, length):
+
+  get(mbid)     one payload in O(1) (index lookup + one seek)
+  put(mbid, o)  appends unless the MBID is already stored (dedupe on
+                write); replace=True appends a new version and repoints
+  segments()    segment paths, for streaming them in parallel (stream())
+
+Records are appended and indexed in batches; on open, bytes written past the
+last indexed record of the active segment (a crash between the two) are
+truncated, so the index and the segments always agree.
+
+Existing JSONL pulls are imported with:
+
+  python -m app.store.segments import   # recordings, RG + artist relations
+  python -m app.store.segments get recordings <mbid>
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from app.store import rawio
+
+SEGMENTS_DIR = Path("data/raw/segments")
+SEGMENT_BYTES = int(os.getenv("MB_SEGMENT_MB", "64")) * 1024 * 1024
+BATCH = 500
+# tail of an imported JSONL pull hashed to tell appends from rewrites
+DIGEST_BYTES = 1024 * 1024
+# kind -> logical JSONL file it is imported from
+SOURCES = {
+    "recordings": Path("data/raw/recordings.jsonl"),
+    "release_groups": Path("data/raw/release_group_relations.jsonl"),
+    "artists": Path("data/raw/artist_relations.jsonl"),
+}
+
+
+class SegmentStore:
+    def __init__(
+        self,
+        kind: str,
+        root: Path | str = SEGMENTS_DIR,
+        segment_bytes: int = SEGMENT_BYTES,
+    ):
+        self.kind = kind
+        self.dir = Path(root) / kind
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.db = sqlite3.connect(self.dir / "index.sqlite")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                mbid TEXT PRIMARY KEY,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """)
+        self._batch: dict[str, tuple[int, int, int]] = {}
+        self._open_active()
+
+    # ---- lifecycle ----
+    def _open_active(self) -> None:
+        segs = self.segment_numbers()
+        self.active = segs[-1] if segs else 0
+        end = self.db.execute(
+            "SELECT COALESCE(MAX(offset + length), 0) FROM entries WHERE segment = ?",
+            (self.active,),
+        ).fetchone()[0]
+        self._f = self.segment_path(self.active).open("ab")
+        if self._f.tell() != end:
+            self._f.truncate(end)  # unindexed tail from an interrupted batch
+            self._f.seek(end)
+
+    def __enter__(self) -> "SegmentStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+        self._f.close()
+        self.db.close()
+
+    def flush(self) -> None:
+        """Make appended records durable, then index them."""
+        if not self._batch:
+            return
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                [(mbid, *loc) for mbid, loc in self._batch.items()],
+            )
+        self._batch.clear()
+
+    # ---- layout ----
+    def segment_path(self, n: int) -> Path:
+        return self.dir / f"seg-{n:05d}.jsonl.gz"
+
+    def segment_numbers(self) -> list[int]:
+        return sorted(int(p.name[4:9]) for p in self.dir.glob("seg-*.jsonl.gz"))
+
+    def segments(self) -> list[Path]:
+        return [self.segment_path(n) for n in self.segment_numbers()]
+
+    def __len__(self) -> int:
+        self.flush()
+        return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    # ---- write ----
+    def __contains__(self, mbid: str) -> bool:
+        if mbid in self._batch:
+            return True
+        row = self.db.execute("SELECT 1 FROM entries WHERE mbid = ?", (mbid,))
+        return row.fetchone() is not None
+
+    def put(self, mbid: str, obj: dict, replace: bool = False) -> bool:
+        """Append ``obj`` under ``mbid``; False if already stored."""
+        if not mbid or (not replace and mbid in self):
+            return False
+        if self._f.tell() >= self.segment_bytes:
+            self.flush()
+            self._f.close()
+            self.active += 1
+            self._f = self.segment_path(self.active).open("ab")
+        member = rawio.compress((rawio.dumps(obj) + "\n").encode("utf-8"), "gzip")
+        offset = self._f.tell()
+        self._f.write(member)
+        self._batch[mbid] = (self.active, offset, len(member))
+        if len(self._batch) >= BATCH:
+            self.flush()
+        return True
+
+    def put_many(self, objs: Iterable[dict], key: str = "id") -> int:
+        return sum(self.put(o.get(key), o) for o in objs)
+
+    # ---- read ----
+    def locate(self, mbid: str) -> tuple[int, int, int] | None:
+        self.flush()
+        row = self.db.execute(
+            "SELECT segment, offset, length FROM entries WHERE mbid = ?", (mbid,)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def get(self, mbid: str) -> dict | None:
+        loc = self.locate(mbid)
+        if loc is None:
+            return None
+        seg, offset, length = loc
+        with self.segment_path(seg).open("rb") as f:
+            f.seek(offset)
+            member = f.read(length)
+        return json.loads(zlib.decompress(member, wbits=31))
+
+    def stream(self, workers: int = 4) -> Iterator[dict]:
+        """Every stored record (all versions), segments inflated in parallel.
+
+        Segments are decoded on a thread pool (zlib releases the GIL) and
+        yielded in segment order, so memory holds at most ``workers``
+        decoded segments.
+        """
+        self.flush()
+        paths = self.segments()
+        if workers <= 1 or len(paths) <= 1:
+            for p in paths:
+                yield from rawio.iter_jsonl(p)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = [pool.submit(_read_segment, p) for p in paths[:workers]]
+            nxt = len(pending)
+            while pending:
+                rows = pending.pop(0).result()
+                if nxt < len(paths):
+                    pending.append(pool.submit(_read_segment, paths[nxt]))
+                    nxt += 1
+                yield from rows
+
+    # ---- import ----
+    def import_jsonl(self, src: Path | str, key: str = "id") -> int:
+        """Add records from a (compressed) JSONL pull not yet in the store.
+
+        The source file's identity (path, inode, size, mtime and a digest of
+        its last imported bytes) and the number of lines already imported are
+        kept in ``meta``. A rerun skips an unchanged file, only appends what
+        the puller added since when the file grew, and reads it from the top
+        again when it was replaced, rewritten or truncated.
+        """
+        path = rawio.resolve(src)
+        if path is None:
+            return 0
+        mark = f"imported:{rawio.logical(src)}"
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (mark,))
+        seen = _watermark((row.fetchone() or ["{}"])[0])
+        st = path.stat()
+        now = {
+            "path": path.name,
+            "ino": st.st_ino,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "digest": _digest(path, st.st_size),
+        }
+        if all(seen.get(k) == v for k, v in now.items()):
+            return 0  # unchanged since the last import
+        done = seen.get("lines", 0) if _appended(path, seen, now) else 0
+        n = added = 0
+        for n, obj in enumerate(rawio.iter_jsonl(path), start=1):
+            if n > done:
+                added += self.put(obj.get(key), obj)
+        self.flush()
+        # stat taken before reading: lines appended meanwhile are counted, and
+        # the next run resumes after them whatever the size says
+        now["lines"] = max(n, done)
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)", (mark, json.dumps(now))
+            )
+        return added
+
+
+def _watermark(value: str) -> dict:
+    """Stored import watermark; a bare line count from older stores."""
+    mark = json.loads(value)
+    return {"lines": mark} if isinstance(mark, int) else mark
+
+
+def _digest(path: Path, size: int) -> str:
+    """Hash of the last ``DIGEST_BYTES`` before ``size``."""
+    with path.open("rb") as f:
+        f.seek(max(0, size - DIGEST_BYTES))
+        return hashlib.sha1(f.read(size - f.tell())).hexdigest()
+
+
+def _appended(path: Path, seen: dict, now: dict) -> bool:
+    """True if ``path`` is the file imported before, possibly grown since."""
+    if "digest" not in seen:
+        return True  # line count only: trust it, as before
+    return (
+        seen["path"] == now["path"]
+        and seen["ino"] == now["ino"]
+        and seen["size"] <= now["size"]
+        and _digest(path, seen["size"]) == seen["digest"]
+    )
+
+
+def _read_segment(path: Path) -> list[dict]:
+    return list(rawio.iter_jsonl(path))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=str(SEGMENTS_DIR))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="append new JSONL records to the store")
+    imp.add_argument("--kinds", default=",".join(SOURCES))
+    get = sub.add_parser("get", help="print one payload")
+    get.add_argument("kind", choices=sorted(SOURCES))
+    get.add_argument("mbid")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "import":
+        for kind in [k.strip() for k in args.kinds.split(",") if k.strip()]:
+            with SegmentStore(kind, args.root) as store:
+                added = store.import_jsonl(SOURCES[kind])
+                print(
+                    f"[INFO] {kind}: +{added} ({len(store)} indexed, "
+                    f"{len(store.segments())} segments)"
+                )
+        return
+    with SegmentStore(args.kind, args.root) as store:
+        obj = store.get(args.mbid)
+    if obj is None:
+        sys.exit(f"{args.mbid} not in {args.kind}")
+    print(json.dumps(obj, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
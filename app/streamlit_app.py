@@ -19,13 +19,14 @@ def _mtime(name: str) -> float:
 
 
 @st.cache_data
-def load(name, mtime: float):
+def load(name, mtime: float, columns: tuple[str, ...] | None = None):
+    """Read a mart; ``columns`` limits what is read."""
     p = Path("data/marts") / f"{name}.parquet"
     if p.exists():
-        return pd.read_parquet(p)
+        return pd.read_parquet(p, columns=list(columns) if columns else None)
     p_csv = p.with_suffix(".csv")
     if p_csv.exists():
-        return pd.read_csv(p_csv)
+        return pd.read_csv(p_csv, usecols=list(columns) if columns else None)
     return pd.DataFrame()  # empty fallback
 
 
@@ -106,7 +107,7 @@ with tab2:
 
 # ---------- Collab Network ----------
 with tab3:
-    artists = load("artists", _mtime("artists"))
+    artists = load("artists", _mtime("artists"), ("artist_id", "artist_name"))
 
     # Prefer names-based mart; fall back to ID mart
     edges = load("artist_collaborations_names", _mtime("artist_collaborations_names"))
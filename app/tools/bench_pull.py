@@ -0,0 +1,155 @@
+# app/tools/bench_pull.py
+"""
+Benchmark the pull layer against the offline MusicBrainz stub.
+
+Starts app.pull.stub_server in-process, then runs pull_sample,
+pull_recordings and app.pull.relations as subprocesses inside a scratch
+working directory (so data/raw, data/cache and data/marts stay isolated)
+and reports wall time, requests, 503s, bytes and requests/s per stage.
+Use --runs 2 to compare a cold cache with a warm one, and
+--server-rate-per-s to have the stub enforce (and advertise) a rate limit the
+adaptive client should converge to.
+
+Example:
+  python -m app.tools.bench_pull --artists 5 --latency-ms 700 --rate-limit-ms 1100
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.pull.stub_server import StubMB, serve
+
+ROOT = Path(__file__).resolve().parents[2]
+UA = "music-explorer-bench/0.1 (bench@example.com)"
+STAGES = ["pull_sample", "pull_recordings", "relations"]
+
+
+def _commands(stage: str, url: str, stub: StubMB, args) -> tuple[list[str], dict]:
+    mbids = list(stub.artists)[: args.artists]
+    names = [stub.artists[m]["name"] for m in mbids]
+    env = {
+        "MB_BASE_URL": url,
+        "USER_AGENT": UA,
+        "MB_RATE_LIMIT_MS": str(args.rate_limit_ms),
+        "MB_MAX_IN_FLIGHT": str(args.max_in_flight),
+        "MB_CACHE": "1" if args.cache else "0",
+    }
+    if args.rate_max_per_s:
+        env["MB_RATE_MAX_PER_S"] = str(args.rate_max_per_s)
+    py = [sys.executable, "-m"]
+    rate = ["--rate-limit-ms", str(args.rate_limit_ms)]
+    nocache = [] if args.cache else ["--no-cache"]
+    if stage == "pull_sample":
+        cmd = py + ["app.pipeline.pull_sample", "--base-url", url]
+        cmd += ["--user-agent", UA, "--seed", names[0]] + rate + nocache
+    elif stage == "pull_recordings":
+        cmd = py + ["app.pipeline.pull_recordings", "--base-url", url]
+        cmd += ["--user-agent", UA, "--seed", ",".join(mbids), "--fresh"]
+        cmd += ["--max-in-flight", str(args.max_in_flight)]
+        cmd += ["--limit-per-artist", str(args.limit_per_artist)] + rate + nocache
+    else:
+        cmd = py + ["app.pull.relations"]
+        env |= {
+            "ARTISTS_SEED_MBIDS": ",".join(mbids),
+            "LIMIT_PER_ARTIST": str(args.limit_per_artist),
+            "MB_FRESH": "1",
+        }
+    return cmd, env
+
+
+def run_bench(args) -> list[dict]:
+    stub = StubMB.synthetic(
+        n_artists=args.artists,
+        rgs_per_artist=args.rgs_per_artist,
+        recordings_per_artist=args.recordings_per_artist,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_per_s=args.server_rate_per_s,
+    )
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="mb-bench-") as work, serve(stub) as url:
+        for run in range(1, args.runs + 1):
+            for stage in args.stages:
+                cmd, extra = _commands(stage, url, stub, args)
+                env = os.environ | extra | {"PYTHONPATH": str(ROOT)}
+                req0, err0, bytes0 = stub.requests, stub.errors, stub.bytes_out
+                t0 = time.perf_counter()
+                proc = subprocess.run(
+                    cmd, cwd=work, env=env, capture_output=True, text=True, check=False
+                )
+                wall = time.perf_counter() - t0
+                if proc.returncode != 0:
+                    # a failed stage's timing is not a benchmark result
+                    print(proc.stderr, file=sys.stderr)
+                    raise SystemExit(
+                        f"{stage} (run {run}) exited {proc.returncode}; bench aborted"
+                    )
+                n = stub.requests - req0
+                rows.append(
+                    {
+                        "stage": stage,
+                        "run": run,
+                        "wall_s": round(wall, 3),
+                        "requests": n,
+                        "errors_503": stub.errors - err0,
+                        "bytes": stub.bytes_out - bytes0,
+                        "req_per_s": round(n / wall, 2) if wall else 0.0,
+                    }
+                )
+    return rows
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--artists", type=int, default=3)
+    ap.add_argument("--rgs-per-artist", type=int, default=20)
+    ap.add_argument("--recordings-per-artist", type=int, default=250)
+    ap.add_argument("--limit-per-artist", type=int, default=200)
+    ap.add_argument("--latency-ms", type=int, default=700)
+    ap.add_argument("--jitter-ms", type=int, default=200)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--rate-limit-ms", type=int, default=1100)
+    ap.add_argument("--rate-max-per-s", type=float, default=0.0)
+    ap.add_argument(
+        "--server-rate-per-s", type=float, default=0.0, help="stub X-RateLimit cap"
+    )
+    ap.add_argument("--max-in-flight", type=int, default=4)
+    ap.add_argument("--runs", type=int, default=1, help="2 = cold then warm cache")
+    ap.add_argument("--no-cache", dest="cache", action="store_false")
+    ap.add_argument("--stages", default=",".join(STAGES))
+    ap.add_argument("--out", default=None, help="optional CSV of results")
+    args = ap.parse_args(argv)
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = sorted(set(args.stages) - set(STAGES))
+    if unknown:
+        ap.error(f"unknown --stages {','.join(unknown)}; choose from {STAGES}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = run_bench(args)
+    cols = list(rows[0]) if rows else []
+    print("  ".join(f"{c:>15}" for c in cols))
+    for r in rows:
+        print("  ".join(f"{r[c]!s:>15}" for c in cols))
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=cols)
+            w.writeheader()
+            w.writerows(rows)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
 import os
 import re
-import json
 import csv
 import sys
 import argparse
 from collections import defaultdict
 from typing import Any
 
+from app.store import rawio
+
 PATTERNS = [
     (re.compile(r"artist_detail_"), "artists"),
     (re.compile(r"artist_search_"), "artists"),
@@ -55,8 +56,7 @@ def emit_rows(table: str, acc: dict):
 
 
 def process_file(path: str):
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = rawio.read_json(path)
 
     tables_to_scan = set()
     base_tbl = infer_table_from_filename(os.path.basename(path))
@@ -110,7 +110,7 @@ def main():
     aggregates = defaultdict(set)
     for root, _, files in os.walk(args.indir):
         for fn in files:
-            if not fn.endswith(".json"):
+            if not rawio.is_json_doc(fn):
                 continue
             try:
                 res = process_file(os.path.join(root, fn))
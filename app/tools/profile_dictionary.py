@@ -6,6 +6,7 @@ Outputs docs/DATA_DICTIONARY_profile.csv with:
 table, layer, field, dtype, n_rows, n_nonnull, pct_missing,
 n_unique, min, max, example
 """
+
 from __future__ import annotations
 import argparse
 from pathlib import Path
@@ -63,7 +64,12 @@ def main(paths: list[str], out: str):
         if not root_path.exists():
             continue
         for p in root_path.rglob("*"):
-            if p.is_dir():
+            dirs = p.relative_to(root_path).parts[:-1]
+            # stage-internal state (e.g. data/clean/_parts) is not a table, and
+            # files inside a partitioned dataset are read with the dataset
+            if any(d.startswith("_") or d.endswith(".parquet") for d in dirs):
+                continue
+            if p.is_dir() and p.suffix.lower() != ".parquet":
                 continue
             if p.suffix.lower() not in [".csv", ".parquet", ".pq", ".jsonl", ".ndjson"]:
                 continue
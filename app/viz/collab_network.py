@@ -144,16 +144,14 @@ def build_pyvis_html(out_name: str = "collab_network.html") -> str:
         net.add_edge(u, v, title="collaboration")
 
     # options: improve label readability
-    net.set_options(
-        """
+    net.set_options("""
     {
       "nodes": { "shape": "dot", "scaling": { "min": 6, "max": 36 }, "font": { "size": 12, "strokeWidth": 2 } },
       "edges": { "color": { "inherit": true }, "width": 1, "smooth": false },
       "interaction": { "hover": true, "tooltipDelay": 120, "hideEdgesOnDrag": false, "zoomView": true },
       "physics": { "stabilization": { "iterations": 150 } }
     }
-    """
-    )
+    """)
 
     out_fp = FIGS / out_name
     net.save_graph(str(out_fp))
@@ -1,7 +1,21 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def clean_dirs(tmp_path, monkeypatch):
+    """Point app.pipeline.clean at tmp_path/raw and tmp_path/clean."""
+    from app.pipeline import clean
+
+    raw, out = tmp_path / "raw", tmp_path / "clean"
+    monkeypatch.setattr(clean, "OUTDIR", str(out))
+    monkeypatch.setattr(clean.compact, "RAW_DIR", raw)
+    monkeypatch.setattr(clean.compact, "COMPACT_DIR", raw / "compact")
+    return raw, out
@@ -0,0 +1,144 @@
+import pandas as pd
+
+from app.pipeline import build, clean
+from app.store import parquet, rawio
+
+A1 = "11111111-1111-1111-1111-111111111111"
+A2 = "22222222-2222-2222-2222-222222222222"
+G1 = "33333333-3333-3333-3333-333333333333"
+G2 = "44444444-4444-4444-4444-444444444444"
+STUB = "55555555-5555-5555-5555-555555555555"
+REC = "66666666-6666-6666-6666-666666666666"
+A3 = "77777777-7777-7777-7777-777777777777"
+G3 = "88888888-8888-8888-8888-888888888888"
+SNAPSHOT = "sample_20250101T000000Z"
+
+
+def _credit(*artists):
+    return [
+        {"name": name, "joinphrase": " & ", "artist": {"id": mbid, "name": name}}
+        for mbid, name in artists
+    ]
+
+
+def _build(clean_dirs, monkeypatch, docs, jsonl=None):
+    """clean + build over raw ``docs`` (name -> JSON) and JSONL pulls."""
+    raw, out = clean_dirs
+    marts, figures = raw.parent / "marts", raw.parent / "figures"
+    for name, doc in docs.items():
+        rawio.write_json(raw / SNAPSHOT / name, doc)
+    for name, objs in (jsonl or {}).items():
+        with rawio.open_write(raw / name) as f:
+            f.writelines(rawio.dumps(o) + "\n" for o in objs)
+    clean.main([])
+    monkeypatch.setattr(build, "CLEAN", out)
+    monkeypatch.setattr(build, "MARTS", marts)
+    monkeypatch.setattr(build, "FIG_DIR", figures)
+    marts.mkdir(exist_ok=True)
+    figures.mkdir(exist_ok=True)
+    build.build()
+    return lambda name: pd.read_csv(marts / f"{name}.csv")
+
+
+DOCS = {
+    f"artist_detail_{A1}.json": {"id": A1, "name": "One"},
+    f"artist_detail_{A2}.json": {"id": A2, "name": "Two"},
+    f"release_groups_by_artist_{A1}.json": {
+        "release-groups": [
+            {
+                "id": G1,
+                "title": "Both",
+                "first-release-date": "1999",
+                "genres": [{"name": "rock", "count": 1}],
+                # Two is credited first, though One comes first in artists
+                "artist-credit": _credit((A2, "Two"), (A1, "One")),
+            },
+            {
+                "id": G2,
+                "title": "Uncredited",
+                "first-release-date": "2004",
+                "artist-credit-phrase": "One feat. Two",
+            },
+        ]
+    },
+}
+
+
+def test_co_credits_pairs_artists_per_key():
+    credits = pd.DataFrame(
+        {
+            "rg_mbid": ["g1", "g1", "g1", "g2", "g2", "g3"],
+            "artist_mbid": ["b", "a", "a", "a", "b", None],
+        }
+    )
+    pairs = build._co_credits(credits, "rg_mbid", "artist_mbid", "artist_id", "peer_id")
+    assert pairs.values.tolist() == [["a", "b", 2]]
+
+
+def test_collabs_from_recordings_reads_the_credit_bridge(tmp_path, monkeypatch):
+    monkeypatch.setattr(build, "CLEAN", tmp_path)
+    parquet.write(
+        pd.DataFrame(
+            {
+                "rg_mbid": ["g1", "g1", None, None],
+                "recording_mbid": [None, None, "r1", "r1"],
+                "position": [0, 1, 0, 1],
+                "artist_mbid": ["a", "b", "a", "c"],
+                "artist_name": ["A", "B", "A ", "C"],
+                "credited_name": ["A", "B", "A", "C"],
+            }
+        ),
+        tmp_path / "artist_credits.parquet",
+    )
+    ids, names = build.collabs_from_recordings()
+    assert ids.values.tolist() == [["a", "c", 1]]
+    assert names.values.tolist() == [["A", "C", 1]]
+
+
+def test_recording_release_group_stubs_leave_rg_marts_alone(clean_dirs, monkeypatch):
+    marts = ["release_groups", "release_groups_by_year", "genres_by_decade"]
+    read = _build(clean_dirs, monkeypatch, DOCS)
+    before = {name: read(name) for name in marts}
+    recording = {
+        "id": REC,
+        "artist-credit": _credit((A1, "One")),
+        "release-group": {"id": STUB, "title": "Stub", "first-release-date": "2010"},
+    }
+    after = _build(clean_dirs, monkeypatch, {}, {"recordings.jsonl": [recording]})
+    for name in marts:
+        pd.testing.assert_frame_equal(after(name), before[name])
+
+
+def test_build_takes_primary_artist_from_credit_position(clean_dirs, monkeypatch):
+    read = _build(clean_dirs, monkeypatch, DOCS)
+    rgs = read("release_groups")
+    assert rgs[["release_group_id", "artist_id"]].values.tolist() == [
+        [G1, A2],
+        # no structured credits: the credit string is split and matched
+        [G2, A1],
+    ]
+    disc = read("artist_discography")
+    assert sorted(map(tuple, disc[["rg_mbid", "artist_mbid"]].values)) == sorted(
+        [(G1, A2), (G1, A1), (G2, A1), (G2, A2)]
+    )
+
+
+def test_credit_only_artists_stay_out_of_id_marts(clean_dirs, monkeypatch):
+    docs = dict(DOCS)
+    # Three is credited on two release groups but was never pulled
+    docs[f"release_groups_by_artist_{A3}.json"] = {
+        "release-groups": [
+            {"id": g, "title": g, "artist-credit": _credit((A3, "Three"), (A1, "One"))}
+            for g in (G3, STUB)
+        ]
+    }
+    read = _build(clean_dirs, monkeypatch, docs)
+    assert A3 not in set(read("artist_discography")["artist_mbid"])
+    assert read("artist_collaborations")[["artist_id", "peer_id"]].values.tolist() == [
+        [A1, A2]
+    ]
+    rgs = read("release_groups").set_index("release_group_id")["artist_id"]
+    assert rgs[G3] == A1
+    # the name-based mart pairs every credited name, as before
+    names = read("artist_collaborations_names")
+    assert names.values.tolist() == [["one", "three", 2], ["one", "two", 2]]
@@ -0,0 +1,65 @@
+import pandas as pd
+
+from app.pipeline import build_discog, clean
+from app.store import rawio
+
+A1 = "11111111-1111-1111-1111-111111111111"
+G1 = "33333333-3333-3333-3333-333333333333"
+G2 = "44444444-4444-4444-4444-444444444444"
+R1 = "55555555-5555-5555-5555-555555555555"
+REC1 = "66666666-6666-6666-6666-666666666666"
+REC2 = "77777777-7777-7777-7777-777777777777"
+
+
+def _clean(raw, lines):
+    for name, objs in lines.items():
+        with rawio.open_write(raw / name) as f:
+            f.writelines(rawio.dumps(o) + "\n" for o in objs)
+    clean.main([])
+
+
+def test_discography_falls_back_to_stub_and_earliest_release(
+    tmp_path, monkeypatch, clean_dirs
+):
+    raw, out = clean_dirs
+    credit = [{"name": "One", "artist": {"id": A1, "name": "One"}}]
+    stub = {"id": G1, "title": "Stub"}  # no type, no date
+    _clean(
+        raw,
+        {
+            "release_group_relations.jsonl": [
+                {
+                    "id": G2,
+                    "title": "Full",
+                    "primary-type": "Album",
+                    "first-release-date": "2001",
+                    "artist-credit": credit,
+                },
+            ],
+            "recordings.jsonl": [
+                {
+                    "id": REC1,
+                    "artist-credit": credit,
+                    "releases": [{"id": R1, "date": "1999-03", "release-group": stub}],
+                },
+                {
+                    "id": REC2,
+                    "artist-credit": credit,
+                    "release-group": {"id": G2, "title": "Stale"},
+                },
+            ],
+        },
+    )
+    # the recording's release-group stub is not a release_groups row
+    rgs = pd.read_parquet(out / "release_groups.parquet")
+    assert rgs["rg_mbid"].tolist() == [G2]
+
+    monkeypatch.setattr(build_discog, "CLEAN", out)
+    monkeypatch.setattr(build_discog, "OUT", tmp_path / "marts")
+    build_discog.run()
+    df = pd.read_csv(tmp_path / "marts" / "artist_discography.csv")
+    assert df[["rg_mbid", "rg_title", "first_release_year"]].values.tolist() == [
+        [G1, "Stub", 1999],
+        [G2, "Full", 2001],
+    ]
+    assert df["primary_type"].fillna("").tolist() == ["", "Album"]
@@ -0,0 +1,281 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.pipeline import _clean_utils, clean
+from app.store import decode, rawio
+
+A1 = "11111111-1111-1111-1111-111111111111"
+A2 = "22222222-2222-2222-2222-222222222222"
+A3 = "33333333-3333-3333-3333-333333333333"
+
+
+def test_route_streams_chunks_with_pk_dedupe(clean_dirs):
+    _, out = clean_dirs
+    rejects = clean.RejectSink(chunk_rows=1)
+    sinks = {n: clean.TableSink(n, 1, rejects) for n in clean.TABLES}
+    docs = [
+        {"id": A1, "name": "One", "genres": [{"name": "rock", "count": 2}]},
+        {"artists": [{"id": A1, "name": "One again"}, {"id": A2, "name": "Two"}]},
+        {"artists": [{"id": "not-a-uuid", "name": "Bad"}]},
+    ]
+    for d in docs:
+        clean.route(decode.convert(d, decode.Document), sinks)
+    counts = {n: s.close() for n, s in sinks.items()}
+    assert rejects.close() == 1
+
+    art = pd.read_parquet(out / "artists.parquet")
+    assert art["name"].tolist() == ["One", "Two"]
+    assert counts["entity_genres"] == 1 and counts["tracks"] == 0
+    assert list(pd.read_parquet(out / "tracks.parquet").columns) == list(
+        clean.TABLES["tracks"]
+    )
+    rej = pd.read_parquet(out / "_rejects.parquet")
+    assert rej[["table", "reason", "name"]].values.tolist() == [
+        ["artists", "bad_artist_mbid", "Bad"]
+    ]
+
+
+def test_pool_parsing_matches_in_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean, "FILES_PER_TASK", 1)
+    for i, mbid in enumerate([A1, A2, A1]):
+        rawio.write_json(
+            tmp_path / f"artist_detail_{i}.json", {"id": mbid, "name": f"n{i}"}
+        )
+    paths = list(rawio.iter_json_paths(tmp_path))
+    serial = list(clean._parsed(paths, workers=1, root=tmp_path))
+    assert list(clean._parsed(paths, workers=2, root=tmp_path)) == serial
+    assert [b["artists"]["name"] for b in serial] == [["n0"], ["n1"], ["n2"]]
+    assert serial[0]["artists"]["_source"] == ["artist_detail_0.json.gz"]
+
+
+def test_jsonl_chunks_parse_on_the_pool_in_line_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(clean, "JSONL_BATCH", 2)
+    p = tmp_path / "recordings.jsonl"
+    with rawio.open_write(p) as f:
+        for i in range(5):
+            f.write(rawio.dumps({"id": f"r{i}", "title": f"t{i}"}) + "\n")
+    paths = [rawio.resolve(p)]
+    serial = list(clean._parsed(paths, workers=1, root=tmp_path))
+    assert list(clean._parsed(paths, workers=2, root=tmp_path)) == serial
+    assert [b["recordings"]["title"] for b in serial] == [
+        ["t0", "t1"],
+        ["t2", "t3"],
+        ["t4"],
+    ]
+    assert serial[0]["recordings"]["_source"] == ["recordings.jsonl.gz"] * 2
+
+
+def test_incremental_clean_reparses_only_changed_files(clean_dirs, capsys):
+    raw, out = clean_dirs
+    day1, day2 = raw / "sample_20250101T000000Z", raw / "sample_20250102T000000Z"
+    rawio.write_json(day1 / f"artist_detail_{A1}.json", {"id": A1, "name": "One"})
+    rawio.write_json(day1 / f"artist_detail_{A2}.json", {"id": A2, "name": "Two"})
+    clean.main([])
+    assert "parsed 2 new/changed" in capsys.readouterr().out
+
+    clean.main([])
+    assert "up to date" in capsys.readouterr().out
+
+    # a newer copy of A2 renames the artist; a third document repeats A1,
+    # which the first one keeps
+    rawio.write_json(day2 / f"artist_detail_{A2}.json", {"id": A2, "name": "Deux"})
+    rawio.write_json(day2 / f"artist_detail_{A3}.json", {"id": A1, "name": "Dup"})
+    clean.main([])
+    assert "parsed 2 new/changed raw files (1 unchanged" in capsys.readouterr().out
+    art = pd.read_parquet(out / "artists.parquet")
+    assert art["name"].tolist() == ["One", "Deux"]
+    assert len(list((out / "_parts" / "artists").iterdir())) == 2
+
+    clean.main(["--full"])
+    full = pd.read_parquet(out / "artists.parquet")
+    pd.testing.assert_frame_equal(full, art)
+    assert len(list((out / "_parts" / "artists").iterdir())) == 1
+
+
+def test_incremental_clean_rebuilds_only_touched_tables(clean_dirs, capsys):
+    raw, out = clean_dirs
+    day1, day2 = raw / "sample_20250101T000000Z", raw / "sample_20250102T000000Z"
+    rawio.write_json(day1 / f"artist_detail_{A1}.json", {"id": A1, "name": "One"})
+    with rawio.open_write(raw / "release_group_relations.jsonl") as f:
+        f.write(rawio.dumps({"id": A3, "title": "RG"}) + "\n")
+        f.write(rawio.dumps({"id": "not-a-uuid", "title": "Bad"}) + "\n")
+    clean.main([])
+    assert f"rebuilding {len(clean.TABLES)} of" in capsys.readouterr().out
+    stamp = (out / "release_groups.parquet").stat().st_mtime_ns
+
+    rawio.write_json(day2 / f"artist_detail_{A2}.json", {"id": A2, "name": "Two"})
+    clean.main([])
+    assert f"rebuilding 1 of {len(clean.TABLES)}" in capsys.readouterr().out
+    assert pd.read_parquet(out / "artists.parquet")["name"].tolist() == ["One", "Two"]
+    assert (out / "release_groups.parquet").stat().st_mtime_ns == stamp
+    rej = pd.read_parquet(out / "_rejects.parquet")
+    assert rej[["table", "title"]].values.tolist() == [["release_groups", "Bad"]]
+
+    # removing a raw file rebuilds the tables its rows were in
+    (raw / "release_group_relations.jsonl.gz").unlink()
+    clean.main([])
+    assert "rebuilding 1 of" in capsys.readouterr().out
+    assert pd.read_parquet(out / "release_groups.parquet").empty
+    assert not (out / "_rejects.parquet").exists()
+
+
+def test_merge_streams_parts_in_raw_file_order(clean_dirs):
+    raw, out = clean_dirs
+    day1, day2 = raw / "sample_20250101T000000Z", raw / "sample_20250102T000000Z"
+    rawio.write_json(day1 / f"artist_detail_{A1}.json", {"id": A1, "name": "One"})
+    rawio.write_json(day1 / f"artist_detail_{A3}.json", {"id": A2, "name": "Two"})
+    clean.main([])
+    # the A2 document sorts between the other two but is parsed into the
+    # second part
+    rawio.write_json(day2 / f"artist_detail_{A2}.json", {"id": A2, "name": "Deux"})
+    clean.main([])
+    art = pd.read_parquet(out / "artists.parquet")
+    assert art["name"].tolist() == ["One", "Deux"]
+    assert len(list((out / "_parts" / "artists").iterdir())) == 2
+
+
+def test_normalize_dates_and_durations():
+    dates = pd.Series(["1999", "1999-04", "1999-04-03", None, "", "1999-13-01"])
+    out = _clean_utils.normalize_dates(dates)
+    assert str(out.dtype) == "date32[day][pyarrow]"
+    assert out.astype("string").tolist() == [
+        "1999-01-01",
+        "1999-04-01",
+        "1999-04-03",
+        pd.NA,
+        pd.NA,
+        pd.NA,
+    ]
+    ms = _clean_utils.normalize_ms(pd.Series([1000, None, -5, "250", "x"]))
+    assert ms.dtype == "Int64"
+    assert ms.tolist() == [1000, pd.NA, pd.NA, 250, pd.NA]
+
+
+def test_tables_are_written_with_explicit_arrow_schema(clean_dirs):
+    _, out = clean_dirs
+    sinks = {n: clean.TableSink(n) for n in clean.TABLES}
+    r = {"id": A1, "country": "gb", "status": "Official", "date": "1999-04"}
+    r["media"] = [{"position": 1, "tracks": [{"id": A2, "position": 3}]}]
+    clean.route(decode.convert({"releases": [r]}, decode.Document), sinks)
+    for s in sinks.values():
+        s.close()
+    rel = pq.read_schema(out / "releases.parquet")
+    assert rel.field("country").type == pa.dictionary(pa.int32(), pa.string())
+    assert rel.field("date").type == pa.date32()
+    trk = pq.read_schema(out / "tracks.parquet")
+    assert trk.field("position").type == pa.int32()
+    assert trk.field("length_ms").type == pa.int64()
+    empty = pq.read_schema(out / "labels.parquet")  # no rows, same schema
+    assert empty.field("type").type == pa.dictionary(pa.int32(), pa.string())
+
+
+def test_jsonl_pulls_become_clean_tables(clean_dirs):
+    raw, out = clean_dirs
+    rg = "33333333-3333-3333-3333-333333333333"
+    credits = [
+        {"name": "One", "joinphrase": " & ", "artist": {"id": A1, "name": "One"}},
+        {"name": "2", "joinphrase": "", "artist": {"id": A2, "name": "Two"}},
+    ]
+    label = {"target-type": "label", "type": "recording contract", "begin": "1999"}
+    lines = {
+        "artist_relations.jsonl": [
+            {
+                "id": A1,
+                "name": "One",
+                "area": {"name": "Here"},
+                "relations": [
+                    {**label, "label": {"id": "l1", "name": "Lab"}},
+                    {
+                        "type": "producer",
+                        "target-type": "recording",
+                        "recording": {"id": "r9", "title": "Other"},
+                    },
+                ],
+            },
+        ],
+        "release_group_relations.jsonl": [
+            {
+                "id": rg,
+                "title": "RG",
+                "first-release-date": "2001-05",
+                "artist-credit": credits,
+                "releases": [{"id": "x", "country": "GB"}],
+            },
+        ],
+        "recordings.jsonl": [
+            {
+                "id": "44444444-4444-4444-4444-444444444444",
+                "title": "Song",
+                "artist-credit": credits,
+                "releases": [{"release-group": {"id": rg}}],
+            },
+        ],
+    }
+    for name, objs in lines.items():
+        with rawio.open_write(raw / name) as f:
+            f.writelines(rawio.dumps(o) + "\n" for o in objs)
+    clean.main([])
+
+    ac = pd.read_parquet(out / "artist_credits.parquet").fillna("")
+    assert ac[["rg_mbid", "position", "credited_name"]].values.tolist() == [
+        [rg, 0, "One"],
+        [rg, 1, "2"],
+        ["", 0, "One"],
+        ["", 1, "2"],
+    ]
+    rgs = pd.read_parquet(out / "release_groups.parquet")
+    assert rgs["artist_credit"].tolist() == ["One & 2"]
+    recs = pd.read_parquet(out / "recordings.parquet")
+    assert recs["rg_mbid"].tolist() == [rg]
+    rels = pd.read_parquet(out / "artist_relations.parquet")
+    assert rels["target_name"].tolist() == ["Lab", "Other"]
+    assert str(rels["begin_date"].iloc[0]) == "1999-01-01"
+    art = pd.read_parquet(out / "artists.parquet")
+    assert art["area_name"].tolist() == ["Here"]
+
+
+def test_recordings_jsonl_rows_win_over_document_tracks(clean_dirs):
+    raw, out = clean_dirs
+    rel, rec = "55555555-5555-5555-5555-555555555555", A2
+    track = {"id": A1, "position": 1, "recording": {"id": rec, "title": "Song"}}
+    doc = {
+        "releases": [
+            {
+                "id": rel,
+                "title": "Rel",
+                "barcode": "123",
+                "release-group": {"id": A3},
+                "media": [{"position": 1, "tracks": [track]}],
+            }
+        ]
+    }
+    rawio.write_json(raw / "sample_20250101T000000Z" / f"release_{rel}.json", doc)
+    line = {
+        "id": rec,
+        "title": "Song",
+        "length": 1000,
+        "release-group": {
+            "id": A3,
+            "title": "RG",
+            "primary-type": "Album",
+            "first-release-date": "2001-05-01",
+        },
+        "releases": [{"id": rel, "title": "Rel"}],
+    }
+    with rawio.open_write(raw / "recordings.jsonl") as f:
+        f.write(rawio.dumps(line) + "\n")
+    clean.main([])
+
+    recs = pd.read_parquet(out / "recordings.parquet")
+    assert len(recs) == 1
+    row = recs.iloc[0]
+    assert (row["rg_mbid"], row["rg_title"], row["rg_primary_type"]) == (
+        A3,
+        "RG",
+        "Album",
+    )
+    assert str(row["rg_first_release_date"]) == "2001-05-01"
+    assert row["length_ms"] == 1000
+    # the document's full release still wins over the one the line embeds
+    assert pd.read_parquet(out / "releases.parquet")["barcode"].tolist() == ["123"]
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from app.pull.cache import ResponseCache
+from app.pull.client import MBClient, MBHTTPError
+from app.pull.ratelimit import (
+    AdaptiveLimiter,
+    SharedLimiter,
+    TokenBucket,
+    retry_after_s,
+)
+from app.pull.stub_server import StubMB, serve
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latency_s = 0.05
+
+    def do_GET(self):
+        time.sleep(self.latency_s)
+        if self.path.startswith("/ws/2/missing"):
+            body, status = b'{"error": "Not Found"}', 404
+        else:
+            body, status = json.dumps({"path": self.path}).encode(), 200
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def base_url():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    th = threading.Thread(target=srv.serve_forever, daemon=True)
+    th.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/ws/2"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_token_bucket_spaces_acquires():
+    async def go():
+        tb = TokenBucket(rate_per_s=20)
+        t0 = time.monotonic()
+        for _ in range(5):
+            await tb.acquire()
+        return time.monotonic() - t0
+
+    # first token is free, the next four wait 50 ms each
+    assert asyncio.run(go()) >= 0.19
+
+
+def test_client_overlaps_latency_with_pacing(base_url):
+    async def go():
+        async with MBClient(base_url, "test/0.1", rate_limit_ms=50) as c:
+            t0 = time.monotonic()
+            out = await asyncio.gather(
+                *(c.get_json("artist", {"i": i}) for i in range(6))
+            )
+            return out, time.monotonic() - t0, c.requests_sent
+
+    out, wall, sent = asyncio.run(go())
+    assert sent == 6
+    assert all("fmt=json" in o["path"] for o in out)
+    # sequential sleep+request would be 6 * (50 + 50) ms
+    assert wall < 0.5
+
+
+def test_client_raises_on_4xx(base_url):
+    async def go():
+        async with MBClient(base_url, "test/0.1", rate_limit_ms=10) as c:
+            await c.get_json("missing/x")
+
+    with pytest.raises(MBHTTPError) as ei:
+        asyncio.run(go())
+    assert ei.value.status == 404
+
+
+def test_cache_serves_repeat_lookups_without_network(base_url, tmp_path):
+    cache = ResponseCache(tmp_path / "cache", ttl_s=3600)
+
+    async def go():
+        async with MBClient(base_url, "test/0.1", rate_limit_ms=10, cache=cache) as c:
+            a = await c.get_json("artist/x", {"inc": "tags+genres"})
+            b = await c.get_json("artist/x", {"inc": "tags+genres"})
+            return a, b, c.requests_sent
+
+    a, b, sent = asyncio.run(go())
+    assert a == b
+    assert sent == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_key_ignores_param_order_and_fmt():
+    k1 = ResponseCache.key("artist", {"inc": "tags", "limit": 1, "fmt": "json"})
+    k2 = ResponseCache.key("artist", {"limit": 1, "inc": "tags"})
+    assert k1 == k2
+    assert k1 != ResponseCache.key("artist", {"limit": 1, "inc": "genres"})
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, ttl_s=3600, max_bytes=600)
+    for i in range(10):
+        cache.put(ResponseCache.key("e", {"i": i}), "e", {"pad": "x" * 50})
+    assert sum(f.stat().st_size for f in tmp_path.rglob("*.json")) <= 600
+    assert cache.lookup(ResponseCache.key("e", {"i": 9})) is not None
+    assert cache.lookup(ResponseCache.key("e", {"i": 0})) is None
+
+
+def test_retry_after_and_jittered_backoff():
+    tb = TokenBucket(rate_per_s=1)
+    assert retry_after_s({"Retry-After": "3"}) == 3.0
+    assert retry_after_s({}) is None
+    assert tb.retry_delay(2, {"Retry-After": "1"}) == 1.0
+    delays = {tb.retry_delay(3) for _ in range(20)}
+    assert len(delays) > 1 and all(0 <= d <= 4.0 for d in delays)
+
+
+class _BusyOnceHandler(BaseHTTPRequestHandler):
+    busy = True
+
+    def do_GET(self):
+        cls = type(self)
+        status, cls.busy = (503 if cls.busy else 200), False
+        self.send_response(status)
+        if status == 503:
+            self.send_header("Retry-After", "0.4")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_retry_after_is_waited_once():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _BusyOnceHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{srv.server_address[1]}/ws/2"
+
+    async def go():
+        lim = AdaptiveLimiter(100.0, verbose=False)
+        async with MBClient(url, "test/0.1", limiter=lim) as c:
+            t0 = time.monotonic()
+            await c.get_json("artist/x")
+            return time.monotonic() - t0, c.requests_sent
+
+    try:
+        wall, sent = asyncio.run(go())
+    finally:
+        srv.shutdown()
+        srv.server_close()
+    assert sent == 2
+    assert 0.35 <= wall < 0.75
+    # the pause is the only wait: no per-request sleep on top of it
+    lim = AdaptiveLimiter(100.0, verbose=False)
+    assert lim.retry_wait(1, 503, {"Retry-After": "0.4"}) == 0.0
+    assert TokenBucket(1.0).retry_wait(1, 503, {"Retry-After": "0.4"}) == 0.4
+
+
+def test_adaptive_limiter_follows_headers():
+    lim = AdaptiveLimiter(1.0, max_rate=50, verbose=False)
+    lim.observe(200, {})
+    assert lim.effective_rate == pytest.approx(1.1)
+    reset = str(int(time.time()) + 10)
+    lim.observe(200, {"X-RateLimit-Remaining": "200", "X-RateLimit-Reset": reset})
+    assert 19 <= lim.effective_rate <= 50
+    before = lim.effective_rate
+    lim.observe(503, {"Retry-After": "0"})
+    assert lim.effective_rate == pytest.approx(before / 2)
+    lim.observe(200, {"X-RateLimit-Remaining": "9999", "X-RateLimit-Reset": reset})
+    assert lim.effective_rate == 50  # capped
+
+
+def test_client_speeds_up_to_advertised_limit():
+    stub = StubMB.synthetic(n_artists=1, rgs_per_artist=1, recordings_per_artist=1)
+    stub.rate_limit_per_s = 40
+    rec = next(iter(stub.recordings))
+
+    async def go(url):
+        lim = AdaptiveLimiter.from_interval_ms(200, max_rate=100, verbose=False)
+        async with MBClient(url, "test/0.1", limiter=lim, max_in_flight=8) as c:
+            t0 = time.monotonic()
+            await asyncio.gather(*(c.get_json(f"recording/{rec}") for _ in range(60)))
+            return time.monotonic() - t0, lim.effective_rate
+
+    with serve(stub) as url:
+        wall, rate = asyncio.run(go(url))
+    # a fixed 5 req/s would need 12 s
+    assert wall < 6
+    assert rate > 5
+
+
+_SHARED_WORKER = """
+import asyncio, sys, time
+from app.pull.ratelimit import SharedLimiter
+
+async def go():
+    lim = SharedLimiter(sys.argv[1], 20.0, verbose=False)
+    for _ in range(10):
+        await lim.acquire()
+        print(time.time(), flush=True)
+
+asyncio.run(go())
+"""
+
+
+def test_shared_limiter_spaces_requests_across_processes(tmp_path):
+    lock = tmp_path / "rate.lock"
+    env = os.environ | {"PYTHONPATH": str(Path(__file__).resolve().parents[1])}
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", _SHARED_WORKER, str(lock)],
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+        for _ in range(2)
+    ]
+    stamps = sorted(float(t) for p in procs for t in p.communicate()[0].split())
+    assert len(stamps) == 20
+    # one global 20 req/s budget: 20 grants take >= 19 intervals, not 9
+    assert stamps[-1] - stamps[0] >= 0.9
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    assert min(gaps) >= 0.025  # 50 ms slots, minus wake-up jitter
+
+
+def test_shared_limiter_pause_is_seen_by_other_workers(tmp_path):
+    a = SharedLimiter(tmp_path / "rate.lock", 100.0, verbose=False)
+    b = SharedLimiter(tmp_path / "rate.lock", 100.0, verbose=False)
+    asyncio.run(a.acquire())
+    a.observe(503, {"Retry-After": "0.3"})
+    assert b.rate == 100.0
+
+    async def go():
+        t0 = time.monotonic()
+        await b.acquire()
+        return time.monotonic() - t0, b.rate
+
+    waited, rate = asyncio.run(go())
+    assert waited >= 0.25
+    assert rate == 50.0  # halved rate is shared too
+
+
+def test_shared_limiter_adjusts_the_rate_under_one_lock(tmp_path):
+    lock = tmp_path / "rate.lock"
+    other = SharedLimiter(lock, 100.0, max_rate=200, verbose=False)
+
+    class _Racing(SharedLimiter):
+        def _set_rate(self, rate, reason):
+            # another worker's 503 arrives between this one's read and write
+            self.peer = threading.Thread(target=other.observe, args=(503, {}))
+            self.peer.start()
+            time.sleep(0.2)
+            super()._set_rate(rate, reason)
+
+    lim = _Racing(lock, 100.0, max_rate=200, verbose=False)
+    asyncio.run(lim.acquire())
+    lim.observe(200, {})  # probe up: 100 -> 110
+    lim.peer.join()
+    # the halving applies after the probe instead of being overwritten by it
+    assert json.loads(lock.read_text())["rate"] == pytest.approx(55.0)
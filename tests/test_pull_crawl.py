@@ -0,0 +1,94 @@
+import asyncio
+
+import pandas as pd
+
+from app.pipeline import clean
+from app.pull.client import MBClient, MBHTTPError
+from app.pull.crawl import Frontier, crawl
+from app.pull.stub_server import StubMB, serve
+from app.store import rawio
+
+
+def test_frontier_pops_highest_score_with_lazy_updates():
+    f = Frontier()
+    f.bump("a")
+    f.bump("b")
+    f.bump("b")
+    f.bump("a", 2)
+    assert f.pop() == ("a", 3)
+    assert f.pop() == ("b", 2)
+    assert f.pop() is None
+
+
+def _run(url, seeds, budget, out, fresh=False):
+    async def go():
+        async with MBClient(url, "test/0.1", rate_limit_ms=5) as c:
+            return await crawl(c, seeds, budget, out, limit_per_artist=100, fresh=fresh)
+
+    return asyncio.run(go())
+
+
+def test_crawl_expands_via_co_credits_within_budget(tmp_path):
+    stub = StubMB.synthetic(
+        n_artists=6, rgs_per_artist=5, recordings_per_artist=50, collab_rate=0.5
+    )
+    seed = next(iter(stub.artists))
+    with serve(stub) as url:
+        stats = _run(url, [seed], budget=9, out=tmp_path)
+        assert stats["requests"] <= 9 + 1  # a browse may finish its last page
+        assert stats["artists"] == 3  # 3 requests per artist
+        artists = list(rawio.iter_jsonl(tmp_path / "artist_relations.jsonl"))
+        assert artists[0]["id"] == seed
+        recs = list(rawio.iter_jsonl(tmp_path / "recordings.jsonl"))
+        assert len(recs) == len({r["id"] for r in recs}) == stats["recordings"]
+
+        # resume: visited artists are not fetched again
+        more = _run(url, [seed], budget=9, out=tmp_path)
+        assert more["artists"] == 6
+        ids = [a["id"] for a in rawio.iter_jsonl(tmp_path / "artist_relations.jsonl")]
+        assert len(ids) == len(set(ids))
+
+
+def test_crawled_artists_reach_the_clean_tables(clean_dirs):
+    raw, out = clean_dirs
+    stub = StubMB.synthetic(n_artists=4, rgs_per_artist=2, recordings_per_artist=5)
+    seed = next(iter(stub.artists))
+    with serve(stub) as url:
+        stats = _run(url, [seed], budget=6, out=raw / "crawl")
+    crawled = [a["id"] for a in rawio.iter_jsonl(raw / "crawl/artist_relations.jsonl")]
+    assert seed in crawled and len(crawled) == stats["artists"]
+
+    clean.main([])
+    art = pd.read_parquet(out / "artists.parquet")
+    assert set(crawled) <= set(art["artist_mbid"])
+    recs = pd.read_parquet(out / "recordings.parquet")
+    assert len(recs) == stats["recordings"]
+
+
+class _FlakyClient:
+    """Answers one artist; its first release-group browse fails with a 503."""
+
+    def __init__(self):
+        self.requests_sent = 0
+        self.failed = False
+
+    async def get_json(self, path, params):
+        self.requests_sent += 1
+        if path.startswith("artist/"):
+            return {"id": path.split("/")[1], "name": "Flaky"}
+        if not self.failed:
+            self.failed = True
+            raise MBHTTPError(503, path)
+        return {"release-groups": []}
+
+    async def browse(self, *args, **kw):
+        return
+        yield
+
+
+def test_retried_artist_is_written_once(tmp_path):
+    seed = "11111111-1111-1111-1111-111111111111"
+    stats = asyncio.run(crawl(_FlakyClient(), [seed], 10, tmp_path))
+    assert stats["artists"] == 1
+    lines = list(rawio.iter_jsonl(tmp_path / "artist_relations.jsonl"))
+    assert [a["id"] for a in lines] == [seed]
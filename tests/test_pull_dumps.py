@@ -0,0 +1,72 @@
+import bz2
+import gzip
+import io
+import json
+import tarfile
+
+import pandas as pd
+
+from app.pipeline import clean
+from app.pull.dumps import ingest
+from app.pull.stub_server import StubMB
+from app.store import rawio
+
+
+def _jsonl(objs):
+    return b"".join(json.dumps(o).encode() + b"\n" for o in objs)
+
+
+def _write_dump(d, stub):
+    data = _jsonl(stub.artists.values())
+    with tarfile.open(d / "artist.tar.xz", "w:xz") as tf:
+        ti = tarfile.TarInfo("mbdump/artist")
+        ti.size = len(data)
+        tf.addfile(ti, io.BytesIO(data))
+    with gzip.open(d / "release-group.jsonl.gz", "wb") as f:
+        f.write(_jsonl(stub.release_groups.values()))
+    (d / "recording.jsonl").write_bytes(_jsonl(stub.recordings.values()))
+    with bz2.open(d / "release.jsonl.bz2", "wb") as f:
+        f.write(_jsonl(stub.releases.values()))
+
+
+def test_dump_ingest_filters_to_seed_neighbourhood(tmp_path):
+    stub = StubMB.synthetic(n_artists=6, rgs_per_artist=4, recordings_per_artist=10)
+    dump, out = tmp_path / "dump", tmp_path / "raw"
+    dump.mkdir()
+    _write_dump(dump, stub)
+    seed = next(iter(stub.artists.values()))
+
+    counts = ingest(dump, [seed["name"]], hops=0, out_dir=out)
+    arts = list(rawio.iter_jsonl(out / "artist_relations.jsonl"))
+    assert [a["id"] for a in arts] == [seed["id"]]
+    assert arts[0]["_seed_mbid"] == seed["id"]
+    recs = list(rawio.iter_jsonl(out / "recordings.jsonl"))
+    assert recs and all(
+        seed["id"] in [c["artist"]["id"] for c in r["artist-credit"]] for r in recs
+    )
+    rgs = list(rawio.iter_jsonl(out / "release_group_relations.jsonl"))
+    rels = list(rawio.iter_jsonl(out / "releases.jsonl"))
+    assert len(rgs) == counts["release-group"] == len(rels)
+    # every entity only as JSONL: no per-artist snapshot documents
+    assert not list(out.glob("dump_*"))
+
+    wider = ingest(dump, [seed["id"]], hops=1, out_dir=tmp_path / "raw2")
+    assert wider["artist"] > 1
+    assert wider["recording"] >= counts["recording"]
+
+
+def test_dump_output_is_cleaned(tmp_path, clean_dirs):
+    stub = StubMB.synthetic(n_artists=3, rgs_per_artist=4, recordings_per_artist=5)
+    raw, out = clean_dirs
+    dump = tmp_path / "dump"
+    dump.mkdir()
+    _write_dump(dump, stub)
+    counts = ingest(dump, [next(iter(stub.artists))], out_dir=raw)
+    clean.main([])
+    rels = pd.read_parquet(out / "releases.parquet")
+    assert len(rels) == counts["release"]
+    assert rels["status"].notna().all()  # full releases.jsonl rows, not RG stubs
+    rgs = pd.read_parquet(out / "release_groups.parquet")
+    assert len(rgs) == counts["release-group"]
+    arts = pd.read_parquet(out / "artists.parquet")
+    assert len(arts) == counts["artist"]  # from artist_relations.jsonl alone
@@ -0,0 +1,53 @@
+import csv
+
+import pytest
+
+from app.pull.metrics import Histogram, LatencyRecorder, endpoint_of
+
+
+def test_endpoint_normalises_mbids_and_query():
+    url = (
+        "https://musicbrainz.org/ws/2/artist/"
+        "056e4f3e-d505-4dad-8ec1-d04f521cbb56?fmt=json&inc=tags"
+    )
+    assert endpoint_of(url) == "artist/{mbid}"
+    assert endpoint_of("http://127.0.0.1:9/ws/2/recording?artist=x") == "recording"
+
+
+def test_histogram_quantiles_within_bucket_width():
+    h = Histogram()
+    for ms in range(1, 1001):
+        h.add(ms)
+    assert h.quantile(0.5) == pytest.approx(500, rel=0.05)
+    assert h.quantile(0.95) == pytest.approx(950, rel=0.05)
+    assert h.quantile(0.99) == pytest.approx(990, rel=0.05)
+    assert h.quantile(1.0) == 1000
+    assert h.share_under(3000) == 1.0
+
+
+def test_recorder_batches_samples_and_writes_summary(tmp_path, capsys):
+    samples, summary = tmp_path / "samples.csv", tmp_path / "summary.csv"
+    rec = LatencyRecorder("test", samples, summary, flush_every=50)
+    base = "http://h/ws/2/artist/056e4f3e-d505-4dad-8ec1-d04f521cbb56"
+    for i in range(120):
+        rec(base, 100 + i, 200 if i % 10 else 503, 1000)
+    rec("http://h/ws/2/recording?artist=x", 4000, None, 0)
+    rec.flush()
+    with samples.open() as f:
+        assert sum(1 for _ in f) == 1 + 121
+    rec.close()
+
+    with summary.open() as f:
+        rows = {r["endpoint"]: r for r in csv.DictReader(f)}
+    assert set(rows) == {"artist/{mbid}", "recording", "ALL"}
+    art = rows["artist/{mbid}"]
+    assert int(art["requests"]) == 120
+    assert int(art["errors"]) == 12
+    assert int(art["bytes"]) == 120_000
+    assert float(art["under_target_pct"]) == 100.0
+    assert int(rows["ALL"]["requests"]) == 121
+    assert float(rows["recording"]["error_rate"]) == 1.0
+    # percentiles are whole ms, whether a bucket edge or the max wins
+    assert rows["recording"]["p95_ms"] == rows["recording"]["max_ms"] == "4000"
+    assert art["p95_ms"].isdigit() and art["p50_ms"].isdigit()
+    assert f"p95={rows['ALL']['p95_ms']} ms," in capsys.readouterr().out
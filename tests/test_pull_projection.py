@@ -0,0 +1,59 @@
+from app.pull.projection import compile_fields, dictionary_fields, project, tree_for
+
+
+def test_project_keeps_listed_paths_and_annotations():
+    tree = compile_fields(
+        ["id", "area.name", "relations[].type", "relations[].artist.id", "tags"]
+    )
+    obj = {
+        "id": "a1",
+        "_seed_mbid": "a1",
+        "area": {"name": "UK", "id": "x"},
+        "tags": [{"name": "rock", "count": 3}],
+        "recordings": [{"id": "r1"}],
+        "relations": [
+            {"type": "producer", "artist": {"id": "b", "name": "B"}, "url": {}},
+            {"type": "member of"},
+        ],
+    }
+    assert project(obj, tree) == {
+        "id": "a1",
+        "_seed_mbid": "a1",
+        "area": {"name": "UK"},
+        "tags": [{"name": "rock", "count": 3}],
+        "relations": [
+            {"type": "producer", "artist": {"id": "b"}},
+            {"type": "member of"},
+        ],
+    }
+
+
+def test_dictionary_drives_the_artist_projection(tmp_path):
+    dd = tmp_path / "DATA_DICTIONARY.csv"
+    dd.write_text(
+        "table,field,type,unit,description,source_field\n"
+        "artists,artists,list,,,artists\n"
+        "artists,genres[].name,str,,,genres[].name\n"
+        "recordings,title,str,,,title\n",
+        encoding="utf-8",
+    )
+    assert dictionary_fields("artists", dd) == ["genres[].name"]
+    tree = tree_for("artists", dd)
+    assert set(tree) >= {"genres", "id", "name", "relations"}
+    assert "recordings" not in tree and "works" not in tree
+    assert tree_for("labels", dd) == {}
+
+
+def test_release_group_projection_keeps_the_credit_phrase(tmp_path):
+    dd = tmp_path / "DATA_DICTIONARY.csv"
+    dd.write_text(
+        "table,field,type,unit,description,source_field\n"
+        "release_groups,title,str,,,title\n",
+        encoding="utf-8",
+    )
+    rg = {"id": "g", "title": "T", "artist-credit-phrase": "A & B", "aliases": []}
+    assert project(rg, tree_for("release_groups", dd)) == {
+        "id": "g",
+        "title": "T",
+        "artist-credit-phrase": "A & B",
+    }
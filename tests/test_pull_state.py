@@ -0,0 +1,80 @@
+import json
+
+from app.pull.state import Checkpoint
+from app.store import rawio
+
+
+def _lines(p):
+    return [json.loads(x) for x in p.read_text(encoding="utf-8").splitlines()]
+
+
+def test_checkpoint_resumes_from_last_committed_page(tmp_path):
+    out = tmp_path / "recordings.jsonl"
+    man = tmp_path / "recordings.jsonl.ckpt"
+
+    with Checkpoint(man, {"recordings": out}) as ck:
+        ck.write("recordings", {"id": "r1"})
+        ck.advance("A", 1, next_offset=100)
+        # a page written but never committed (process died mid-page)
+        ck.write("recordings", {"id": "r2"})
+        ck._files["recordings"].flush()
+
+    ck = Checkpoint(man, {"recordings": out})
+    assert ck.resumed
+    assert ck.seed("A") == {"offset": 100, "pages": 1, "fetched": 1, "done": False}
+    with ck:
+        assert _lines(out) == [{"id": "r1"}]
+        ck.write("recordings", {"id": "r3"})
+        ck.advance("A", 1, next_offset=200)
+        ck.finish("A")
+    assert _lines(out) == [{"id": "r1"}, {"id": "r3"}]
+    assert Checkpoint(man, {"recordings": out}).seed("A")["done"]
+
+
+def test_fresh_checkpoint_truncates_outputs(tmp_path):
+    out = tmp_path / "recordings.jsonl"
+    out.write_text('{"id": "old"}\n', encoding="utf-8")
+    with Checkpoint(tmp_path / "m.ckpt", {"recordings": out}, fresh=True):
+        pass
+    assert out.read_text(encoding="utf-8") == ""
+
+
+def test_seen_set_dedupes_across_seeds_and_runs(tmp_path):
+    out = tmp_path / "rgs.jsonl"
+    seen = tmp_path / "rgs.seen"
+    with Checkpoint(tmp_path / "m.ckpt", {"rgs": out}, seen=seen) as ck:
+        for mbid in ["a", "b", "a"]:
+            if ck.mark_seen(mbid):
+                ck.write("rgs", {"id": mbid})
+        ck.advance("seed1", 3, next_offset=3)
+        ck.mark_seen("c")  # never committed
+
+    with Checkpoint(tmp_path / "m.ckpt", {"rgs": out}, seen=seen) as ck:
+        assert ck.seen == {"a", "b"}
+        assert not ck.mark_seen("b")
+        assert ck.mark_seen("c")
+    assert [r["id"] for r in _lines(out)] == ["a", "b"]
+
+
+def test_compressed_output_resumes_on_member_boundary(tmp_path):
+    out = tmp_path / "recordings.jsonl.gz"
+    man = tmp_path / "recordings.jsonl.ckpt"
+    with Checkpoint(man, {"recordings": out}) as ck:
+        ck.write("recordings", {"id": "r1"})
+        ck.advance("A", 1, next_offset=100)
+        ck.write("recordings", {"id": "r2"})
+        ck.advance("A", 1, next_offset=200)
+        ck.write("recordings", {"id": "r3"})  # buffered, never committed
+    with Checkpoint(man, {"recordings": out}) as ck:
+        ck.write("recordings", {"id": "r4"})
+        ck.finish("A")
+    assert [r["id"] for r in rawio.iter_jsonl(out)] == ["r1", "r2", "r4"]
+
+
+def test_checkpoint_starts_over_when_outputs_move(tmp_path):
+    man = tmp_path / "recordings.jsonl.ckpt"
+    with Checkpoint(man, {"recordings": tmp_path / "recordings.jsonl"}) as ck:
+        ck.write("recordings", {"id": "r1"})
+        ck.advance("A", 1, next_offset=100)
+    ck = Checkpoint(man, {"recordings": tmp_path / "recordings.jsonl.zst"})
+    assert not ck.resumed
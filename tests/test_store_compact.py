@@ -0,0 +1,55 @@
+import json
+
+from app.store import rawio
+from app.store.compact import compact
+
+A = "11111111-1111-1111-1111-111111111111"
+B = "22222222-2222-2222-2222-222222222222"
+DETAIL_A, DETAIL_B = f"artist_detail_{A}.json", f"artist_detail_{B}.json"
+
+
+def _pull(raw, snap, name, obj):
+    rawio.write_json(raw / snap / name, obj)
+
+
+def test_compaction_keeps_latest_copy_with_provenance(tmp_path):
+    raw = tmp_path / "raw"
+    _pull(raw, "sample_20250101T000000Z", DETAIL_A, {"id": A, "v": 1})
+    _pull(raw, "sample_20250102T000000Z", DETAIL_A, {"id": A, "v": 2})
+    _pull(raw, "sample_20250101T000000Z", DETAIL_B, {"id": B, "v": 1})
+    stats = compact(raw)
+    assert stats["snapshots"] == 2 and stats["documents"] == 2
+
+    view = dict(rawio.iter_json_files(raw / "compact"))
+    assert sorted(d["v"] for d in view.values()) == [1, 2]
+    lines = (raw / "compact" / "_manifest.jsonl").read_text().splitlines()
+    manifest = {r["name"]: r for r in map(json.loads, lines)}
+    assert manifest[DETAIL_A]["source"] == "sample_20250102T000000Z"
+
+    # a rerun only folds in new snapshots; an older late arrival loses
+    _pull(raw, "sample_20241231T000000Z", DETAIL_A, {"id": A, "v": 0})
+    stats = compact(raw, prune=True)
+    assert stats == {
+        "snapshots": 1,
+        "updated": 0,
+        "skipped": 1,
+        "rejected": 0,
+        "documents": 2,
+    }
+    assert rawio.read_json(raw / "compact" / DETAIL_A)["v"] == 2
+    assert not list(raw.glob("sample_*"))
+
+
+def test_documents_without_an_mbid_are_not_collapsed(tmp_path):
+    raw = tmp_path / "raw"
+    for day, ids in [("20250101", [A]), ("20250102", [B])]:
+        snap = f"sample_{day}T000000Z"
+        _pull(raw, snap, "release_groups.json", {"release-groups": ids})
+        _pull(raw, snap, "artist_search_One.json", {"artists": ids})
+    stats = compact(raw, prune=True)
+    assert (stats["rejected"], stats["documents"]) == (2, 1)
+    # searches are keyed by query: the newest result stands
+    view = dict(rawio.iter_json_files(raw / "compact"))
+    assert list(view.values()) == [{"artists": [B]}]
+    # both release_groups.json copies stay where they were pulled
+    assert len(list(raw.glob("sample_*"))) == 2
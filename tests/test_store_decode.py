@@ -0,0 +1,89 @@
+import importlib.util
+import sys
+import typing
+
+import pytest
+
+from app.store import decode, rawio
+
+
+def test_document_decodes_nested_fields_and_defaults():
+    doc = decode.loads(
+        b'{"id": "a", "name": "A", "life-span": {"begin": "1990"},'
+        b' "genres": [{"name": "rock", "count": 3}], "unused": {"x": 1},'
+        b' "release-groups": [{"id": "g", "first-release-date": "2001",'
+        b' "artist-credit": [{"joinphrase": " & ", "artist": {"id": "a"}}]}]}',
+        decode.Document,
+    )
+    assert (doc.id, doc.life_span.begin, doc.genres[0].count) == ("a", "1990", 3)
+    rg = doc.release_groups[0]
+    assert rg.artist_credit[0].artist.id == "a"
+    assert rg.artist_credit[0].joinphrase == " & "
+    assert doc.area is None and doc.releases == [] and rg.primary_type is None
+    assert decode.loads(b"[1, 2]", decode.Document) is None
+
+
+def test_off_schema_values_are_coerced():
+    rec = decode.loads(
+        b'{"id": "r", "length": "1000", "releases": "?"}', decode.Recording
+    )
+    assert rec.length == 1000 and rec.releases == []
+
+
+def test_iter_jsonl_streams_typed_objects(tmp_path):
+    p = tmp_path / "recordings.jsonl"
+    with rawio.open_write(p, "gzip") as f:
+        f.write('{"id": "r1", "title": "One"}\n\n{"id": "r2"\n{"id": "r3"}\n')
+    assert [r.id for r in decode.iter_jsonl(p, decode.Recording)] == ["r1", "r3"]
+    assert list(decode.iter_jsonl(tmp_path / "missing.jsonl", decode.Recording)) == []
+
+
+def _fallback(monkeypatch):
+    """A second copy of app.store.decode loaded as if msgspec were missing."""
+    monkeypatch.setitem(sys.modules, "msgspec", None)
+    spec = importlib.util.spec_from_file_location("_decode_fallback", decode.__file__)
+    mod = importlib.util.module_from_spec(spec)
+    monkeypatch.setitem(sys.modules, spec.name, mod)  # for its type hints
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _plain(v):
+    if isinstance(v, list):
+        return [_plain(x) for x in v]
+    if hasattr(type(v), "__annotations__") and not isinstance(v, (str, int)):
+        hints = typing.get_type_hints(type(v))
+        return (type(v).__name__, {a: _plain(getattr(v, a)) for a in hints})
+    return v
+
+
+def test_msgspec_decodes_like_the_fallback(monkeypatch):
+    pytest.importorskip("msgspec")
+    assert decode.BACKEND == "msgspec"
+    fallback = _fallback(monkeypatch)
+    assert fallback.BACKEND != "msgspec"
+    payloads = [
+        (
+            b'{"id": "a", "name": "A", "life-span": {"begin": "1990"},'
+            b' "genres": [{"name": "rock", "count": 3}], "unused": {"x": 1},'
+            b' "release-groups": [{"id": "g", "first-release-date": "2001",'
+            b' "artist-credit": [{"joinphrase": " & ", "artist": {"id": "a"}}]}]}',
+            "Document",
+        ),
+        # off-schema values take the lenient path in both
+        (b'{"id": "r", "length": "1000", "releases": "?"}', "Recording"),
+        (
+            b'{"id": "x", "media": [{"position": 1, "tracks": [{"position": "2",'
+            b' "recording": {"id": "r", "video": false}}]}], "label-info": [1]}',
+            "Release",
+        ),
+        (b"[1, 2]", "Document"),
+    ]
+    for data, name in payloads:
+        got = decode.loads(data, getattr(decode, name))
+        want = fallback.loads(data, getattr(fallback, name))
+        assert _plain(got) == _plain(want), name
+    lines = [b'{"id": "r1", "title": "One"}', b"", b'{"id": "r2"', b'{"id": "r3"}']
+    assert _plain(list(decode.iter_lines(lines, decode.Recording))) == _plain(
+        list(fallback.iter_lines(lines, fallback.Recording))
+    )
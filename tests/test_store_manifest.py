@@ -0,0 +1,26 @@
+import os
+
+from app.store.manifest import Manifest
+
+
+def test_scan_reports_new_changed_and_removed(tmp_path):
+    a, b = tmp_path / "a.json", tmp_path / "b.json"
+    a.write_text("1")
+    b.write_text("2")
+    m = Manifest(tmp_path / "m.json", layout="v1")
+    changed, removed = m.scan([a, b], tmp_path)
+    assert [k for k, _, _ in changed] == ["a.json", "b.json"] and removed == []
+    for k, _, entry in changed:
+        m.record(k, entry, part="000001")
+    m.save()
+
+    m = Manifest(tmp_path / "m.json", layout="v1")
+    st = a.stat()
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # touched, same bytes
+    b.write_text("22")
+    changed, removed = m.scan([a, b], tmp_path)
+    assert [k for k, _, _ in changed] == ["b.json"] and removed == []
+    assert m.files["a.json"]["mtime_ns"] == a.stat().st_mtime_ns
+    assert m.scan([a], tmp_path)[1] == ["b.json"]
+
+    assert Manifest(tmp_path / "m.json", layout="v2").files == {}
@@ -0,0 +1,48 @@
+import pandas as pd
+import pyarrow as pa
+
+from app.store import parquet
+
+
+def test_partitioned_sink_reads_back_with_pushdown(tmp_path):
+    path = tmp_path / "entity_genres.parquet"
+    path.write_bytes(b"stale single file")
+    sink = parquet.ParquetSink(path)
+    for chunk in (
+        {"entity_type": ["artist", "release-group"], "genre": ["rock", "pop"]},
+        {"entity_type": ["release-group"], "genre": ["jazz"]},
+    ):
+        sink.write(pa.Table.from_pandas(pd.DataFrame(chunk), preserve_index=False))
+    assert sink.close() == 3
+
+    assert sorted(p.name for p in path.iterdir()) == [
+        "entity_type=artist",
+        "entity_type=release-group",
+    ]
+    rg = parquet.read(
+        path, columns=["genre", "nope"], filters=[("entity_type", "=", "release-group")]
+    )
+    assert rg["genre"].tolist() == ["pop", "jazz"] and list(rg.columns) == ["genre"]
+    assert len(pd.read_parquet(path)) == 3
+
+
+def test_write_buckets_discography_by_decade_and_keeps_empty_schema(tmp_path):
+    df = pd.DataFrame(
+        {"rg_mbid": ["a", "b", "c"], "first_release_year": [1994, 2001, None]}
+    )
+    path = tmp_path / "artist_discography.parquet"
+    parquet.write(df, path)
+    assert sorted(p.name for p in path.iterdir()) == [
+        "year_bucket=1990s",
+        "year_bucket=2000s",
+        "year_bucket=unknown",
+    ]
+    old = parquet.read(path, filters=[("year_bucket", "in", ["1990s"])])
+    assert old["rg_mbid"].tolist() == ["a"]
+
+    parquet.write(df.iloc[:0], path)
+    assert list(parquet.read(path).columns) == [
+        "rg_mbid",
+        "first_release_year",
+        "year_bucket",
+    ]
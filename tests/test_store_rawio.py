@@ -0,0 +1,64 @@
+import gzip
+import json
+
+import pytest
+
+from app.store import rawio
+
+
+def test_write_json_is_compact_and_compressed(tmp_path):
+    doc = {"id": "x", "names": ["a", "b"], "n": 1}
+    out = rawio.write_json(tmp_path / "artist_detail_x.json", doc)
+    assert out.name == "artist_detail_x.json" + rawio.SUFFIXES[rawio.CODEC]
+    if rawio.CODEC == "gzip":
+        assert (
+            gzip.decompress(out.read_bytes()) == b'{"id":"x","names":["a","b"],"n":1}'
+        )
+    assert rawio.read_json(tmp_path / "artist_detail_x.json") == doc
+
+
+def test_readers_accept_plain_legacy_files(tmp_path):
+    (tmp_path / "recordings.jsonl").write_text(
+        json.dumps({"id": "r1"}, indent=None) + "\n\n" + '{"id": "r2"}\n{"torn'
+    )
+    assert [r["id"] for r in rawio.iter_jsonl(tmp_path / "recordings.jsonl")] == [
+        "r1",
+        "r2",
+    ]
+    assert list(rawio.iter_jsonl(tmp_path / "missing.jsonl")) == []
+
+
+def test_concatenated_members_stream_as_one_file(tmp_path):
+    p = tmp_path / "rgs.jsonl.gz"
+    with p.open("ab") as f:
+        f.write(rawio.compress(b'{"id":"a"}\n', "gzip"))
+        f.write(rawio.compress(b'{"id":"b"}\n', "gzip"))
+    assert [r["id"] for r in rawio.iter_jsonl(tmp_path / "rgs.jsonl")] == ["a", "b"]
+
+
+def test_open_write_replaces_other_variants(tmp_path):
+    (tmp_path / "a.jsonl").write_text('{"id": "old"}\n')
+    with rawio.open_write(tmp_path / "a.jsonl", codec="gzip") as f:
+        f.write('{"id":"new"}\n')
+    assert not (tmp_path / "a.jsonl").exists()
+    assert [r["id"] for r in rawio.iter_jsonl(tmp_path / "a.jsonl")] == ["new"]
+
+
+def test_iter_json_files_reads_each_logical_file_once(tmp_path):
+    (tmp_path / "s").mkdir()
+    (tmp_path / "s" / "a.json").write_text('{"id": 1}')
+    with gzip.open(tmp_path / "s" / "a.json.gz", "wt") as f:
+        f.write('{"id": 1}')
+    rawio.write_json(tmp_path / "s" / "b.json", {"id": 2})
+    (tmp_path / "s" / "c.jsonl.gz").write_bytes(rawio.compress(b"{}\n", "gzip"))
+    docs = sorted(d["id"] for _, d in rawio.iter_json_files(tmp_path))
+    assert docs == [1, 2]
+
+
+@pytest.mark.skipif(rawio.zstandard is None, reason="zstandard not installed")
+def test_zstd_round_trip(tmp_path):
+    with rawio.open_write(tmp_path / "z.jsonl", codec="zstd") as f:
+        f.write('{"id":"z"}\n')
+    with (tmp_path / "z.jsonl.zst").open("ab") as f:
+        f.write(rawio.compress(b'{"id":"y"}\n', "zstd"))
+    assert [r["id"] for r in rawio.iter_jsonl(tmp_path / "z.jsonl")] == ["z", "y"]
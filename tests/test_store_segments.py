@@ -0,0 +1,64 @@
+from app.store import rawio
+from app.store.segments import SegmentStore
+
+
+def test_put_get_dedupes_and_rolls_segments(tmp_path):
+    with SegmentStore("recordings", tmp_path, segment_bytes=200) as st:
+        for i in range(20):
+            assert st.put(f"r{i}", {"id": f"r{i}", "title": "x" * 50})
+        assert not st.put("r3", {"id": "r3", "title": "dup"})
+        assert st.get("r3")["title"] == "x" * 50
+        assert st.put("r3", {"id": "r3", "title": "new"}, replace=True)
+        assert st.get("r3")["title"] == "new"
+        assert st.get("missing") is None
+        assert len(st) == 20
+        segs = st.segments()
+    assert len(segs) > 1
+    # segments are plain gzipped JSONL as well
+    ids = [r["id"] for p in segs for r in rawio.iter_jsonl(p)]
+    assert len(ids) == 21 and set(ids) == {f"r{i}" for i in range(20)}
+    with SegmentStore("recordings", tmp_path, segment_bytes=200) as st:
+        assert [r["id"] for r in st.stream(workers=3)] == ids
+
+
+def test_reopen_truncates_unindexed_tail(tmp_path):
+    st = SegmentStore("rgs", tmp_path)
+    st.put("a", {"id": "a"})
+    st.flush()
+    st.put("b", {"id": "b"})  # appended but never indexed
+    st._f.flush()
+    st._f.close()
+    st.db.close()
+
+    with SegmentStore("rgs", tmp_path) as st:
+        assert "b" not in st
+        assert st.put("b", {"id": "b", "v": 2})
+        assert st.get("b") == {"id": "b", "v": 2}
+        assert [r["id"] for r in st.stream()] == ["a", "b"]
+
+
+def test_import_jsonl_is_incremental(tmp_path):
+    src = tmp_path / "recordings.jsonl"
+    src.write_text('{"id": "a"}\n{"id": "b"}\n{"id": "a"}\n', encoding="utf-8")
+    with SegmentStore("recordings", tmp_path / "seg") as st:
+        assert st.import_jsonl(src) == 2
+    with src.open("a", encoding="utf-8") as f:
+        f.write('{"id": "c"}\n')
+    with SegmentStore("recordings", tmp_path / "seg") as st:
+        assert st.import_jsonl(src) == 1
+        assert len(st) == 3
+
+
+def test_import_jsonl_reimports_a_rewritten_source(tmp_path):
+    src = tmp_path / "recordings.jsonl"
+    src.write_text('{"id": "a"}\n{"id": "b"}\n{"id": "c"}\n', encoding="utf-8")
+    with SegmentStore("recordings", tmp_path / "seg") as st:
+        assert st.import_jsonl(src) == 3
+        assert st.import_jsonl(src) == 0  # unchanged
+        # same size and line count, different records
+        src.write_text('{"id": "d"}\n{"id": "b"}\n{"id": "c"}\n', encoding="utf-8")
+        assert st.import_jsonl(src) == 1
+        # shorter than what was imported
+        src.write_text('{"id": "e"}\n', encoding="utf-8")
+        assert st.import_jsonl(src) == 1
+        assert len(st) == 5